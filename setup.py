@@ -44,6 +44,8 @@ setup(
             "web/static/js/*",
             "web/static/css/*",
             "web/static/webfonts/*",
+            "db/migrations/*",
+            "db/migrations/versions/*",
         ],
     },
     classifiers=[
@@ -61,10 +63,18 @@ setup(
         "flask-smorest",
         "psycopg2",
         "alembic",
-        "sqlalchemy",
+        # controller.TimedQueuePool overrides the private Pool._do_get
+        "sqlalchemy>=2.0,<2.2",
         "sqlalchemy_utils",
         "hypothesis",
         "schemathesis",
         "pyyaml",
+        "numpy",
+        "starlette",
+        "uvicorn",
+        "asyncpg",
+        "aiosqlite",
+        "orjson",
+        "prometheus_client",
     ],
 )
@@ -0,0 +1,404 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import (
+    NoReferencedColumnError,
+    IntegrityError,
+)
+
+from dhondt.db.controller import DB
+from dhondt.db.entity_cache import (
+    entity_cache,
+    DISTRICTS,
+    SCRUTINIES,
+)
+from dhondt.db.dhondt_repository import (
+    DB_URL,
+    DB_DATABASE,
+    DB_USER,
+    DB_PASSW,
+    IMPORT_BATCH_SIZE,
+    VOTES_UPDATE,
+    VOTES_IMPORT_STAGING,
+    VOTES_IMPORT_MERGE,
+    VOTES_IMPORT_TOUCH,
+    SEATS_RESULT_LOAD_OPTIONS,
+    DHONDT_RESULT_INSERT,
+    SEATS_INSERT,
+    UNIQUE_VIOLATION,
+    FOREIGN_KEY_VIOLATION,
+    _calculation_input_query,
+    _calculation_input,
+    _calculated_result,
+    _seats_params,
+    _dicts,
+    _districts_query,
+    _pplists_query,
+    _scrutinies_query,
+    _seats_results_query,
+    _pplists_updated_query,
+    _votes_in_districts,
+    _dhondt_result_record,
+    _district_version_query,
+    _district_version,
+    _scrutiny_version_query,
+    _scrutiny_version,
+    _latest_result_id_query,
+    _latest_seats_result,
+    _votes_out_of_range,
+    _sqlstate,
+    _touch_districts,
+    _touch_scrutiny,
+    _upsert_latest_result,
+    _utcnow,
+    _votes_update_params,
+    _votes_increment,
+    _pplist_in_district,
+    _pplist_row_dict,
+    _batched,
+)
+from dhondt.db.tabledefs import (
+    ScrutinyTable,
+    PoliticalPartyListTable,
+    DhondtResultTable,
+    LatestResultTable,
+)
+from dhondt.db.exceptions import PoliticalPartyListsAlreadyExist
+
+logger = logging.getLogger(__name__)
+
+
+async def init_async_repository(use_memory_db):
+    """Init the asyncio repository database
+
+    Same as ``init_repository`` for the ASGI application, it must be
+    awaited in the event loop that serves the requests.
+
+    :param use_memory_db: If not None type, the memory database is used.
+    """
+    await DB.init_async(DB_URL, DB_DATABASE, DB_USER, DB_PASSW, memory=use_memory_db)
+
+
+class AsyncDhondtRepository:
+    """
+    Asyncio version of ``DhondtRepository``
+
+    Same methods, arguments and results than the sync repository, awaited on
+    an ``AsyncSession``. Relationships are never loaded lazily, the ones
+    serialized are loaded eagerly. The statements, dictionaries and errors
+    are the ones of the sync repository.
+    """
+
+    def __init__(self, db_session, cache=entity_cache):
+        self.session = db_session
+        # Reads are not cached, writes invalidate the shared entity cache
+        self.cache = cache
+
+    async def _all(self, query):
+        return (await self.session.scalars(query)).all()
+
+    async def get_districts(self, scrutiny_date, district_id, after=None, limit=None):
+        try:
+            return _dicts(
+                await self._all(
+                    _districts_query(scrutiny_date, district_id, after, limit)
+                )
+            )
+        except IntegrityError as e:
+            logger.debug("get_districts IntegrityError: %s", e)
+            return None
+
+    async def get_political_party_lists(
+        self, district_id, pplist_id=None, after=None, limit=None
+    ):
+        try:
+            return _dicts(
+                await self._all(_pplists_query(district_id, pplist_id, after, limit))
+            )
+        except IntegrityError as e:
+            logger.debug("get_political_party_lists IntegrityError: %s", e)
+            return None
+
+    async def create_political_party_list(self, name, electors, district_id):
+        try:
+            record = PoliticalPartyListTable(
+                district_id=district_id,
+                name=name,
+                electors=electors,
+            )
+            self.session.add(record)
+            await self.session.execute(_touch_districts([district_id]))
+            await self.session.commit()
+            return record.dict()
+        except NoReferencedColumnError:
+            return None
+        except IntegrityError as e:
+            logger.debug("create_political_party_list error: %s", e)
+            await self.session.rollback()
+            if _sqlstate(e) == UNIQUE_VIOLATION:
+                raise PoliticalPartyListsAlreadyExist(
+                    f"Political Party Lists with {name=} already exits!"
+                )
+            return None
+
+    async def update_political_party_list(self, pplist_id, **kwargs):
+        try:
+            record = await self.session.get(PoliticalPartyListTable, pplist_id)
+            for argn, argv in kwargs.items():
+                setattr(record, argn, argv)
+            await self.session.execute(_touch_districts([record.district_id]))
+            await self.session.commit()
+            return record.dict()
+        except IntegrityError as e:
+            logger.debug("update_political_party_list error: %s", e)
+            await self.session.rollback()
+            if _sqlstate(e) == UNIQUE_VIOLATION:
+                raise PoliticalPartyListsAlreadyExist(
+                    f"Political Party Lists with {kwargs['name']=} already exits!"
+                )
+            return None
+
+    async def increment_votes(self, district_id, pplist_id, delta):
+        try:
+            result = await self.session.execute(
+                _votes_increment(district_id, pplist_id, delta)
+            )
+            row = result.first()
+            if row is None:
+                result = await self.session.execute(
+                    _pplist_in_district(district_id, pplist_id)
+                )
+                found = result.first()
+                await self.session.rollback()
+            else:
+                await self.session.execute(_touch_districts([district_id]))
+                await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        if row is None:
+            if found is None:
+                logger.debug(
+                    "increment_votes %s not found in %s", pplist_id, district_id
+                )
+                return None
+            raise _votes_out_of_range(pplist_id, delta)
+        return _pplist_row_dict(row)
+
+    async def update_votes(self, votes):
+        """Updates the votes of many political party lists in one transaction
+
+        :param votes: list of dictionary with ``districtId``, ``pplistId`` and
+          ``votes`` keys.
+        @return: list of the political party lists updated, None if any of
+          them is not found in its district.
+        """
+        try:
+            await self.session.execute(
+                VOTES_UPDATE, [_votes_update_params(vote) for vote in votes]
+            )
+            records = await self._all(_pplists_updated_query(votes))
+            if not _votes_in_districts(votes, records):
+                logger.debug("update_votes political party lists not found: %s", votes)
+                await self.session.rollback()
+                return None
+            results = [record.dict() for record in records]
+            district_ids = {vote["districtId"] for vote in votes}
+            await self.session.execute(_touch_districts(district_ids))
+            await self.session.commit()
+            logger.debug("values: %s", results)
+            return results
+        except IntegrityError as e:
+            logger.debug("update_votes IntegrityError: %s", e)
+            await self.session.rollback()
+            return None
+
+    async def import_votes(self, votes, batch_size=IMPORT_BATCH_SIZE):
+        """Imports a stream of votes in one transaction
+
+        Same as ``DhondtRepository.import_votes``, on PostgreSQL the votes
+        are copied with asyncpg ``copy_records_to_table``.
+
+        :param votes: iterable of dictionary with ``districtId``,
+          ``pplistId`` and ``votes`` keys.
+        :param batch_size: votes by executemany UPDATE.
+        @return: dictionary with the quantity of ``rows`` read, political
+          party lists ``updated`` and the ``districtIds`` imported.
+        """
+        rows = 0
+        try:
+            if self.session.get_bind().dialect.name == "postgresql":
+
+                def records():
+                    nonlocal rows
+                    for vote in votes:
+                        rows += 1
+                        yield vote["districtId"], vote["pplistId"], vote["votes"]
+
+                await self.session.execute(VOTES_IMPORT_STAGING)
+                connection = await self.session.connection()
+                raw_connection = await connection.get_raw_connection()
+                await raw_connection.driver_connection.copy_records_to_table(
+                    "votes_import",
+                    records=records(),
+                    columns=["district_id", "pplist_id", "votes"],
+                )
+                updated = (await self.session.execute(VOTES_IMPORT_MERGE)).rowcount
+                district_ids = (
+                    await self.session.scalars(VOTES_IMPORT_TOUCH, {"now": _utcnow()})
+                ).all()
+            else:
+                updated = 0
+                district_ids = set()
+                for batch in _batched(votes, batch_size):
+                    rows += len(batch)
+                    district_ids.update(vote["districtId"] for vote in batch)
+                    result = await self.session.execute(
+                        VOTES_UPDATE, [_votes_update_params(vote) for vote in batch]
+                    )
+                    updated += result.rowcount
+                await self.session.execute(_touch_districts(district_ids))
+            await self.session.commit()
+            result = {
+                "rows": rows,
+                "updated": updated,
+                "districtIds": sorted(district_ids),
+            }
+            logger.debug("import_votes result: %s", result)
+            return result
+        except IntegrityError as e:
+            logger.debug("import_votes IntegrityError: %s", e)
+            await self.session.rollback()
+            return None
+        except Exception:
+            await self.session.rollback()
+            raise
+
+    async def get_scrutinies(
+        self, district_id, scrutiny_id=None, scrutiny_date=None, after=None, limit=None
+    ):
+        try:
+            return _dicts(
+                await self._all(
+                    _scrutinies_query(
+                        district_id, scrutiny_id, scrutiny_date, after, limit
+                    )
+                )
+            )
+        except IntegrityError as e:
+            logger.debug("get_scrutinies IntegrityError: %s", e)
+            return None
+
+    async def create_scrutiny(
+        self, district_id, name, voting_date, scrutiny_date, seats
+    ):
+        try:
+            record = ScrutinyTable(
+                district_id=district_id,
+                voting_date=voting_date,
+                scrutiny_date=scrutiny_date,
+                seats=seats,
+                name=name,
+            )
+            self.session.add(record)
+            await self.session.execute(_touch_districts([district_id]))
+            await self.session.commit()
+            self.cache.invalidate(SCRUTINIES, district_id)
+            self.cache.invalidate(DISTRICTS, None)
+            return record.dict()
+        except IntegrityError as e:
+            logger.debug("create_scrutiny IntegrityError: %s", e)
+            await self.session.rollback()
+            if _sqlstate(e) == FOREIGN_KEY_VIOLATION:
+                return None
+            raise IntegrityError(e)
+        except NoReferencedColumnError:
+            return None
+
+    async def create_dhondt_result(self, scrutiny_id, seats_result):
+        try:
+            record = _dhondt_result_record(scrutiny_id, seats_result)
+            self.session.add(record)
+            await self.session.flush()
+            # The relationships serialized are loaded in the same round trip
+            record = await self.session.scalar(
+                select(DhondtResultTable)
+                .options(*SEATS_RESULT_LOAD_OPTIONS)
+                .filter(DhondtResultTable.id == record.id)
+                .execution_options(populate_existing=True)
+            )
+            result = record.dict()
+            await self.session.execute(
+                _upsert_latest_result(self.session.get_bind().dialect.name, result)
+            )
+            await self.session.execute(_touch_scrutiny(scrutiny_id))
+            await self.session.commit()
+            return result
+        except IntegrityError as e:
+            logger.debug("create_scrutiny IntegrityError: %s", e)
+            await self.session.rollback()
+            if _sqlstate(e) == FOREIGN_KEY_VIOLATION:
+                return None
+            raise IntegrityError(e)
+
+    async def get_calculation_input(self, district_id, scrutiny_id):
+        result = await self.session.execute(
+            _calculation_input_query(district_id, scrutiny_id)
+        )
+        return _calculation_input(result.all())
+
+    async def create_calculated_result(self, scrutiny, seats_result):
+        try:
+            result_date = datetime.now()
+            result_id = (
+                await self.session.execute(
+                    DHONDT_RESULT_INSERT,
+                    {"scrutiny_id": scrutiny["id"], "result_date": result_date},
+                )
+            ).scalar_one()
+            await self.session.execute(
+                SEATS_INSERT, _seats_params(result_id, seats_result)
+            )
+            result = _calculated_result(result_id, result_date, scrutiny, seats_result)
+            await self.session.execute(
+                _upsert_latest_result(self.session.get_bind().dialect.name, result)
+            )
+            await self.session.execute(_touch_scrutiny(scrutiny["id"]))
+            await self.session.commit()
+            return result
+        except IntegrityError as e:
+            logger.debug("create_calculated_result IntegrityError: %s", e)
+            await self.session.rollback()
+            if _sqlstate(e) == FOREIGN_KEY_VIOLATION:
+                return None
+            raise
+
+    async def get_district_version(self, district_id):
+        result = await self.session.execute(_district_version_query(district_id))
+        return _district_version(result.first())
+
+    async def get_scrutiny_version(self, district_id, scrutiny_id):
+        result = await self.session.execute(
+            _scrutiny_version_query(district_id, scrutiny_id)
+        )
+        return _scrutiny_version(result.first())
+
+    async def get_latest_seats_result(self, district_id, scrutiny_id):
+        return _latest_seats_result(
+            await self.session.get(LatestResultTable, scrutiny_id), district_id
+        )
+
+    async def get_latest_result_id(self, scrutiny_id):
+        return await self.session.scalar(_latest_result_id_query(scrutiny_id))
+
+    async def get_seats_results(self, district_id, scrutiny_id, after=None, limit=None):
+        try:
+            return _dicts(
+                await self._all(
+                    _seats_results_query(district_id, scrutiny_id, after, limit)
+                )
+            )
+        except IntegrityError as e:
+            logger.debug("get_seats_results IntegrityError: %s", e)
+            return None
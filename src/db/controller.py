@@ -1,19 +1,45 @@
 import atexit
 import logging
-from contextlib import contextmanager
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
 from urllib.parse import quote_plus as urlquote
 
+from alembic import command
+from alembic.config import Config
 from dhondt.utils import SingletonMeta
-from sqlalchemy import create_engine
+from prometheus_client import Histogram
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
 from sqlalchemy.orm import declarative_base
 from sqlalchemy_utils import database_exists, create_database
 
-
 logger = logging.getLogger(__name__)
 
 DB_CONNECTION_TIMEOUT = 5
 
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") not in ("0", "false", "False")
+# Per statement timeout in milliseconds, 0 disables it
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", "0"))
+# Checkouts waiting longer than this (seconds) are logged as pool exhaustion
+DB_POOL_WAIT_WARNING = float(os.getenv("DB_POOL_WAIT_WARNING", "0.5"))
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(__file__), "migrations")
+# Revision of the schema created by create_all before the migrations
+MIGRATIONS_BASELINE = "5a0c1b7e2d41"
+# PostgreSQL advisory lock serializing the migrations of concurrent workers
+MIGRATIONS_LOCK_KEY = 0x64686F6E6474
+
 
 class DBNotConnectedError(Exception):
     pass
@@ -27,6 +53,157 @@ class DBNoOpenSession(Exception):
     pass
 
 
+class PoolTelemetry:
+    """Counters of the connection pool checkouts
+
+    The time waited for a connection is recorded by ``TimedQueuePool``, so
+    a request stalled by pool exhaustion can be told apart from a slow
+    query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checked_out = 0
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_time = 0.0
+            self.max_wait_time = 0.0
+
+    def on_checkout(self, *args):
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+
+    def on_checkin(self, *args):
+        with self._lock:
+            self.checked_out -= 1
+
+    def record_wait(self, wait_time, timeout=False):
+        with self._lock:
+            self.wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+            if timeout:
+                self.timeouts += 1
+        if wait_time >= DB_POOL_WAIT_WARNING:
+            logger.warning("DB pool checkout waited %.3fs", wait_time)
+
+    def listen(self, engine):
+        event.listen(engine, "checkout", self.on_checkout)
+        event.listen(engine, "checkin", self.on_checkin)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_time": self.wait_time,
+                "max_wait_time": self.max_wait_time,
+            }
+
+
+pool_telemetry = PoolTelemetry()
+
+DB_QUERY_DURATION = Histogram(
+    "dhondt_db_query_duration_seconds",
+    "Duration of the statements executed in the database",
+    ["statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+QUERY_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "COPY")
+
+
+def statement_kind(statement):
+    """Returns the kind of a SQL statement, the label of its metrics"""
+    kind = (statement.split(None, 1) or [""])[0].upper()
+    return kind if kind in QUERY_STATEMENTS else "OTHER"
+
+
+class QueryTimer:
+    """Count and duration of the statements executed while it is the
+    ``current_query_timer``, e.g. by a request"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+current_query_timer = ContextVar("current_query_timer", default=None)
+
+
+class QueryTelemetry:
+    """Count and duration of the statements executed, by kind
+
+    Recorded with the cursor execution events of the engine, so every
+    statement is measured, whether issued by the ORM or Core. They are
+    added to the ``current_query_timer`` too, if any.
+    """
+
+    def before_cursor_execute(self, conn, cursor, statement, *args):
+        conn.info["query_start"] = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, *args):
+        start = conn.info.pop("query_start", None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        DB_QUERY_DURATION.labels(statement_kind(statement)).observe(duration)
+        timer = current_query_timer.get()
+        if timer is not None:
+            timer.count += 1
+            timer.duration += duration
+
+    def listen(self, engine):
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self.after_cursor_execute)
+
+
+query_telemetry = QueryTelemetry()
+
+
+class _TimedCheckoutMixin:
+    """Records in ``pool_telemetry`` the time waited on checkout
+
+    Only checkouts finding the pool exhausted are timed, so opening a new
+    connection is not taken as waiting. ``_do_get`` is a private method of
+    the SQLAlchemy pools, the version is pinned in setup.py because of it.
+    """
+
+    def __init__(self, *args, max_overflow=10, **kwargs):
+        super().__init__(*args, max_overflow=max_overflow, **kwargs)
+        self.max_overflow = max_overflow
+
+    def exhausted(self):
+        """Tells whether a checkout has to wait for a connection checkin"""
+        if self.checkedin() or self.max_overflow < 0:
+            return False
+        return self.checkedout() >= self.size() + self.max_overflow
+
+    def _do_get(self):
+        if not self.exhausted():
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_telemetry.record_wait(time.perf_counter() - start, timeout=True)
+            raise
+        pool_telemetry.record_wait(time.perf_counter() - start)
+        return connection
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    """QueuePool recording in ``pool_telemetry`` the time waited on checkout"""
+
+
+class TimedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    """Asyncio queue pool recording the time waited on checkout"""
+
+
 class DB(SingletonMeta):
     """
     DB class utilities
@@ -42,6 +219,8 @@ class DB(SingletonMeta):
     engine = None
     Base = declarative_base()
     session_factory = None
+    async_engine = None
+    async_session_factory = None
     __session = None
 
     @classmethod
@@ -69,11 +248,17 @@ class DB(SingletonMeta):
                     url=cls.url,
                     database=cls.database,
                 ),
-                connect_args={
-                    "connect_timeout": DB_CONNECTION_TIMEOUT,
-                },
+                connect_args=cls.connect_args(),
                 echo=debug,
+                poolclass=TimedQueuePool,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_pre_ping=DB_POOL_PRE_PING,
             )
+            pool_telemetry.listen(cls.engine)
+            query_telemetry.listen(cls.engine)
 
             if not database_exists(cls.engine.url):
                 logger.debug("No DATABASE, make it!")
@@ -83,7 +268,7 @@ class DB(SingletonMeta):
                 bind=cls.engine,
                 expire_on_commit=False,
             )
-            cls.Base.metadata.create_all(cls.engine)
+            cls.upgrade()
             logger.debug("Database created!")
 
         except Exception as e:
@@ -92,6 +277,148 @@ class DB(SingletonMeta):
 
         atexit.register(cls.cleanup)
 
+    @staticmethod
+    def connect_args():
+        """Returns the psycopg2 connection arguments"""
+        connect_args = {"connect_timeout": DB_CONNECTION_TIMEOUT}
+        if DB_STATEMENT_TIMEOUT:
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT}"
+        return connect_args
+
+    @classmethod
+    def pool_stats(cls):
+        """
+        Returns the live stats of the connection pool
+
+        ``size`` and ``overflow`` are only reported by queue pools.
+        """
+        stats = pool_telemetry.stats()
+        pool = cls.engine.pool if cls.engine else None
+        if isinstance(pool, QueuePool):
+            stats["size"] = pool.size()
+            stats["checked_out"] = pool.checkedout()
+            stats["overflow"] = max(pool.overflow(), 0)
+            stats["checked_in"] = pool.checkedin()
+        return stats
+
+    @classmethod
+    def upgrade(cls, revision="head"):
+        """
+        Runs the alembic migrations of the database up to the revision
+
+        Databases created with create_all (no alembic_version table) are
+        stamped with the baseline revision first.
+
+        :param revision: target revision
+        """
+        with cls.engine.begin() as connection:
+            cls.run_migrations(connection, revision)
+
+    @staticmethod
+    def run_migrations(connection, revision="head"):
+        """
+        Runs the alembic migrations with the given connection
+
+        On PostgreSQL the migrations hold a transaction level advisory lock,
+        so the workers starting together run them one after the other and
+        the later ones find the database upgraded.
+
+        :param connection: SQLAlchemy (sync) connection, in a transaction
+        :param revision: target revision
+        """
+        if connection.dialect.name == "postgresql":
+            connection.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"),
+                {"key": MIGRATIONS_LOCK_KEY},
+            )
+        config = Config()
+        config.set_main_option("script_location", MIGRATIONS_PATH)
+        config.attributes["connection"] = connection
+        tables = inspect(connection).get_table_names()
+        if "alembic_version" not in tables and "district" in tables:
+            logger.debug("Stamping database with %s", MIGRATIONS_BASELINE)
+            command.stamp(config, MIGRATIONS_BASELINE)
+        command.upgrade(config, revision)
+
+    ###############
+    # Asyncio database methods (ASGI application)
+    @classmethod
+    async def init_async(
+        cls, url, database, user=None, passw=None, debug=False, memory=False
+    ):
+        """
+        Creates the asyncio engine, asyncpg on PostgreSQL and aiosqlite for
+        the memory database, and runs the migrations
+
+        :param url: IP:PORT
+        :param database: database name
+        :param user: database user to login
+        :param passw: database passw to login
+        """
+        if cls.async_engine:
+            return
+        if memory:
+            # A single connection, so every session sees the same database
+            cls.async_engine = create_async_engine(
+                "sqlite+aiosqlite://",
+                poolclass=StaticPool,
+                connect_args={"check_same_thread": False},
+            )
+        else:
+            logger.debug(
+                "Init async DB. Server: %s, database : %s, usuario: %s",
+                url,
+                database,
+                user,
+            )
+            cls.async_engine = create_async_engine(
+                "postgresql+asyncpg://{user}:{passw}@{url}/{database}".format(
+                    user=user,
+                    passw=urlquote(passw),
+                    url=url,
+                    database=database,
+                ),
+                connect_args=cls.async_connect_args(),
+                echo=debug,
+                poolclass=TimedAsyncQueuePool,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_pre_ping=DB_POOL_PRE_PING,
+            )
+        pool_telemetry.listen(cls.async_engine.sync_engine)
+        query_telemetry.listen(cls.async_engine.sync_engine)
+        cls.async_session_factory = async_sessionmaker(
+            bind=cls.async_engine,
+            expire_on_commit=False,
+        )
+        async with cls.async_engine.begin() as connection:
+            await connection.run_sync(cls.run_migrations)
+
+    @staticmethod
+    def async_connect_args():
+        """Returns the asyncpg connection arguments"""
+        connect_args = {"timeout": DB_CONNECTION_TIMEOUT}
+        if DB_STATEMENT_TIMEOUT:
+            connect_args["server_settings"] = {
+                "statement_timeout": str(DB_STATEMENT_TIMEOUT)
+            }
+        return connect_args
+
+    @classmethod
+    def get_async_session(cls):
+        if cls.async_session_factory is None:
+            raise DBNotConnectedError()
+        return cls.async_session_factory()
+
+    @classmethod
+    async def async_cleanup(cls):
+        if cls.async_engine:
+            await cls.async_engine.dispose()
+            cls.async_engine = None
+            cls.async_session_factory = None
+
     @classmethod
     def get_open_session(cls):
         return cls.__session
@@ -117,11 +444,13 @@ class DB(SingletonMeta):
         """
         if not cls.engine:
             cls.engine = create_engine("sqlite:///:memory:")
+            pool_telemetry.listen(cls.engine)
+            query_telemetry.listen(cls.engine)
             cls.session_factory = sessionmaker(
                 bind=cls.engine,
                 expire_on_commit=False,
             )
-            cls.Base.metadata.create_all(cls.engine)
+            cls.upgrade()
 
     @classmethod
     def drop_db_memory(cls):
@@ -135,3 +464,12 @@ def get_db_session():
         yield session
     finally:
         session.close()
+
+
+@asynccontextmanager
+async def get_async_db_session():
+    session = DB.get_async_session()
+    try:
+        yield session
+    finally:
+        await session.close()
@@ -1,22 +1,30 @@
 import os
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 
+from sqlalchemy import bindparam, insert, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.exc import (
     NoReferencedColumnError,
     IntegrityError,
 )
-from psycopg2.errors import UniqueViolation, ForeignKeyViolation
 
 from dhondt.db.controller import DB
+from dhondt.db.entity_cache import (
+    entity_cache,
+    DISTRICTS,
+    SCRUTINIES,
+)
 from dhondt.db.tabledefs import (
     ScrutinyTable,
     DistrictTable,
     PoliticalPartyListTable,
     SeatsPoliticalPartiesTable,
     DhondtResultTable,
+    LatestResultTable,
 )
-from dhondt.db.exceptions import PoliticalPartyListsAlreadyExist
+from dhondt.db.exceptions import PoliticalPartyListsAlreadyExist, VotesOutOfRange
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +33,445 @@ DB_DATABASE = os.getenv("DB_NAME", "dhondt")
 DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASSW = os.getenv("DB_PASS", "postgres")
 
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+
+# Largest votes of a political party list, the column is an INTEGER
+MAX_VOTES = 2**31 - 1
+# Largest id of the INTEGER primary keys
+MAX_ID = 2**31 - 1
+
+# SQLSTATE of the integrity errors, reported by psycopg2 (pgcode) and by
+# the SQLAlchemy asyncpg adapter (sqlstate)
+UNIQUE_VIOLATION = "23505"
+FOREIGN_KEY_VIOLATION = "23503"
+
+# executemany UPDATE of the votes of a political party list in its district
+VOTES_UPDATE = (
+    update(PoliticalPartyListTable.__table__)
+    .where(
+        PoliticalPartyListTable.id == bindparam("b_pplist_id"),
+        PoliticalPartyListTable.district_id == bindparam("b_district_id"),
+    )
+    .values(votes=bindparam("b_votes"))
+)
+
+# executemany UPDATE adding votes to a political party list in its district
+VOTES_INCREMENT = (
+    update(PoliticalPartyListTable.__table__)
+    .where(
+        PoliticalPartyListTable.id == bindparam("b_pplist_id"),
+        PoliticalPartyListTable.district_id == bindparam("b_district_id"),
+    )
+    .values(votes=PoliticalPartyListTable.votes + bindparam("b_votes"))
+)
+
+# PostgreSQL staging table and set based merge used by the votes import
+VOTES_IMPORT_STAGING = text(
+    "CREATE TEMPORARY TABLE votes_import "
+    "(line BIGSERIAL, district_id INTEGER, pplist_id INTEGER, votes INTEGER) "
+    "ON COMMIT DROP"
+)
+VOTES_IMPORT_COPY = (
+    "COPY votes_import (district_id, pplist_id, votes) FROM STDIN WITH (FORMAT csv)"
+)
+VOTES_IMPORT_MERGE = text(
+    "UPDATE politicalpartylist AS ppl SET votes = last.votes "
+    "FROM (SELECT DISTINCT ON (pplist_id, district_id) pplist_id, district_id, votes "
+    "FROM votes_import ORDER BY pplist_id, district_id, line DESC) AS last "
+    "WHERE ppl.id = last.pplist_id AND ppl.district_id = last.district_id"
+)
+
+VOTES_IMPORT_TOUCH = text(
+    "UPDATE district SET version = version + 1, updated_at = :now "
+    "WHERE id IN (SELECT DISTINCT district_id FROM votes_import) RETURNING id"
+)
+
+
+# Relationships serialized by DhondtResultTable.dict(), loaded eagerly to
+# avoid a lazy load for each result and seat
+SEATS_RESULT_LOAD_OPTIONS = (
+    joinedload(DhondtResultTable.scrutiny),
+    selectinload(DhondtResultTable.seatspoliticalparties).joinedload(
+        SeatsPoliticalPartiesTable.politicalpartylist
+    ),
+)
+
+
+def _paginate(query, column, after=None, limit=None):
+    """Orders the query by a unique column and applies a keyset page
+
+    :param column: unique column used as ordering and cursor.
+    :param after: cursor, only rows with greater column are returned.
+    :param limit: maximum quantity of rows returned.
+    """
+    query = query.order_by(column)
+    if after is not None:
+        query = query.filter(column > after)
+    return query.limit(limit)
+
+
+def _sqlstate(error):
+    orig = error.orig
+    return getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+
+
+def _dicts(records):
+    """Serialized records, None when there is not any"""
+    logger.debug("records: %s", records)
+    results = [record.dict() for record in records] if records else None
+    logger.debug("values: %s", results)
+    return results
+
+
+def _districts_query(scrutiny_date, district_id, after=None, limit=None):
+    query = select(DistrictTable)
+    if district_id:
+        logger.debug("get_districts with district_id: %s", district_id)
+        query = query.filter(district_id == DistrictTable.id)
+    if scrutiny_date:
+        logger.debug("get_districts with scrutiny_date: %s", scrutiny_date)
+        query = query.join(
+            ScrutinyTable, ScrutinyTable.district_id == DistrictTable.id
+        ).filter(scrutiny_date == ScrutinyTable.scrutiny_date)
+    return _paginate(query, DistrictTable.id, after, limit)
+
+
+def _pplists_query(district_id, pplist_id=None, after=None, limit=None):
+    query = (
+        select(PoliticalPartyListTable)
+        .join(DistrictTable, DistrictTable.id == PoliticalPartyListTable.district_id)
+        .filter(district_id == DistrictTable.id)
+    )
+    if pplist_id:
+        logger.debug("get_political_party_lists with pplist_id: %s", pplist_id)
+        query = query.filter(pplist_id == PoliticalPartyListTable.id)
+    return _paginate(query, PoliticalPartyListTable.id, after, limit)
+
+
+def _scrutinies_query(
+    district_id, scrutiny_id=None, scrutiny_date=None, after=None, limit=None
+):
+    query = (
+        select(ScrutinyTable)
+        .join(DistrictTable, DistrictTable.id == ScrutinyTable.district_id)
+        .filter(district_id == DistrictTable.id)
+    )
+    if scrutiny_id is not None:
+        logger.debug("get_scrutinies with scrutiny_id: %s", scrutiny_id)
+        query = query.filter(scrutiny_id == ScrutinyTable.id)
+    if scrutiny_date:
+        logger.debug("get_scrutinies with scrutiny_date: %s", scrutiny_date)
+        query = query.filter(scrutiny_date == ScrutinyTable.scrutiny_date)
+    return _paginate(query, ScrutinyTable.id, after, limit)
+
+
+def _seats_results_query(district_id, scrutiny_id, after=None, limit=None):
+    logger.debug(
+        "get_seats_results with district_id %d and scrutiny_id: %s",
+        district_id,
+        scrutiny_id,
+    )
+    query = (
+        select(DhondtResultTable)
+        .options(*SEATS_RESULT_LOAD_OPTIONS)
+        .filter(DhondtResultTable.scrutiny_id == scrutiny_id)
+    )
+    return _paginate(query, DhondtResultTable.id, after, limit)
+
+
+def _pplists_updated_query(votes):
+    """SELECT of the political party lists of the votes, reloaded after
+    their UPDATE"""
+    return (
+        select(PoliticalPartyListTable)
+        .filter(PoliticalPartyListTable.id.in_({vote["pplistId"] for vote in votes}))
+        .order_by(PoliticalPartyListTable.id)
+        .execution_options(populate_existing=True)
+    )
+
+
+def _votes_in_districts(votes, records):
+    """Tells whether every list of the votes is in its district"""
+    districts = {record.id: record.district_id for record in records}
+    return all(districts.get(vote["pplistId"]) == vote["districtId"] for vote in votes)
+
+
+def _dhondt_result_record(scrutiny_id, seats_result):
+    record = DhondtResultTable(scrutiny_id=scrutiny_id, result_date=datetime.now())
+    for res in seats_result:
+        record.seatspoliticalparties.append(
+            SeatsPoliticalPartiesTable(
+                politicalpartylist_id=res["pplistId"], seats=res["seats"]
+            )
+        )
+    return record
+
+
+def _district_version_query(district_id):
+    return select(DistrictTable.version, DistrictTable.updated_at).filter(
+        DistrictTable.id == district_id
+    )
+
+
+def _district_version(record):
+    if record is None:
+        return None
+    return {"version": record.version, "updatedAt": record.updated_at}
+
+
+def _scrutiny_version_query(district_id, scrutiny_id):
+    return (
+        select(
+            DistrictTable.version,
+            DistrictTable.updated_at,
+            ScrutinyTable.version,
+            ScrutinyTable.updated_at,
+        )
+        .join(ScrutinyTable, ScrutinyTable.district_id == DistrictTable.id)
+        .filter(DistrictTable.id == district_id, ScrutinyTable.id == scrutiny_id)
+    )
+
+
+def _scrutiny_version(record):
+    if record is None:
+        return None
+    district_version, district_date, scrutiny_version, scrutiny_date = record
+    dates = [x for x in (district_date, scrutiny_date) if x is not None]
+    return {
+        "version": [district_version, scrutiny_version],
+        "updatedAt": max(dates) if dates else None,
+    }
+
+
+def _latest_result_id_query(scrutiny_id):
+    return select(LatestResultTable.dhondtresult_id).filter(
+        LatestResultTable.scrutiny_id == scrutiny_id
+    )
+
+
+def _latest_seats_result(record, district_id):
+    if record is None or record.district_id != district_id:
+        return None
+    return record.dict()
+
+
+def _votes_out_of_range(pplist_id, delta):
+    return VotesOutOfRange(f"Votes of {pplist_id=} over {MAX_VOTES} adding {delta=}")
+
+
+def _utcnow():
+    # DateTime columns are naive, versions are dated in UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _touch_districts(district_ids):
+    """UPDATE bumping the version of the districts written"""
+    return (
+        update(DistrictTable.__table__)
+        .where(DistrictTable.id.in_(district_ids))
+        .values(version=DistrictTable.version + 1, updated_at=_utcnow())
+    )
+
+
+def _touch_scrutiny(scrutiny_id):
+    """UPDATE bumping the version of the scrutiny results"""
+    return (
+        update(ScrutinyTable.__table__)
+        .where(ScrutinyTable.id == scrutiny_id)
+        .values(version=ScrutinyTable.version + 1, updated_at=_utcnow())
+    )
+
+
+# Writes of a calculated result, the seats are inserted by executemany
+DHONDT_RESULT_INSERT = insert(DhondtResultTable.__table__).returning(
+    DhondtResultTable.id
+)
+SEATS_INSERT = insert(SeatsPoliticalPartiesTable.__table__)
+
+
+def _calculation_input_query(district_id, scrutiny_id):
+    """SELECT of the scrutiny joined with the political party lists of its
+    district, one row by list (a single one without list if there is not
+    any)"""
+    return (
+        select(ScrutinyTable, PoliticalPartyListTable)
+        .outerjoin(
+            PoliticalPartyListTable,
+            PoliticalPartyListTable.district_id == ScrutinyTable.district_id,
+        )
+        .filter(
+            ScrutinyTable.id == scrutiny_id, ScrutinyTable.district_id == district_id
+        )
+        .order_by(PoliticalPartyListTable.id)
+    )
+
+
+def _calculation_input(rows):
+    if not rows:
+        return None
+    return {
+        "scrutiny": rows[0][0].dict(),
+        "politicalPartyLists": [pplist.dict() for _, pplist in rows if pplist],
+    }
+
+
+def _calculated_result(result_id, result_date, scrutiny, seats_result):
+    """Result of a calculation, serialized like ``DhondtResultTable.dict()``
+    from the calculation input instead of reloading its relationships"""
+    return {
+        "resultId": result_id,
+        "districtId": scrutiny["districtId"],
+        "scrutinyId": scrutiny["id"],
+        "scrutinyName": scrutiny["name"],
+        "calculationDate": result_date,
+        "seatsResults": [
+            {
+                "pplistId": res["pplistId"],
+                "seats": res["seats"],
+                "pplistName": res["pplistName"],
+            }
+            for res in seats_result
+        ],
+    }
+
+
+def _seats_params(result_id, seats_result):
+    return [
+        {
+            "dhondtresult_id": result_id,
+            "politicalpartylist_id": res["pplistId"],
+            "seats": res["seats"],
+        }
+        for res in seats_result
+    ]
+
+
+def _upsert_latest_result(dialect_name, result):
+    """INSERT ... ON CONFLICT of the latest result of the scrutiny
+
+    A concurrent result replaces it only when it is newer, so the row is
+    always the greatest result id of the scrutiny.
+
+    :param dialect_name: ``postgresql`` or ``sqlite``.
+    :param result: result as returned by ``DhondtResultTable.dict()``.
+    """
+    insert = (postgresql if dialect_name == "postgresql" else sqlite).insert
+    statement = insert(LatestResultTable).values(
+        scrutiny_id=result["scrutinyId"],
+        dhondtresult_id=result["resultId"],
+        district_id=result["districtId"],
+        scrutiny_name=result["scrutinyName"],
+        result_date=result["calculationDate"],
+        seats_results=result["seatsResults"],
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[LatestResultTable.scrutiny_id],
+        set_={
+            column: statement.excluded[column]
+            for column in (
+                "dhondtresult_id",
+                "district_id",
+                "scrutiny_name",
+                "result_date",
+                "seats_results",
+            )
+        },
+        where=LatestResultTable.dhondtresult_id < statement.excluded.dhondtresult_id,
+    )
+
+
+def _votes_increment(district_id, pplist_id, delta):
+    """UPDATE ... RETURNING adding the votes on the server, so concurrent
+    increments are not lost and no row is read before
+
+    The list is not updated when the votes would be over ``MAX_VOTES``.
+    """
+    return (
+        update(PoliticalPartyListTable.__table__)
+        .where(
+            PoliticalPartyListTable.id == pplist_id,
+            PoliticalPartyListTable.district_id == district_id,
+            PoliticalPartyListTable.votes <= MAX_VOTES - delta,
+        )
+        .values(votes=PoliticalPartyListTable.votes + delta)
+        .returning(
+            PoliticalPartyListTable.id,
+            PoliticalPartyListTable.district_id,
+            PoliticalPartyListTable.name,
+            PoliticalPartyListTable.votes,
+            PoliticalPartyListTable.electors,
+        )
+    )
+
+
+def _pplist_in_district(district_id, pplist_id):
+    return select(PoliticalPartyListTable.id).where(
+        PoliticalPartyListTable.id == pplist_id,
+        PoliticalPartyListTable.district_id == district_id,
+    )
+
+
+def _pplist_row_dict(row):
+    # Same keys than PoliticalPartyListTable.dict()
+    return {
+        "id": row.id,
+        "districtId": row.district_id,
+        "name": row.name,
+        "votes": row.votes,
+        "electors": row.electors,
+    }
+
+
+def _votes_update_params(vote):
+    return {
+        "b_pplist_id": vote["pplistId"],
+        "b_district_id": vote["districtId"],
+        "b_votes": vote["votes"],
+    }
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _LinesStream:
+    """Read only file like object over an iterator of text lines
+
+    Used as ``COPY FROM STDIN`` input, so lines are consumed on demand.
+    The driver aborts the copy with its own error when ``read`` raises, the
+    original one is kept in ``error``.
+    """
+
+    def __init__(self, lines):
+        self._lines = lines
+        self._buffer = ""
+        self.error = None
+
+    def _next_line(self):
+        try:
+            return next(self._lines, None)
+        except Exception as e:
+            self.error = e
+            raise
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = self._next_line()
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
 
 def init_repository(use_memory_db):
     """Init the repository database
@@ -49,52 +496,38 @@ class DhondtRepository:
     The class interacts with the repository controller through database session to perform actions, which is provided by the constructor class call.
     """
 
-    def __init__(self, db_session):
+    def __init__(self, db_session, cache=entity_cache):
         self.session = db_session
+        self.cache = cache
 
-    def get_districts(self, scrutiny_date, district_id):
+    def get_districts(self, scrutiny_date, district_id, after=None, limit=None):
+        return self.cache.get_or_load(
+            DISTRICTS,
+            None,
+            (scrutiny_date, district_id, after, limit),
+            lambda: self._load_districts(scrutiny_date, district_id, after, limit),
+        )
+
+    def _load_districts(self, scrutiny_date, district_id, after, limit):
         try:
-            query = self.session.query(DistrictTable)
-            if district_id:
-                logger.debug("get_districts with district_id: %s", district_id)
-                query = query.filter(district_id == DistrictTable.id)
-            if scrutiny_date:
-                logger.debug("get_districts with scrutiny_date: %s", scrutiny_date)
-                query = query.join(
-                    ScrutinyTable, ScrutinyTable.district_id == DistrictTable.id
-                ).filter(scrutiny_date == ScrutinyTable.scrutiny_date)
-
-            records = query.all()
-            logger.debug("records: %s", records)
-            results = None
-            if records:
-                results = [record.dict() for record in records]
-            logger.debug("values: %s", results)
-            return results
+            return _dicts(
+                self.session.scalars(
+                    _districts_query(scrutiny_date, district_id, after, limit)
+                ).all()
+            )
         except IntegrityError as e:
             logger.debug("get_districts IntegrityError: %s", e)
             return None
 
-    def get_political_party_lists(self, district_id, pplist_id=None):
+    def get_political_party_lists(
+        self, district_id, pplist_id=None, after=None, limit=None
+    ):
         try:
-            query = (
-                self.session.query(PoliticalPartyListTable)
-                .join(
-                    DistrictTable,
-                    DistrictTable.id == PoliticalPartyListTable.district_id,
-                )
-                .filter(district_id == DistrictTable.id)
+            return _dicts(
+                self.session.scalars(
+                    _pplists_query(district_id, pplist_id, after, limit)
+                ).all()
             )
-            if pplist_id:
-                logger.debug("get_political_party_lists with pplist_id: %s", pplist_id)
-                query = query.filter(pplist_id == PoliticalPartyListTable.id)
-            records = query.all()
-            logger.debug("records: %s", records)
-            results = None
-            if records:
-                results = [record.dict() for record in records]
-            logger.debug("values: %s", results)
-            return results
         except IntegrityError as e:
             logger.debug("get_political_party_lists IntegrityError: %s", e)
             return None
@@ -107,13 +540,15 @@ class DhondtRepository:
                 electors=electors,
             )
             self.session.add(record)
+            self.session.execute(_touch_districts([district_id]))
             self.session.commit()
             return record.dict()
         except NoReferencedColumnError:
             return None
         except IntegrityError as e:
             logger.debug("create_political_party_list error: %s", e)
-            if isinstance(e.orig, UniqueViolation):
+            self.session.rollback()
+            if _sqlstate(e) == UNIQUE_VIOLATION:
                 raise PoliticalPartyListsAlreadyExist(
                     f"Political Party Lists with {name=} already exits!"
                 )
@@ -121,43 +556,194 @@ class DhondtRepository:
 
     def update_political_party_list(self, pplist_id, **kwargs):
         try:
-            record = (
-                self.session.query(PoliticalPartyListTable)
-                .filter(pplist_id == PoliticalPartyListTable.id)
-                .first()
-            )
+            record = self.session.get(PoliticalPartyListTable, pplist_id)
             for argn, argv in kwargs.items():
                 setattr(record, argn, argv)
+            self.session.execute(_touch_districts([record.district_id]))
             self.session.commit()
             return record.dict()
         except IntegrityError as e:
             logger.debug("update_political_party_list error: %s", e)
-            if isinstance(e.orig, UniqueViolation):
+            self.session.rollback()
+            if _sqlstate(e) == UNIQUE_VIOLATION:
                 raise PoliticalPartyListsAlreadyExist(
                     f"Political Party Lists with {kwargs['name']=} already exits!"
                 )
             return None
 
-    def get_scrutinies(self, district_id, scrutiny_id=None, scrutiny_date=None):
+    def increment_votes(self, district_id, pplist_id, delta):
+        """Adds votes to a political party list in a single statement
+
+        @return: the political party list updated, None if it is not found
+          in the district.
+        @raise VotesOutOfRange: the votes would be over ``MAX_VOTES``.
+        """
+        try:
+            row = self.session.execute(
+                _votes_increment(district_id, pplist_id, delta)
+            ).first()
+            if row is None:
+                found = self.session.execute(
+                    _pplist_in_district(district_id, pplist_id)
+                ).first()
+                self.session.rollback()
+            else:
+                self.session.execute(_touch_districts([district_id]))
+                self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        if row is None:
+            if found is None:
+                logger.debug(
+                    "increment_votes %s not found in %s", pplist_id, district_id
+                )
+                return None
+            raise _votes_out_of_range(pplist_id, delta)
+        return _pplist_row_dict(row)
+
+    def update_votes(self, votes):
+        """Updates the votes of many political party lists in one transaction
+
+        :param votes: list of dictionary with ``districtId``, ``pplistId`` and
+          ``votes`` keys.
+        @return: list of the political party lists updated, None if any of
+          them is not found in its district.
+        """
         try:
-            query = (
-                self.session.query(ScrutinyTable)
-                .join(DistrictTable, DistrictTable.id == ScrutinyTable.district_id)
-                .filter(district_id == DistrictTable.id)
+            self.session.execute(
+                VOTES_UPDATE, [_votes_update_params(vote) for vote in votes]
             )
-            if scrutiny_id is not None:
-                logger.debug("get_scrutinies with scrutiny_id: %s", scrutiny_id)
-                query = query.filter(scrutiny_id == ScrutinyTable.id)
-            if scrutiny_date:
-                logger.debug("get_scrutinies with scrutiny_date: %s", scrutiny_date)
-                query = query.filter(scrutiny_date == ScrutinyTable.scrutiny_date)
-            records = query.all()
-            logger.debug("records: %s", records)
-            results = None
-            if records:
-                results = [record.dict() for record in records]
+            records = self.session.scalars(_pplists_updated_query(votes)).all()
+            if not _votes_in_districts(votes, records):
+                logger.debug("update_votes political party lists not found: %s", votes)
+                self.session.rollback()
+                return None
+            results = [record.dict() for record in records]
+            district_ids = {vote["districtId"] for vote in votes}
+            self.session.execute(_touch_districts(district_ids))
+            self.session.commit()
             logger.debug("values: %s", results)
             return results
+        except IntegrityError as e:
+            logger.debug("update_votes IntegrityError: %s", e)
+            self.session.rollback()
+            return None
+
+    def write_votes(self, sets, increments):
+        """Sets and adds the votes of many political party lists in one
+        transaction, lists not found in its district are ignored
+
+        :param sets: list of dictionary with ``districtId``, ``pplistId`` and
+          ``votes`` keys.
+        :param increments: same as ``sets`` with the votes to add.
+        @return: quantity of political party lists updated.
+        """
+        try:
+            updated = 0
+            for statement, votes in (
+                (VOTES_UPDATE, sets),
+                (VOTES_INCREMENT, increments),
+            ):
+                if votes:
+                    updated += self.session.execute(
+                        statement, [_votes_update_params(vote) for vote in votes]
+                    ).rowcount
+            district_ids = {vote["districtId"] for vote in sets + increments}
+            self.session.execute(_touch_districts(district_ids))
+            self.session.commit()
+            return updated
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def import_votes(self, votes, batch_size=IMPORT_BATCH_SIZE):
+        """Imports a stream of votes in one transaction
+
+        On PostgreSQL the votes are copied (``COPY``) into a staging table
+        and merged into the political party lists with a single UPDATE,
+        otherwise they are updated by batches of executemany UPDATEs. The
+        votes are consumed lazily, so memory does not depend on its size.
+        Votes of political party lists not found in its district are
+        ignored, when a list is repeated the last votes win.
+
+        :param votes: iterable of dictionary with ``districtId``,
+          ``pplistId`` and ``votes`` keys.
+        :param batch_size: votes by executemany UPDATE.
+        @return: dictionary with the quantity of ``rows`` read, political
+          party lists ``updated`` and the ``districtIds`` imported.
+        """
+        rows = 0
+        try:
+            if self.session.get_bind().dialect.name == "postgresql":
+
+                def lines():
+                    nonlocal rows
+                    for vote in votes:
+                        rows += 1
+                        yield f"{vote['districtId']},{vote['pplistId']},{vote['votes']}\n"
+
+                self.session.execute(VOTES_IMPORT_STAGING)
+                cursor = self.session.connection().connection.cursor()
+                stream = _LinesStream(lines())
+                try:
+                    cursor.copy_expert(VOTES_IMPORT_COPY, stream)
+                except Exception as e:
+                    # e.g. QueryCanceled, raised instead of a VoteImportError
+                    if stream.error is not None:
+                        raise stream.error from e
+                    raise
+                updated = self.session.execute(VOTES_IMPORT_MERGE).rowcount
+                district_ids = self.session.scalars(
+                    VOTES_IMPORT_TOUCH, {"now": _utcnow()}
+                ).all()
+            else:
+                updated = 0
+                district_ids = set()
+                for batch in _batched(votes, batch_size):
+                    rows += len(batch)
+                    district_ids.update(vote["districtId"] for vote in batch)
+                    updated += self.session.execute(
+                        VOTES_UPDATE, [_votes_update_params(vote) for vote in batch]
+                    ).rowcount
+                self.session.execute(_touch_districts(district_ids))
+            self.session.commit()
+            result = {
+                "rows": rows,
+                "updated": updated,
+                "districtIds": sorted(district_ids),
+            }
+            logger.debug("import_votes result: %s", result)
+            return result
+        except IntegrityError as e:
+            logger.debug("import_votes IntegrityError: %s", e)
+            self.session.rollback()
+            return None
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def get_scrutinies(
+        self, district_id, scrutiny_id=None, scrutiny_date=None, after=None, limit=None
+    ):
+        return self.cache.get_or_load(
+            SCRUTINIES,
+            district_id,
+            (scrutiny_id, scrutiny_date, after, limit),
+            lambda: self._load_scrutinies(
+                district_id, scrutiny_id, scrutiny_date, after, limit
+            ),
+        )
+
+    def _load_scrutinies(self, district_id, scrutiny_id, scrutiny_date, after, limit):
+        try:
+            return _dicts(
+                self.session.scalars(
+                    _scrutinies_query(
+                        district_id, scrutiny_id, scrutiny_date, after, limit
+                    )
+                ).all()
+            )
         except IntegrityError as e:
             logger.debug("get_scrutinies IntegrityError: %s", e)
             return None
@@ -172,11 +758,16 @@ class DhondtRepository:
                 name=name,
             )
             self.session.add(record)
+            self.session.execute(_touch_districts([district_id]))
             self.session.commit()
+            # Districts are filtered by its scrutiny dates
+            self.cache.invalidate(SCRUTINIES, district_id)
+            self.cache.invalidate(DISTRICTS, None)
             return record.dict()
         except IntegrityError as e:
             logger.debug("create_scrutiny IntegrityError: %s", e)
-            if isinstance(e.orig, ForeignKeyViolation):
+            self.session.rollback()
+            if _sqlstate(e) == FOREIGN_KEY_VIOLATION:
                 return None
             raise IntegrityError(e)
         except NoReferencedColumnError:
@@ -184,42 +775,113 @@ class DhondtRepository:
 
     def create_dhondt_result(self, scrutiny_id, seats_result):
         try:
-            record = DhondtResultTable(
-                scrutiny_id=scrutiny_id, result_date=datetime.now()
-            )
-            for res in seats_result:
-                record.seatspoliticalparties.append(
-                    SeatsPoliticalPartiesTable(
-                        politicalpartylist_id=res["pplistId"], seats=res["seats"]
-                    )
-                )
+            record = _dhondt_result_record(scrutiny_id, seats_result)
             self.session.add(record)
+            self.session.flush()
+            result = record.dict()
+            # The latest result is replaced in the same transaction
+            self.session.execute(
+                _upsert_latest_result(self.session.get_bind().dialect.name, result)
+            )
+            self.session.execute(_touch_scrutiny(scrutiny_id))
             self.session.commit()
-            return record.dict()
+            return result
         except IntegrityError as e:
             logger.debug("create_scrutiny IntegrityError: %s", e)
-            if isinstance(e.orig, ForeignKeyViolation):
+            self.session.rollback()
+            if _sqlstate(e) == FOREIGN_KEY_VIOLATION:
                 return None
             raise IntegrityError(e)
 
-    def get_seats_results(self, district_id, scrutiny_id, limit=None):
+    def get_calculation_input(self, district_id, scrutiny_id):
+        """Returns the scrutiny and the political party lists of its district
+        read in a single query
+
+        Not cached, the votes of the lists must be the committed ones.
+
+        @return: dictionary with ``scrutiny`` and ``politicalPartyLists``
+          keys, None if the scrutiny is not found in the district.
+        """
+        return _calculation_input(
+            self.session.execute(
+                _calculation_input_query(district_id, scrutiny_id)
+            ).all()
+        )
+
+    def create_calculated_result(self, scrutiny, seats_result):
+        """Writes the result of a calculation with Core statements
+
+        The result row is inserted returning its id, the seats with one
+        executemany and the response is built from the arguments, so no
+        relationship is loaded.
+
+        :param scrutiny: scrutiny as returned by ``get_calculation_input``.
+        :param seats_result: list of dictionary with ``pplistId``,
+          ``pplistName`` and ``seats`` keys.
+        @return: the result as returned by ``create_dhondt_result``, None if
+          the scrutiny or any of the lists is not found.
+        """
         try:
-            logger.debug(
-                "get_seats_results with district_id %d and scrutiny_id: %s",
-                district_id,
-                scrutiny_id,
-            )
-            records = (
-                self.session.query(DhondtResultTable)
-                .filter(DhondtResultTable.scrutiny_id == scrutiny_id)
-                .limit(limit)
-                .all()
+            result_date = datetime.now()
+            result_id = self.session.execute(
+                DHONDT_RESULT_INSERT,
+                {"scrutiny_id": scrutiny["id"], "result_date": result_date},
+            ).scalar_one()
+            self.session.execute(SEATS_INSERT, _seats_params(result_id, seats_result))
+            result = _calculated_result(result_id, result_date, scrutiny, seats_result)
+            self.session.execute(
+                _upsert_latest_result(self.session.get_bind().dialect.name, result)
             )
-            result = None
-            if records:
-                result = [res.dict() for res in records]
-            logger.debug("result: %s", result)
+            self.session.execute(_touch_scrutiny(scrutiny["id"]))
+            self.session.commit()
             return result
+        except IntegrityError as e:
+            logger.debug("create_calculated_result IntegrityError: %s", e)
+            self.session.rollback()
+            if _sqlstate(e) == FOREIGN_KEY_VIOLATION:
+                return None
+            raise
+
+    def get_district_version(self, district_id):
+        """Returns the version of the district, None if it is not found
+
+        @return: dictionary with ``version`` and ``updatedAt`` keys.
+        """
+        return _district_version(
+            self.session.execute(_district_version_query(district_id)).first()
+        )
+
+    def get_scrutiny_version(self, district_id, scrutiny_id):
+        """Returns the version of the scrutiny results, made of the district
+        and scrutiny versions, None if it is not found
+
+        @return: dictionary with ``version`` and ``updatedAt`` keys.
+        """
+        return _scrutiny_version(
+            self.session.execute(
+                _scrutiny_version_query(district_id, scrutiny_id)
+            ).first()
+        )
+
+    def get_latest_seats_result(self, district_id, scrutiny_id):
+        """Returns the latest result of the scrutiny, None if it is not found
+        or not calculated yet"""
+        return _latest_seats_result(
+            self.session.get(LatestResultTable, scrutiny_id), district_id
+        )
+
+    def get_latest_result_id(self, scrutiny_id):
+        """Returns the id of the latest result of the scrutiny, None if it is
+        not calculated yet"""
+        return self.session.scalar(_latest_result_id_query(scrutiny_id))
+
+    def get_seats_results(self, district_id, scrutiny_id, after=None, limit=None):
+        try:
+            return _dicts(
+                self.session.scalars(
+                    _seats_results_query(district_id, scrutiny_id, after, limit)
+                ).all()
+            )
         except IntegrityError as e:
             logger.debug("get_seats_results IntegrityError: %s", e)
             return None
@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from copy import deepcopy
+
+logger = logging.getLogger(__name__)
+
+# Off by default, the memory backend is only invalidated by the writes of
+# its own process
+ENTITY_CACHE = os.getenv("ENTITY_CACHE", "off").lower() in ("on", "1", "true")
+# Seconds an entity is kept
+ENTITY_CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", "30"))
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "4096"))
+
+# Cached kinds and the scope they are invalidated by, only metadata changed
+# by few writes. Political party lists are not cached, as its votes are read
+# with them.
+DISTRICTS = "districts"
+SCRUTINIES = "scrutinies"
+
+
+class MemoryCacheBackend:
+    """In-process cache backend, a LRU dictionary with TTL
+
+    A backend stores values by key and keeps a generation counter by
+    scope. Any store with get/set (with TTL) and atomic increments can
+    replace it with the same methods, e.g. a shared one when the API runs
+    in many processes, as this one is only invalidated by the writes of
+    its own process.
+
+    :param maxsize: maximum quantity of values kept.
+    :param ttl: seconds a value is kept.
+    :param clock: function returning the current time in seconds.
+    """
+
+    def __init__(self, maxsize=ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL, clock=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock or time.monotonic
+        self._values = OrderedDict()
+        # Generations are not evicted, a reset would make old keys valid
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= self.clock():
+                del self._values[key]
+                return None
+            self._values.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = (self.clock() + self.ttl, value)
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+                self.evictions += 1
+
+    def get_generation(self, scope):
+        with self._lock:
+            return self._generations.get(scope, 0)
+
+    def incr_generation(self, scope):
+        with self._lock:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+            return self._generations[scope]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._generations.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._values),
+                "maxsize": self.maxsize,
+                "evictions": self.evictions,
+            }
+
+
+class EntityCache:
+    """Read-through cache of the entities read by the repository
+
+    Entities are cached by kind, scope (the district, or None for the
+    whole kind) and the arguments of the read. The writes invalidate a
+    scope by bumping its generation, which is part of the keys, so the
+    entries of the previous generation are never read again.
+
+    :param backend: cache backend, a ``MemoryCacheBackend`` by default.
+    :param enabled: when False every read is loaded, ``ENTITY_CACHE`` by
+      default.
+    """
+
+    def __init__(self, backend=None, enabled=None):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        if enabled is None:
+            enabled = ENTITY_CACHE and ENTITY_CACHE_TTL > 0
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, kind, scope, args, load):
+        """Returns the cached entities or the ones loaded by ``load``
+
+        :param kind: kind of the entities.
+        :param scope: district of the entities, None for the whole kind.
+        :param args: hashable arguments of the read.
+        :param load: function returning the entities, None results are not
+          cached.
+        """
+        if not self.enabled:
+            return load()
+        generation = self.backend.get_generation((kind, scope))
+        key = (kind, scope, generation, args)
+        value = self.backend.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return deepcopy(value)
+        with self._lock:
+            self.misses += 1
+        value = load()
+        if value is not None:
+            self.backend.set(key, deepcopy(value))
+        return value
+
+    def invalidate(self, kind, *scopes):
+        """Invalidates the entities of the kind in the given scopes"""
+        for scope in scopes:
+            logger.debug("Invalidating %s of %s", kind, scope)
+            self.backend.incr_generation((kind, scope))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.backend.stats(), hits=self.hits, misses=self.misses)
+
+
+entity_cache = EntityCache()
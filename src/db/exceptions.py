@@ -1,2 +1,6 @@
 class PoliticalPartyListsAlreadyExist(Exception):
     pass
+
+
+class VotesOutOfRange(Exception):
+    pass
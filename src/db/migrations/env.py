@@ -19,6 +19,7 @@ if config.config_file_name is not None:
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from dhondt.db.controller import DB
+import dhondt.db.tabledefs  # noqa: F401
 target_metadata = DB.Base.metadata
 
 # other values from the config, defined by the needs of env.py,
@@ -58,6 +59,16 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # DB.upgrade passes the connection of the application engine
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(
+            connection=connection, target_metadata=target_metadata
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -0,0 +1,79 @@
+"""initial schema
+
+Tables as created by ``metadata.create_all`` before migrations were
+introduced, databases created that way are stamped with this revision.
+
+Revision ID: 5a0c1b7e2d41
+Revises:
+Create Date: 2026-10-18 08:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "5a0c1b7e2d41"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "district",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_table(
+        "politicalpartylist",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("district_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("votes", sa.Integer(), nullable=True),
+        sa.Column("electors", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["district_id"], ["district.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_table(
+        "scrutiny",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("voting_date", sa.DateTime(), nullable=False),
+        sa.Column("scrutiny_date", sa.DateTime(), nullable=False),
+        sa.Column("district_id", sa.Integer(), nullable=False),
+        sa.Column("seats", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(["district_id"], ["district.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "dhondtresult",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("scrutiny_id", sa.Integer(), nullable=False),
+        sa.Column("result_date", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["scrutiny_id"], ["scrutiny.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "seatspoliticalparties",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("dhondtresult_id", sa.Integer(), nullable=False),
+        sa.Column("politicalpartylist_id", sa.Integer(), nullable=False),
+        sa.Column("seats", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["dhondtresult_id"], ["dhondtresult.id"]),
+        sa.ForeignKeyConstraint(["politicalpartylist_id"], ["politicalpartylist.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("seatspoliticalparties")
+    op.drop_table("dhondtresult")
+    op.drop_table("scrutiny")
+    op.drop_table("politicalpartylist")
+    op.drop_table("district")
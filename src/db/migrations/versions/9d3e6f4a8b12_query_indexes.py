@@ -0,0 +1,62 @@
+"""query indexes
+
+Indexes matched to the DhondtRepository query shapes: lists by district
+(and keyset pages by id), scrutinies by date, results history of a
+scrutiny and seats of a result.
+
+Revision ID: 9d3e6f4a8b12
+Revises: 5a0c1b7e2d41
+Create Date: 2026-10-18 08:10:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "9d3e6f4a8b12"
+down_revision: Union[str, None] = "5a0c1b7e2d41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_scrutiny_district_id_id", "scrutiny", ["district_id", "id"])
+    op.create_index(
+        "ix_scrutiny_scrutiny_date_district_id",
+        "scrutiny",
+        ["scrutiny_date", "district_id"],
+    )
+    op.create_index(
+        "ix_politicalpartylist_district_id_id",
+        "politicalpartylist",
+        ["district_id", "id"],
+    )
+    op.create_index(
+        "ix_dhondtresult_scrutiny_id_id", "dhondtresult", ["scrutiny_id", "id"]
+    )
+    op.create_index(
+        "ix_dhondtresult_scrutiny_id_result_date",
+        "dhondtresult",
+        ["scrutiny_id", "result_date"],
+    )
+    op.create_index(
+        "ix_seatspoliticalparties_dhondtresult_id",
+        "seatspoliticalparties",
+        ["dhondtresult_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_seatspoliticalparties_dhondtresult_id", table_name="seatspoliticalparties"
+    )
+    op.drop_index("ix_dhondtresult_scrutiny_id_result_date", table_name="dhondtresult")
+    op.drop_index("ix_dhondtresult_scrutiny_id_id", table_name="dhondtresult")
+    op.drop_index(
+        "ix_politicalpartylist_district_id_id", table_name="politicalpartylist"
+    )
+    op.drop_index("ix_scrutiny_scrutiny_date_district_id", table_name="scrutiny")
+    op.drop_index("ix_scrutiny_district_id_id", table_name="scrutiny")
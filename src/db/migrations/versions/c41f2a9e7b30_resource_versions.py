@@ -0,0 +1,38 @@
+"""resource versions
+
+Version counter and last modification date of districts and scrutinies,
+bumped by the repository writes and used as ETag/Last-Modified of the
+GET routes.
+
+Revision ID: c41f2a9e7b30
+Revises: 9d3e6f4a8b12
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c41f2a9e7b30"
+down_revision: Union[str, None] = "9d3e6f4a8b12"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in ("district", "scrutiny"):
+        op.add_column(
+            table,
+            sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+        )
+        op.add_column(table, sa.Column("updated_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    for table in ("district", "scrutiny"):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("updated_at")
+            batch_op.drop_column("version")
@@ -0,0 +1,75 @@
+"""latest results
+
+Denormalized latest result of each scrutiny, written with each new
+result and served by the ``seats-status/latest`` route. Filled with the
+latest result of the scrutinies already calculated.
+
+Revision ID: e7a35b0d9c16
+Revises: c41f2a9e7b30
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e7a35b0d9c16"
+down_revision: Union[str, None] = "c41f2a9e7b30"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LATEST_RESULTS = sa.text(
+    "SELECT r.id, r.scrutiny_id, r.result_date, s.district_id, s.name "
+    "FROM dhondtresult AS r JOIN scrutiny AS s ON s.id = r.scrutiny_id "
+    "WHERE r.id = (SELECT max(id) FROM dhondtresult WHERE scrutiny_id = s.id)"
+).columns(result_date=sa.DateTime())
+RESULT_SEATS = sa.text(
+    "SELECT sp.politicalpartylist_id, sp.seats, ppl.name "
+    "FROM seatspoliticalparties AS sp "
+    "JOIN politicalpartylist AS ppl ON ppl.id = sp.politicalpartylist_id "
+    "WHERE sp.dhondtresult_id = :result_id ORDER BY sp.id"
+)
+
+
+def upgrade() -> None:
+    latestresult = op.create_table(
+        "latestresult",
+        sa.Column("scrutiny_id", sa.Integer(), nullable=False),
+        sa.Column("dhondtresult_id", sa.Integer(), nullable=False),
+        sa.Column("district_id", sa.Integer(), nullable=False),
+        sa.Column("scrutiny_name", sa.String(), nullable=False),
+        sa.Column("result_date", sa.DateTime(), nullable=False),
+        sa.Column("seats_results", sa.JSON(), nullable=False),
+        sa.ForeignKeyConstraint(["dhondtresult_id"], ["dhondtresult.id"]),
+        sa.ForeignKeyConstraint(["scrutiny_id"], ["scrutiny.id"]),
+        sa.PrimaryKeyConstraint("scrutiny_id"),
+    )
+
+    connection = op.get_bind()
+    rows = [
+        {
+            "scrutiny_id": scrutiny_id,
+            "dhondtresult_id": result_id,
+            "district_id": district_id,
+            "scrutiny_name": name,
+            "result_date": result_date,
+            "seats_results": [
+                {"pplistId": pplist_id, "seats": seats, "pplistName": pplist_name}
+                for pplist_id, seats, pplist_name in connection.execute(
+                    RESULT_SEATS, {"result_id": result_id}
+                )
+            ],
+        }
+        for result_id, scrutiny_id, result_date, district_id, name in connection.execute(
+            LATEST_RESULTS
+        ).all()
+    ]
+    if rows:
+        op.bulk_insert(latestresult, rows)
+
+
+def downgrade() -> None:
+    op.drop_table("latestresult")
@@ -1,12 +1,16 @@
 from sqlalchemy.orm import relationship, validates
 from dhondt.db.controller import DB
-from sqlalchemy import ForeignKey, Column, DateTime, Integer, String
+from sqlalchemy import ForeignKey, Column, DateTime, Index, Integer, JSON, String
 
 
 class ScrutinyTable(DB.Base):
     """Table that contains all scrutiny for each electoral district"""
 
     __tablename__ = "scrutiny"
+    __table_args__ = (
+        Index("ix_scrutiny_district_id_id", "district_id", "id"),
+        Index("ix_scrutiny_scrutiny_date_district_id", "scrutiny_date", "district_id"),
+    )
     # Columns
     id = Column(Integer, primary_key=True, doc="id of the scrutiny (autogenerated)")
 
@@ -27,6 +31,16 @@ class ScrutinyTable(DB.Base):
 
     name = Column(String, nullable=False, doc="Name of Scrutiny")
 
+    version = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+        doc="version of the scrutiny results, bumped by each new result",
+    )
+
+    updated_at = Column(DateTime, doc="date of the last new result")
+
     # Relationships
     district = relationship("DistrictTable", back_populates="scrutiny")
     """Many-to-one: Many scrutinies for one district"""
@@ -52,6 +66,16 @@ class DistrictTable(DB.Base):
 
     name = Column(String, nullable=False, unique=True, doc="the name of the test type")
 
+    version = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+        doc="version of the district, bumped by each write of its lists or scrutinies",
+    )
+
+    updated_at = Column(DateTime, doc="date of the last write of the district")
+
     # Relationships
     scrutiny = relationship("ScrutinyTable", back_populates="district")
     """Many-to-one: Many scrutinies for one district. Duplicate due to back_populates"""
@@ -75,6 +99,9 @@ class PoliticalPartyListTable(DB.Base):
     """Table that describes the political party list"""
 
     __tablename__ = "politicalpartylist"
+    __table_args__ = (
+        Index("ix_politicalpartylist_district_id_id", "district_id", "id"),
+    )
     # Columns
     id = Column(
         Integer, primary_key=True, doc="id of the political party list (autogenerated)"
@@ -125,6 +152,9 @@ class SeatsPoliticalPartiesTable(DB.Base):
     using D'hondt method at given time"""
 
     __tablename__ = "seatspoliticalparties"
+    __table_args__ = (
+        Index("ix_seatspoliticalparties_dhondtresult_id", "dhondtresult_id"),
+    )
     # Columns
     id = Column(
         Integer,
@@ -174,6 +204,10 @@ class DhondtResultTable(DB.Base):
     """Table that describes the result of seats using D'hondt method at given time"""
 
     __tablename__ = "dhondtresult"
+    __table_args__ = (
+        Index("ix_dhondtresult_scrutiny_id_id", "scrutiny_id", "id"),
+        Index("ix_dhondtresult_scrutiny_id_result_date", "scrutiny_id", "result_date"),
+    )
     # Columns
     id = Column(
         Integer, primary_key=True, doc="id of the dhondt result (autogenerated)"
@@ -207,3 +241,50 @@ class DhondtResultTable(DB.Base):
             "calculationDate": self.result_date,
             "seatsResults": [x.dict() for x in self.seatspoliticalparties],
         }
+
+
+class LatestResultTable(DB.Base):
+    """Table that keeps the latest result of each scrutiny denormalized, so
+    it is read by primary key without joining the results tables"""
+
+    __tablename__ = "latestresult"
+    # Columns
+    scrutiny_id = Column(
+        Integer,
+        ForeignKey("scrutiny.id"),
+        primary_key=True,
+        doc="foreign key to the scrutiny table",
+    )
+
+    dhondtresult_id = Column(
+        Integer,
+        ForeignKey("dhondtresult.id"),
+        nullable=False,
+        doc="foreign key to the latest dhondt result of the scrutiny",
+    )
+
+    district_id = Column(
+        Integer, nullable=False, doc="district where the scrutiny takes place"
+    )
+
+    scrutiny_name = Column(String, nullable=False, doc="Name of Scrutiny")
+
+    result_date = Column(
+        DateTime, nullable=False, doc="date when the D'Hondt method is performed"
+    )
+
+    seats_results = Column(
+        JSON,
+        nullable=False,
+        doc="seats, id and name of each p.p. list, as serialized by the API",
+    )
+
+    def dict(self):
+        return {
+            "resultId": self.dhondtresult_id,
+            "districtId": self.district_id,
+            "scrutinyId": self.scrutiny_id,
+            "scrutinyName": self.scrutiny_name,
+            "calculationDate": self.result_date,
+            "seatsResults": self.seats_results,
+        }
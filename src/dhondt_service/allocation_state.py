@@ -0,0 +1,277 @@
+import heapq
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Scrutinies whose allocation state is kept, the least recently used are
+# dropped
+ALLOCATION_STATES_SIZE = int(os.getenv("ALLOCATION_STATES_SIZE", "1024"))
+
+
+class AllocationState:
+    """Seats allocation of a scrutiny kept between vote updates
+
+    The state holds the seats vector of the scrutiny and the marginal
+    quotients around the seat boundary: the last quotient awarded to each
+    ppl (``votes / seats``) and the next one it would get
+    (``votes / (seats + 1)``). After a vote change only the seats that
+    change hands are moved, each move costs O(log ppls). When a vote change
+    moves more than ``max_moves`` seats, the allocation is calculated from
+    zero with ``calculate`` instead, so a vote update never costs more than
+    a calculation.
+
+    Quotients are ordered like ``dhondt_calculation`` does, i.e. by
+    ``(quotient, ppl id)``.
+
+    :param district_id: district of the scrutiny.
+    :param political_parties: list of ppl dictionary (same like API schema).
+    :param seats: Total seats available to be assigned
+    :param seats_result: result of ``dhondt_calculation`` for the ppls.
+    :param calculate: function called as ``calculate(political_parties, seats)``
+      to get the allocation from zero, None moves every seat.
+    :param max_moves: seat moves of a vote update before calculating from
+      zero, None is the number of ppls.
+    """
+
+    def __init__(
+        self,
+        district_id,
+        political_parties,
+        seats,
+        seats_result,
+        calculate=None,
+        max_moves=None,
+    ):
+        self.district_id = district_id
+        self.seats = seats
+        self.calculate = calculate
+        self.max_moves = len(political_parties) if max_moves is None else max_moves
+        # Same auxiliary struct than dhondt_calculation {id: [seats, votes, name]}
+        self.pplits_seats = {
+            x["id"]: [0, x["votes"], x["name"]] for x in political_parties
+        }
+        self._set_seats(seats_result)
+
+    def _set_seats(self, seats_result):
+        for res in seats_result:
+            self.pplits_seats[res["pplistId"]][0] = res["seats"]
+        self._build_boundary()
+
+    def _build_boundary(self):
+        # Min-heap of the last quotients awarded and max-heap (negated) of
+        # the next quotients. Entries keep the seats and votes used to
+        # compute them, outdated entries are discarded lazily.
+        self._awarded = []
+        self._next = []
+        for ippl in self.pplits_seats:
+            self._push(ippl)
+
+    def _push(self, ippl):
+        seats, votes, _ = self.pplits_seats[ippl]
+        if seats > 0:
+            heapq.heappush(self._awarded, (votes / seats, ippl, seats, votes))
+        heapq.heappush(self._next, (-(votes / (seats + 1)), -ippl, seats, votes))
+
+    def _is_current(self, ippl, seats, votes):
+        val = self.pplits_seats[ippl]
+        return val[0] == seats and val[1] == votes
+
+    def _lowest_awarded(self):
+        while self._awarded:
+            quotient, ippl, seats, votes = self._awarded[0]
+            if self._is_current(ippl, seats, votes):
+                return quotient, ippl
+            heapq.heappop(self._awarded)
+        return None
+
+    def _highest_next(self):
+        while self._next:
+            quotient, ippl, seats, votes = self._next[0]
+            if self._is_current(-ippl, seats, votes):
+                return -quotient, -ippl
+            heapq.heappop(self._next)
+        return None
+
+    def update_votes(self, pplist_id, votes):
+        """Updates the votes of a ppl moving the seats that change hands
+
+        :param pplist_id: id of the ppl updated.
+        :param votes: new quantity of votes of the ppl.
+        @return: dictionary with the seats won (or lost, negative) by each
+          ppl whose seats changed.
+        """
+        val = self.pplits_seats.get(pplist_id)
+        if val is None or val[1] == votes:
+            return {}
+        val[1] = votes
+        self._push(pplist_id)
+
+        changes = {}
+        moves = 0
+        while True:
+            loser = self._lowest_awarded()
+            winner = self._highest_next()
+            if loser is None or winner is None or winner <= loser:
+                break
+            if self.calculate is not None and moves >= self.max_moves:
+                return self._recalculate(changes)
+            self.pplits_seats[loser[1]][0] -= 1
+            self.pplits_seats[winner[1]][0] += 1
+            self._push(loser[1])
+            self._push(winner[1])
+            changes[loser[1]] = changes.get(loser[1], 0) - 1
+            changes[winner[1]] = changes.get(winner[1], 0) + 1
+            moves += 1
+
+        # Keep the lazy heaps bounded
+        if len(self._awarded) + len(self._next) > 4 * len(self.pplits_seats) + 16:
+            self._build_boundary()
+
+        changes = {ippl: x for ippl, x in changes.items() if x}
+        logger.debug(
+            "update_votes %s for pplist %s, changes %s", votes, pplist_id, changes
+        )
+        return changes
+
+    def _recalculate(self, changes):
+        """Calculates the allocation from zero, for the vote updates moving
+        more than ``max_moves`` seats
+
+        :param changes: seats already moved by the update.
+        @return: same as ``update_votes``.
+        """
+        before = {
+            ippl: val[0] - changes.get(ippl, 0)
+            for ippl, val in self.pplits_seats.items()
+        }
+        political_parties = [
+            {"id": ippl, "name": val[2], "votes": val[1]}
+            for ippl, val in self.pplits_seats.items()
+        ]
+        self._set_seats(self.calculate(political_parties, self.seats))
+        changes = {
+            ippl: val[0] - before[ippl]
+            for ippl, val in self.pplits_seats.items()
+            if val[0] != before[ippl]
+        }
+        logger.debug("update_votes recalculated, changes %s", changes)
+        return changes
+
+    def sync(self, political_parties):
+        """Brings the state up to date with the given ppls
+
+        :param political_parties: list of ppl dictionary (same like API schema).
+        @return: False when the ppls are not the ones of the state, and it
+          must be rebuilt.
+        """
+        if len(political_parties) != len(self.pplits_seats) or any(
+            x["id"] not in self.pplits_seats for x in political_parties
+        ):
+            return False
+        for x in political_parties:
+            self.pplits_seats[x["id"]][2] = x["name"]
+            self.update_votes(x["id"], x["votes"])
+        return True
+
+    def result(self):
+        """Returns the seats allocation like ``dhondt_calculation`` does"""
+        return [
+            {"pplistId": ippl, "pplistName": val[2], "seats": val[0]}
+            for ippl, val in self.pplits_seats.items()
+        ]
+
+
+class AllocationStateRegistry:
+    """In process registry of the allocation state of each scrutiny
+
+    :param size: scrutinies kept, the least recently allocated are dropped.
+    """
+
+    def __init__(self, size=ALLOCATION_STATES_SIZE):
+        self.size = size
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allocate(
+        self,
+        scrutiny_id,
+        district_id,
+        political_parties,
+        seats,
+        calculate,
+        max_moves=None,
+    ):
+        """Returns the seats allocation of a scrutiny
+
+        The kept state is reused when it still describes the given ppls,
+        otherwise the allocation is calculated from zero and kept.
+
+        :param scrutiny_id: id of the scrutiny.
+        :param district_id: district of the scrutiny.
+        :param political_parties: list of ppl dictionary (same like API schema).
+        :param seats: Total seats available to be assigned
+        :param calculate: function called as ``calculate(political_parties, seats)``
+          to get the allocation from zero.
+        :param max_moves: see ``AllocationState``.
+        """
+        with self._lock:
+            state = self._states.get(scrutiny_id)
+            if (
+                state is not None
+                and state.district_id == district_id
+                and state.seats == seats
+                and state.sync(political_parties)
+            ):
+                logger.debug("allocate reusing state of scrutiny %s", scrutiny_id)
+                self._states.move_to_end(scrutiny_id)
+                return state.result()
+
+            result = calculate(political_parties, seats)
+            self._states[scrutiny_id] = AllocationState(
+                district_id, political_parties, seats, result, calculate, max_moves
+            )
+            self._states.move_to_end(scrutiny_id)
+            while len(self._states) > self.size:
+                self._states.popitem(last=False)
+            return result
+
+    def update_votes(self, district_id, pplist_id, votes):
+        """Updates the votes of a ppl in every state of its district
+
+        @return: dictionary with the new allocation of each scrutiny whose
+          seats changed.
+        """
+        changed = {}
+        with self._lock:
+            for scrutiny_id, state in self._states.items():
+                if state.district_id == district_id and state.update_votes(
+                    pplist_id, votes
+                ):
+                    changed[scrutiny_id] = state.result()
+        return changed
+
+    def has_state(self, scrutiny_id):
+        with self._lock:
+            return scrutiny_id in self._states
+
+    def discard_districts(self, district_ids):
+        """Drops the states of the scrutinies of the districts, e.g. after
+        their votes are imported in bulk"""
+        district_ids = set(district_ids)
+        with self._lock:
+            for scrutiny_id in [
+                x
+                for x, state in self._states.items()
+                if state.district_id in district_ids
+            ]:
+                del self._states[scrutiny_id]
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+
+allocation_states = AllocationStateRegistry()
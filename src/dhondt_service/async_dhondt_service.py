@@ -0,0 +1,272 @@
+import asyncio
+import logging
+
+from dhondt.db.async_repository import AsyncDhondtRepository
+
+from dhondt.dhondt_service.dhondt_service import (
+    allocate_seats,
+    update_allocations,
+    _allocation_input,
+    _calculated_result,
+    _fetch_limit,
+    _imported_votes,
+    _is_latest,
+    _listing,
+    _projections_to_build,
+    _publish_allocation,
+    _seed_projection,
+    _single_pplist,
+    _updated_votes,
+)
+from dhondt.dhondt_service.projections import projection_hub
+from dhondt.dhondt_service.result_cache import result_cache
+from dhondt.dhondt_service.exceptions import (
+    DistrictsNotFoundError,
+    PoliticalPartyListsNotFoundError,
+    ScrutinyNotFoundError,
+    SeatsResultsNotFoundError,
+)
+from dhondt.dhondt_service.vote_import import read_votes
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDhondtService:
+    """Asyncio version of ``DhondtService``
+
+    Same methods, arguments, results and exceptions than the sync service,
+    the repository calls are awaited and the allocations (CPU bound) run in
+    a worker thread. Allocation states and the results cache are shared
+    with the sync service. The vote buffer is not used, the votes are
+    always written by the request.
+    """
+
+    def __init__(self, repository: AsyncDhondtRepository):
+        self.repository = repository
+
+    async def get_districts(
+        self, scrutiny_date=None, district_id=None, after=None, limit=None
+    ):
+        districts = await self.repository.get_districts(
+            scrutiny_date, district_id, after=after, limit=_fetch_limit(limit)
+        )
+        return _listing(
+            districts,
+            "districts",
+            limit,
+            bool(district_id),
+            DistrictsNotFoundError(
+                f"Districts with {scrutiny_date=} and {district_id=} not found!"
+            ),
+        )
+
+    async def get_political_party_lists(
+        self, district_id, pplist_id=None, after=None, limit=None
+    ):
+        political_party_lists = await self.repository.get_political_party_lists(
+            district_id=district_id,
+            pplist_id=pplist_id,
+            after=after,
+            limit=_fetch_limit(limit),
+        )
+        return _listing(
+            political_party_lists,
+            "politicalPartyLists",
+            limit,
+            bool(pplist_id),
+            PoliticalPartyListsNotFoundError(
+                f"Political Party Lists with {district_id=} and {pplist_id=} not found!"
+            ),
+        )
+
+    async def create_political_party_list(self, name, electors, districtId):
+        result = await self.repository.create_political_party_list(
+            district_id=districtId,
+            name=name,
+            electors=electors,
+        )
+        if not result:
+            raise DistrictsNotFoundError(f"Districts with {districtId=} not found!")
+        return result
+
+    async def update_political_party_list(self, pplist_id, district_id, name, electors):
+        political_party_list = _single_pplist(
+            await self.repository.get_political_party_lists(
+                district_id=district_id,
+                pplist_id=pplist_id,
+            ),
+            district_id,
+            pplist_id,
+        )
+        result = await self.repository.update_political_party_list(
+            political_party_list["id"],
+            name=name,
+            electors=electors,
+        )
+        return result
+
+    async def get_scrutinies(
+        self, district_id, scrutiny_id=None, scrutiny_date=None, after=None, limit=None
+    ):
+        scrutinies = await self.repository.get_scrutinies(
+            district_id=district_id,
+            scrutiny_date=scrutiny_date,
+            scrutiny_id=scrutiny_id,
+            after=after,
+            limit=_fetch_limit(limit),
+        )
+        return _listing(
+            scrutinies,
+            "scrutinies",
+            limit,
+            bool(scrutiny_id),
+            ScrutinyNotFoundError(
+                f"Scrutiny with {scrutiny_date=} and {scrutiny_id=} not found!"
+            ),
+        )
+
+    async def create_scrutiny(self, district_id, votingDate, scrutinyDate, name, seats):
+        scrutinies = await self.repository.create_scrutiny(
+            district_id=district_id,
+            voting_date=votingDate,
+            scrutiny_date=scrutinyDate,
+            name=name,
+            seats=seats,
+        )
+        if scrutinies is None:
+            raise DistrictsNotFoundError(f"Districts with {district_id=} not found!")
+
+        return scrutinies
+
+    async def update_vote(self, district_id, pplist_id, votes):
+        political_party_list = _single_pplist(
+            await self.repository.get_political_party_lists(
+                district_id=district_id, pplist_id=pplist_id
+            ),
+            district_id,
+            pplist_id,
+        )
+        result = await self.repository.update_political_party_list(
+            political_party_list["id"],
+            votes=votes,
+        )
+        await asyncio.to_thread(
+            update_allocations, district_id, result["id"], result["votes"]
+        )
+        await self._refresh_projections([district_id])
+        return result
+
+    async def increment_vote(self, district_id, pplist_id, delta):
+        result = await self.repository.increment_votes(district_id, pplist_id, delta)
+        if result is None:
+            raise PoliticalPartyListsNotFoundError(
+                f"Political Party Lists with {district_id=} and {pplist_id=} not found!"
+            )
+        await asyncio.to_thread(
+            update_allocations, district_id, result["id"], result["votes"]
+        )
+        await self._refresh_projections([district_id])
+        return result
+
+    async def update_votes(self, votes):
+        results = await self.repository.update_votes(votes)
+        results = await asyncio.to_thread(_updated_votes, results, votes)
+        await self._refresh_projections(
+            {x["districtId"] for x in results["politicalPartyLists"]}
+        )
+        return results
+
+    async def import_votes(self, stream, fmt):
+        """Imports the votes of a CSV or NDJSON text stream
+
+        The stream is read lazily and imported in one transaction.
+
+        :param stream: text file like object.
+        :param fmt: ``csv`` or ``ndjson``.
+        """
+        result, district_ids = _imported_votes(
+            await self.repository.import_votes(read_votes(stream, fmt))
+        )
+        await self._refresh_projections(district_ids)
+        return result
+
+    async def _refresh_projections(self, district_ids):
+        """Same as ``DhondtService._refresh_projections``"""
+        for district_id, scrutiny_id in _projections_to_build(district_ids):
+            calculation_input = await self.repository.get_calculation_input(
+                district_id=district_id, scrutiny_id=scrutiny_id
+            )
+            await asyncio.to_thread(
+                _publish_allocation, calculation_input, district_id, scrutiny_id
+            )
+
+    async def seed_projection(self, district_id, scrutiny_id):
+        """Same as ``DhondtService.seed_projection``"""
+        if not projection_hub.published_projection(district_id, scrutiny_id):
+            _seed_projection(
+                await self.repository.get_latest_seats_result(
+                    district_id=district_id, scrutiny_id=scrutiny_id
+                )
+            )
+
+    async def get_seats_results(self, district_id, scrutiny_id, after=None, limit=None):
+        logger.debug(
+            "get_seats_results after [ %s ] limit [ %s ] received ", after, limit
+        )
+        seats_results = await self.repository.get_seats_results(
+            district_id=district_id,
+            scrutiny_id=scrutiny_id,
+            after=after,
+            limit=_fetch_limit(limit),
+        )
+        return _listing(
+            seats_results,
+            "scrutinyResults",
+            limit,
+            False,
+            SeatsResultsNotFoundError(
+                f"Scrutiny with {district_id=} and {scrutiny_id=} not found!"
+            ),
+            cursor="resultId",
+        )
+
+    async def get_district_version(self, district_id):
+        """Returns the version of the district lists and scrutinies, None if
+        the district is not found"""
+        return await self.repository.get_district_version(district_id)
+
+    async def get_scrutiny_version(self, district_id, scrutiny_id):
+        """Returns the version of the scrutiny results, None if the scrutiny
+        is not found"""
+        return await self.repository.get_scrutiny_version(district_id, scrutiny_id)
+
+    async def get_latest_seats_result(self, district_id, scrutiny_id):
+        seats_result = await self.repository.get_latest_seats_result(
+            district_id=district_id, scrutiny_id=scrutiny_id
+        )
+        if seats_result is None:
+            raise SeatsResultsNotFoundError(
+                f"Latest result with {district_id=} and {scrutiny_id=} not found!"
+            )
+        return seats_result
+
+    async def calculate_seats(self, district_id, scrutiny_id):
+        calculation_input = await self.repository.get_calculation_input(
+            district_id=district_id, scrutiny_id=scrutiny_id
+        )
+        scrutiny, political_party_lists = _allocation_input(
+            calculation_input, district_id, scrutiny_id
+        )
+        seats = scrutiny["seats"]
+        cache_key = result_cache.fingerprint(scrutiny_id, seats, political_party_lists)
+        cached = result_cache.get(cache_key)
+        if cached is not None and _is_latest(
+            cached, await self.repository.get_latest_result_id(scrutiny_id)
+        ):
+            return cached
+
+        result = await asyncio.to_thread(
+            allocate_seats, scrutiny_id, district_id, political_party_lists, seats
+        )
+        ret = await self.repository.create_calculated_result(scrutiny, result)
+        return _calculated_result(cache_key, scrutiny, result, ret)
@@ -0,0 +1,65 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Column id used to pad scrutinies with fewer ppls than the vote matrix
+PADDING_ID = 0
+
+
+def dhondt_batch_calculation(votes, seats, ids):
+    """Batch version of the D'Hondt calculation
+
+    This function perform the calculation of seats for many scrutinies at
+    once, using columnar arrays instead of a list of ppl dictionary per
+    scrutiny. The results are the same of ``dhondt_calculation``,
+    including the tie-break on the greatest ppl id.
+
+    Each ppl starts at its lower quota ``votes * seats // total_votes``
+    and the leftover seats (fewer than the ppls) are awarded one by one,
+    so the passes over the arrays do not depend on the seats available.
+
+    :param votes: matrix (scrutinies x ppls) of votes received.
+    :param seats: vector (scrutinies) of total seats available.
+    :param ids: ppl ids of the matrix columns, a vector (ppls) shared by
+      all scrutinies or a matrix (scrutinies x ppls). Columns with id
+      ``PADDING_ID`` are padding and never get seats.
+    @return: matrix (scrutinies x ppls) of seats obtained, with the same
+      columns order than *votes*.
+    """
+    votes = np.asarray(votes, dtype=np.int64)
+    if votes.ndim != 2:
+        raise ValueError(f"votes must be a matrix, got {votes.ndim} dimensions")
+    seats = np.maximum(np.asarray(seats, dtype=np.int64), 0)
+    if seats.shape != votes.shape[:1]:
+        raise ValueError(f"seats shape {seats.shape} does not match {votes.shape=}")
+    ids = np.broadcast_to(np.asarray(ids, dtype=np.int64), votes.shape)
+
+    logger.debug("Dhondt batch calculations for %s scrutinies", votes.shape[0])
+
+    # Sort columns by id descending, so the first max quotient found by
+    # argmax belongs to the greatest id
+    order = np.argsort(-ids, axis=1, kind="stable")
+    votes = np.where(ids == PADDING_ID, 0, votes)
+    votes = np.take_along_axis(votes, order, axis=1)
+
+    total_votes = votes.sum(axis=1)
+    with_votes = total_votes > 0
+
+    alloc = votes * seats[:, None] // np.where(with_votes, total_votes, 1)[:, None]
+    # Without votes all quotients are zero and the greatest id gets every seat
+    alloc[~with_votes, 0] = seats[~with_votes]
+    leftover = seats - alloc.sum(axis=1)
+
+    while True:
+        pending = np.flatnonzero(leftover)
+        if not pending.size:
+            break
+        quotients = votes[pending] / (alloc[pending] + 1)
+        alloc[pending, quotients.argmax(axis=1)] += 1
+        leftover[pending] -= 1
+
+    result = np.empty_like(alloc)
+    np.put_along_axis(result, order, alloc, axis=1)
+    return result
@@ -1,16 +1,30 @@
+import functools
+import heapq
 import logging
+import operator
+import time
+from datetime import datetime
+
+from prometheus_client import Histogram
 
 from dhondt.db.dhondt_repository import (
+    MAX_VOTES,
     DhondtRepository,
     init_repository,
 )
 
+from dhondt.dhondt_service.allocation_state import allocation_states
+from dhondt.dhondt_service.result_cache import result_cache
+from dhondt.dhondt_service.projections import projection_hub
+from dhondt.dhondt_service.vote_buffer import vote_buffer
 from dhondt.dhondt_service.exceptions import (
     DistrictsNotFoundError,
     PoliticalPartyListsNotFoundError,
     ScrutinyNotFoundError,
     SeatsResultsNotFoundError,
+    VoteImportError,
 )
+from dhondt.dhondt_service.vote_import import read_votes
 
 logger = logging.getLogger(__name__)
 
@@ -19,24 +33,42 @@ def init_service():
     init_repository()
 
 
-def dhondt_calculation(political_parties, seats):
-    """Main business function of D'Hondt system
+ENGINE_HEAP = "heap"
+ENGINE_LOOP = "loop"
+ENGINE_DIVISOR = "divisor"
+DEFAULT_ENGINE = ENGINE_HEAP
 
-    This function perform calculation of seats assigned to
-    each political party list (ppl) based on his votes.
+# Seats per ppl from which the divisor engine is preferred
+DIVISOR_ENGINE_SEATS_RATIO = 8
 
-    :param political_parties: list of ppl dictionary (same like
-      API schema).
-    :param seats: Total seats available to be assigned
-    @return: list of dictionary that represent ppl and seats
-      obtained.
-    """
-    logger.debug("Dhondt calculations for %s seats", seats)
-    logger.debug("Political Parties list: %s", political_parties)
+CALCULATION_DURATION = Histogram(
+    "dhondt_calculation_duration_seconds",
+    "Duration of the D'Hondt calculations",
+    ["engine", "parties", "seats"],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1),
+)
+# Upper bounds of the party and seat count labels, bounding their values
+SIZE_LABEL_BOUNDS = (10, 100, 1000, 10000)
 
-    # Use a new auxiliary struct for the iteration
-    pplits_seats = {x["id"]: [0, x["votes"], x["name"]] for x in political_parties}
 
+def size_label(size):
+    """Returns the label of a party or seat count, the smallest bound not
+    exceeded by it"""
+    for bound in SIZE_LABEL_BOUNDS:
+        if size <= bound:
+            return str(bound)
+    return "+Inf"
+
+
+def _loop_allocation(pplits_seats, seats):
+    """Reference allocation engine
+
+    Rescans every ppl for each seat available, so it costs
+    O(seats x ppls). Kept as the reference implementation of the method.
+
+    :param pplits_seats: auxiliary struct ``{id: [seats, votes, name]}``
+    :param seats: Total seats available to be assigned
+    """
     # Iteration over total seats available
     for i in range(seats):
         # Get pplist id of the seat winner for this iteration
@@ -50,15 +82,359 @@ def dhondt_calculation(political_parties, seats):
         )
         logger.debug("Iteration %s, struct %s", i, pplits_seats)
 
+
+def _heap_allocation(pplits_seats, seats):
+    """Priority queue allocation engine
+
+    Keeps the next quotient of each ppl in a heap, so each seat is
+    awarded in O(log ppls). Ties are broken like the reference engine,
+    i.e. the greatest ppl id wins.
+
+    :param pplits_seats: auxiliary struct ``{id: [seats, votes, name]}``
+    :param seats: Total seats available to be assigned
+    """
+    seats_range = range(seats)
+    if not seats_range:
+        return
+
+    # heapq is a min-heap, so quotients and ids are negated
+    heap = [(-(val[1] / (val[0] + 1)), -ippl) for ippl, val in pplits_seats.items()]
+    heapq.heapify(heap)
+
+    for _ in seats_range:
+        _, idm = heap[0]
+        val = pplits_seats[-idm]
+        val[0] += 1
+        heapq.heapreplace(heap, (-(val[1] / (val[0] + 1)), idm))
+
+
+def _divisor_allocation(pplits_seats, seats):
+    """Divisor search allocation engine
+
+    D'Hondt (Jefferson) always grants each ppl its lower quota
+    ``votes * seats // total_votes``, which is the allocation given by the
+    divisor ``total_votes / seats``. Every ppl starts there and the
+    leftover seats, always fewer than the ppls, are awarded with the heap
+    engine. Cost is O(ppls log ppls) regardless of the seats available.
+
+    :param pplits_seats: auxiliary struct ``{id: [seats, votes, name]}``
+    :param seats: Total seats available to be assigned
+    """
+    seats = operator.index(seats)
+    if seats <= 0:
+        return
+
+    total_votes = sum(val[1] for val in pplits_seats.values())
+    if not total_votes:
+        # All quotients are zero, the tie-break gives every seat to the
+        # greatest id
+        pplits_seats[max(pplits_seats)][0] = seats
+        return
+
+    for val in pplits_seats.values():
+        val[0] = val[1] * seats // total_votes
+    leftover = seats - sum(val[0] for val in pplits_seats.values())
+    logger.debug("Divisor allocation, %s leftover seats", leftover)
+
+    _heap_allocation(pplits_seats, leftover)
+
+
+ALLOCATION_ENGINES = {
+    ENGINE_HEAP: _heap_allocation,
+    ENGINE_LOOP: _loop_allocation,
+    ENGINE_DIVISOR: _divisor_allocation,
+}
+
+
+def select_engine(seats, ppls):
+    """Returns the allocation engine suited for the given sizes
+
+    The divisor engine cost does not depend on the seats, so it is used
+    when seats far outnumber the ppls.
+
+    :param seats: Total seats available to be assigned
+    :param ppls: number of ppls taking part of the allocation
+    """
+    if seats > DIVISOR_ENGINE_SEATS_RATIO * ppls:
+        return ENGINE_DIVISOR
+    return DEFAULT_ENGINE
+
+
+def dhondt_calculation(political_parties, seats, engine=DEFAULT_ENGINE):
+    """Main business function of D'Hondt system
+
+    This function perform calculation of seats assigned to
+    each political party list (ppl) based on his votes.
+
+    :param political_parties: list of ppl dictionary (same like
+      API schema).
+    :param seats: Total seats available to be assigned
+    :param engine: allocation engine name, one of ``ALLOCATION_ENGINES``
+      keys (default ``heap``).
+    @return: list of dictionary that represent ppl and seats
+      obtained.
+    """
+    try:
+        allocation = ALLOCATION_ENGINES[engine]
+    except KeyError:
+        raise ValueError(f"Unknown allocation {engine=}")
+
+    logger.debug("Dhondt calculations for %s seats (%s engine)", seats, engine)
+    logger.debug("Political Parties list: %s", political_parties)
+
+    start = time.perf_counter()
+    # Use a new auxiliary struct for the iteration
+    pplits_seats = {x["id"]: [0, x["votes"], x["name"]] for x in political_parties}
+
+    allocation(pplits_seats, seats)
+
     # generates result as expected
     result = [
         {"pplistId": ippl, "pplistName": val[2], "seats": val[0]}
         for ippl, val in pplits_seats.items()
     ]
+    CALCULATION_DURATION.labels(
+        engine, size_label(len(political_parties)), size_label(seats)
+    ).observe(time.perf_counter() - start)
     logger.debug("Dhondt calculations result %s", result)
     return result
 
 
+def auto_dhondt_calculation(political_parties, seats):
+    """``dhondt_calculation`` with the engine chosen by ``select_engine``"""
+    return dhondt_calculation(
+        political_parties=political_parties,
+        seats=seats,
+        engine=select_engine(seats, len(political_parties)),
+    )
+
+
+def allocation_max_moves(seats, ppls):
+    """Seat moves of an incremental vote update before the allocation is
+    calculated from zero
+
+    With the divisor engine (seats far outnumbering the ppls) a single vote
+    change moves many seats, so it is always calculated from zero.
+
+    :param seats: Total seats available to be assigned
+    :param ppls: number of ppls taking part of the allocation
+    """
+    if select_engine(seats, ppls) == ENGINE_DIVISOR:
+        return 0
+    return ppls
+
+
+def publish_projection(
+    district_id,
+    scrutiny_id,
+    seats_result,
+    result_id=None,
+    calculation_date=None,
+    initial=False,
+):
+    """Publishes the seats of a scrutiny to its live subscribers
+
+    :param result_id: id of the result stored, None for the projections of
+      the vote updates.
+    :param initial: see ``ProjectionHub.publish``.
+    """
+    projection_hub.publish(
+        district_id,
+        scrutiny_id,
+        {
+            "resultId": result_id,
+            "districtId": district_id,
+            "scrutinyId": scrutiny_id,
+            "calculationDate": calculation_date or datetime.now(),
+            "seatsResults": seats_result,
+        },
+        initial=initial,
+    )
+
+
+def update_allocations(district_id, pplist_id, votes):
+    """Updates the votes of a ppl in the allocation states, publishing the
+    projection of each scrutiny whose seats changed"""
+    changed = allocation_states.update_votes(district_id, pplist_id, votes)
+    for scrutiny_id, seats_result in changed.items():
+        publish_projection(district_id, scrutiny_id, seats_result)
+
+
+def _projections_to_build(district_ids):
+    """Returns the ``(district_id, scrutiny_id)`` of the scrutinies with
+    subscribers in the districts but no allocation state in this process,
+    e.g. calculated by another process, evicted or imported"""
+    return [
+        (district_id, scrutiny_id)
+        for district_id in district_ids
+        for scrutiny_id in projection_hub.subscribed_scrutinies(district_id)
+        if not allocation_states.has_state(scrutiny_id)
+    ]
+
+
+def _publish_allocation(calculation_input, district_id, scrutiny_id):
+    """Builds the allocation state of a scrutiny from its calculation
+    input, publishing its projection. Ignored when the scrutiny or its
+    lists are not found."""
+    if not calculation_input or not calculation_input["politicalPartyLists"]:
+        return
+    publish_projection(
+        district_id,
+        scrutiny_id,
+        allocate_seats(
+            scrutiny_id,
+            district_id,
+            calculation_input["politicalPartyLists"],
+            calculation_input["scrutiny"]["seats"],
+        ),
+    )
+
+
+def _seed_projection(seats_result):
+    """Publishes the latest result stored of a scrutiny, unless a newer
+    projection of it was published"""
+    if seats_result is not None:
+        publish_projection(
+            seats_result["districtId"],
+            seats_result["scrutinyId"],
+            seats_result["seatsResults"],
+            seats_result["resultId"],
+            seats_result["calculationDate"],
+            initial=True,
+        )
+
+
+def _fetch_limit(limit):
+    # One extra record tells whether there is a next page
+    return limit + 1 if limit else limit
+
+
+def _page(records, limit, key="id"):
+    """Splits the records fetched with ``_fetch_limit`` into the page and
+    the cursor of the next page (None if it is the last one)"""
+    if limit and len(records) > limit:
+        records = records[:limit]
+        return records, records[-1][key]
+    return records, None
+
+
+# Helpers shared by DhondtService and AsyncDhondtService, so both layers
+# validate, page, cache and publish the same way
+
+
+def _listing(records, name, limit, single, not_found, cursor="id"):
+    """Returns the records read by a service listing
+
+    :param records: records fetched with ``_fetch_limit``, None if not found.
+    :param name: key of the records in the page.
+    :param single: True when a single record was requested by its id.
+    :param not_found: exception raised when the records are not found.
+    @return: the single record, or the page with its ``nextCursor``.
+    """
+    if records is None:
+        raise not_found
+    if single:
+        return records[0]
+    records, next_cursor = _page(records, limit, key=cursor)
+    return {name: records, "nextCursor": next_cursor}
+
+
+def _single_pplist(political_party_lists, district_id, pplist_id):
+    if not political_party_lists or len(political_party_lists) > 1:
+        raise PoliticalPartyListsNotFoundError(
+            f"Political Party Lists with {district_id=} and {pplist_id=} not found!"
+        )
+    return political_party_lists[0]
+
+
+def _updated_votes(results, votes):
+    """Publishes the votes updated in bulk, see ``update_allocations``"""
+    if results is None:
+        raise PoliticalPartyListsNotFoundError(
+            f"Political Party Lists of {votes=} not found!"
+        )
+    for result in results:
+        update_allocations(result["districtId"], result["id"], result["votes"])
+    return {"politicalPartyLists": results}
+
+
+def _imported_votes(result):
+    """Returns the result of an import and the districts imported, whose
+    allocation states are outdated and discarded"""
+    if result is None:
+        raise VoteImportError("Votes could not be imported!")
+    district_ids = result.pop("districtIds")
+    allocation_states.discard_districts(district_ids)
+    return result, district_ids
+
+
+def _allocation_input(calculation_input, district_id, scrutiny_id):
+    """Validates the input of a seats calculation
+
+    @return: the scrutiny and its political party lists.
+    """
+    if not calculation_input:
+        raise ScrutinyNotFoundError(f"Scrutiny with {scrutiny_id=} not found!")
+    scrutiny = calculation_input["scrutiny"]
+    logger.debug("dhondt_calculation scrutiny received %s", scrutiny)
+    political_party_lists = calculation_input["politicalPartyLists"]
+    if not political_party_lists:
+        raise PoliticalPartyListsNotFoundError(
+            f"Political Party Lists with {district_id=} not found!"
+        )
+    logger.debug(
+        "dhondt_calculation political_party_lists received %s",
+        political_party_lists,
+    )
+    return scrutiny, political_party_lists
+
+
+def _is_latest(cached, latest_result_id):
+    """Tells whether a cached result is still the latest of its scrutiny
+
+    The cache is per process, another process may have stored a newer
+    result since.
+    """
+    if cached["resultId"] != latest_result_id:
+        logger.debug("Cached result %s is not the latest one", cached["resultId"])
+        return False
+    logger.debug("Returning cached result.. %s", cached)
+    return True
+
+
+def allocate_seats(scrutiny_id, district_id, political_party_lists, seats):
+    """Seats allocation of a scrutiny, reusing its allocation state
+
+    CPU bound, the asyncio service runs it in a worker thread.
+    """
+    result = allocation_states.allocate(
+        scrutiny_id,
+        district_id,
+        political_party_lists,
+        seats,
+        auto_dhondt_calculation,
+        allocation_max_moves(seats, len(political_party_lists)),
+    )
+    logger.debug("dhondt_calculation result received %s", result)
+    return result
+
+
+def _calculated_result(cache_key, scrutiny, seats_result, ret):
+    """Caches and publishes the result of a calculation stored"""
+    if ret is None:
+        raise ScrutinyNotFoundError(f"Scrutiny with {scrutiny['id']=} not found!")
+    result_cache.put(cache_key, ret)
+    publish_projection(
+        scrutiny["districtId"],
+        scrutiny["id"],
+        seats_result,
+        ret["resultId"],
+        ret["calculationDate"],
+    )
+    logger.debug("Returning.. %s", ret)
+    return ret
+
+
 class DhondtService:
     """Dhondt Service business layer class
 
@@ -71,28 +447,42 @@ class DhondtService:
     def __init__(self, repository: DhondtRepository):
         self.repository = repository
 
-    def get_districts(self, scrutiny_date=None, district_id=None):
-        districts = self.repository.get_districts(scrutiny_date, district_id)
-        if districts is None:
-            raise DistrictsNotFoundError(
+    def get_districts(
+        self, scrutiny_date=None, district_id=None, after=None, limit=None
+    ):
+        districts = self.repository.get_districts(
+            scrutiny_date, district_id, after=after, limit=_fetch_limit(limit)
+        )
+        return _listing(
+            districts,
+            "districts",
+            limit,
+            bool(district_id),
+            DistrictsNotFoundError(
                 f"Districts with {scrutiny_date=} and {district_id=} not found!"
-            )
-        if district_id:
-            return districts[0]
-        return {"districts": districts}
+            ),
+        )
 
-    def get_political_party_lists(self, district_id, pplist_id=None):
-        political_party_lists = self.repository.get_political_party_lists(
-            district_id=district_id,
-            pplist_id=pplist_id,
+    def get_political_party_lists(
+        self, district_id, pplist_id=None, after=None, limit=None
+    ):
+        political_party_lists = vote_buffer.read(
+            lambda: self.repository.get_political_party_lists(
+                district_id=district_id,
+                pplist_id=pplist_id,
+                after=after,
+                limit=_fetch_limit(limit),
+            )
         )
-        if political_party_lists is None:
-            raise PoliticalPartyListsNotFoundError(
+        return _listing(
+            political_party_lists,
+            "politicalPartyLists",
+            limit,
+            bool(pplist_id),
+            PoliticalPartyListsNotFoundError(
                 f"Political Party Lists with {district_id=} and {pplist_id=} not found!"
-            )
-        if pplist_id:
-            return political_party_lists[0]
-        return {"politicalPartyLists": political_party_lists}
+            ),
+        )
 
     def create_political_party_list(self, name, electors, districtId):
         result = self.repository.create_political_party_list(
@@ -105,34 +495,40 @@ class DhondtService:
         return result
 
     def update_political_party_list(self, pplist_id, district_id, name, electors):
-        political_party_lists = self.repository.get_political_party_lists(
-            district_id=district_id,
-            pplist_id=pplist_id,
+        political_party_list = _single_pplist(
+            self.repository.get_political_party_lists(
+                district_id=district_id,
+                pplist_id=pplist_id,
+            ),
+            district_id,
+            pplist_id,
         )
-        if not political_party_lists or len(political_party_lists) > 1:
-            raise PoliticalPartyListsNotFoundError(
-                f"Political Party Lists with {district_id=} and {pplist_id=} not found!"
-            )
         result = self.repository.update_political_party_list(
-            political_party_lists[0]["id"],
+            political_party_list["id"],
             name=name,
             electors=electors,
         )
         return result
 
-    def get_scrutinies(self, district_id, scrutiny_id=None, scrutiny_date=None):
+    def get_scrutinies(
+        self, district_id, scrutiny_id=None, scrutiny_date=None, after=None, limit=None
+    ):
         scrutinies = self.repository.get_scrutinies(
             district_id=district_id,
             scrutiny_date=scrutiny_date,
             scrutiny_id=scrutiny_id,
+            after=after,
+            limit=_fetch_limit(limit),
         )
-        if scrutinies is None:
-            raise ScrutinyNotFoundError(
+        return _listing(
+            scrutinies,
+            "scrutinies",
+            limit,
+            bool(scrutiny_id),
+            ScrutinyNotFoundError(
                 f"Scrutiny with {scrutiny_date=} and {scrutiny_id=} not found!"
-            )
-        if scrutiny_id:
-            return scrutinies[0]
-        return {"scrutinies": scrutinies}
+            ),
+        )
 
     def create_scrutiny(self, district_id, votingDate, scrutinyDate, name, seats):
         scrutinies = self.repository.create_scrutiny(
@@ -148,69 +544,167 @@ class DhondtService:
         return scrutinies
 
     def update_vote(self, district_id, pplist_id, votes):
-        political_party_lists = self.repository.get_political_party_lists(
-            district_id=district_id, pplist_id=pplist_id
+        political_party_list = _single_pplist(
+            self.repository.get_political_party_lists(
+                district_id=district_id, pplist_id=pplist_id
+            ),
+            district_id,
+            pplist_id,
         )
-        if not political_party_lists:
-            raise PoliticalPartyListsNotFoundError(
-                f"Political Party Lists with {district_id=} not found!"
+        if vote_buffer.enabled:
+            # Written behind by the buffer flusher
+            vote_buffer.set(district_id, pplist_id, votes)
+            result = dict(political_party_list, votes=votes)
+        else:
+            result = self.repository.update_political_party_list(
+                political_party_list["id"],
+                votes=votes,
             )
-        result = self.repository.update_political_party_list(
-            political_party_lists[0]["id"],
-            votes=votes,
-        )
+        update_allocations(district_id, result["id"], result["votes"])
+        self._refresh_projections([district_id])
         return result
 
-    def get_seats_results(self, district_id, scrutiny_id, limit=None):
-        logger.debug("get_seats_results limit [ %s ] received ", limit)
-        seats_results = self.repository.get_seats_results(
-            district_id=district_id, scrutiny_id=scrutiny_id, limit=limit
-        )
-        if seats_results is None:
-            raise SeatsResultsNotFoundError(
-                f"Scrutiny with {district_id=} and {scrutiny_id=} not found!"
+    def increment_vote(self, district_id, pplist_id, delta):
+        """Adds votes to a political party list, atomically in the database
+        or summed by the vote buffer"""
+        if vote_buffer.enabled:
+
+            def load():
+                return self.repository.get_political_party_lists(
+                    district_id=district_id, pplist_id=pplist_id
+                )
+
+            # Checked when buffered, a flush over the column would fail
+            result = vote_buffer.add(
+                district_id, pplist_id, delta, load=load, limit=MAX_VOTES
             )
-        return {"scrutinyResults": seats_results}
+            if result is not None:
+                result = result[0]
+        else:
+            result = self.repository.increment_votes(district_id, pplist_id, delta)
+        if result is None:
+            raise PoliticalPartyListsNotFoundError(
+                f"Political Party Lists with {district_id=} and {pplist_id=} not found!"
+            )
+        update_allocations(district_id, result["id"], result["votes"])
+        self._refresh_projections([district_id])
+        return result
 
-    def calculate_seats(self, district_id, scrutiny_id):
-        scrutiny = self.repository.get_scrutinies(
-            district_id=district_id, scrutiny_id=scrutiny_id
+    def update_votes(self, votes):
+        # Buffered votes are older, they are written first (or raise)
+        vote_buffer.flush()
+        results = _updated_votes(self.repository.update_votes(votes), votes)
+        self._refresh_projections(
+            {x["districtId"] for x in results["politicalPartyLists"]}
         )
-        if not scrutiny:
-            raise ScrutinyNotFoundError(f"Scrutiny with {scrutiny_id=} not found!")
+        return results
+
+    def import_votes(self, stream, fmt):
+        """Imports the votes of a CSV or NDJSON text stream
 
-        logger.debug("dhondt_calculation scrutiny received %s", scrutiny)
-        seats = scrutiny[0]["seats"]
+        The stream is read lazily and imported in one transaction.
 
-        political_party_lists = self.repository.get_political_party_lists(
-            district_id=district_id
+        :param stream: text file like object.
+        :param fmt: ``csv`` or ``ndjson``.
+        """
+        vote_buffer.flush()
+        result, district_ids = _imported_votes(
+            self.repository.import_votes(read_votes(stream, fmt))
         )
-        if not political_party_lists:
-            raise PoliticalPartyListsNotFoundError(
-                f"Political Party Lists with {district_id=} not found!"
+        self._refresh_projections(district_ids)
+        return result
+
+    def _refresh_projections(self, district_ids):
+        """Publishes the projections of the scrutinies with subscribers in
+        the districts written, see ``_projections_to_build``"""
+        for district_id, scrutiny_id in _projections_to_build(district_ids):
+            calculation_input = vote_buffer.read(
+                functools.partial(
+                    self.repository.get_calculation_input,
+                    district_id=district_id,
+                    scrutiny_id=scrutiny_id,
+                ),
+                key="politicalPartyLists",
+            )
+            _publish_allocation(calculation_input, district_id, scrutiny_id)
+
+    def seed_projection(self, district_id, scrutiny_id):
+        """Publishes the latest result stored of a scrutiny subscribed, so
+        its subscribers start with it when no projection was published in
+        this process"""
+        if not projection_hub.published_projection(district_id, scrutiny_id):
+            _seed_projection(
+                self.repository.get_latest_seats_result(
+                    district_id=district_id, scrutiny_id=scrutiny_id
+                )
             )
 
+    def get_district_version(self, district_id):
+        """Returns the version of the district lists and scrutinies, None if
+        the district is not found"""
+        version = self.repository.get_district_version(district_id)
+        if version is not None and vote_buffer.enabled:
+            # Buffered votes are read before they are written
+            version["version"] = [
+                version["version"],
+                vote_buffer.district_version(district_id),
+            ]
+        return version
+
+    def get_scrutiny_version(self, district_id, scrutiny_id):
+        """Returns the version of the scrutiny results, None if the scrutiny
+        is not found"""
+        return self.repository.get_scrutiny_version(district_id, scrutiny_id)
+
+    def get_seats_results(self, district_id, scrutiny_id, after=None, limit=None):
         logger.debug(
-            "dhondt_calculation political_party_lists received %s",
-            political_party_lists,
+            "get_seats_results after [ %s ] limit [ %s ] received ", after, limit
+        )
+        seats_results = self.repository.get_seats_results(
+            district_id=district_id,
+            scrutiny_id=scrutiny_id,
+            after=after,
+            limit=_fetch_limit(limit),
         )
-        result = dhondt_calculation(
-            political_parties=political_party_lists, seats=seats
+        return _listing(
+            seats_results,
+            "scrutinyResults",
+            limit,
+            False,
+            SeatsResultsNotFoundError(
+                f"Scrutiny with {district_id=} and {scrutiny_id=} not found!"
+            ),
+            cursor="resultId",
         )
 
-        logger.debug("dhondt_calculation result received %s", result)
+    def get_latest_seats_result(self, district_id, scrutiny_id):
+        seats_result = self.repository.get_latest_seats_result(
+            district_id=district_id, scrutiny_id=scrutiny_id
+        )
+        if seats_result is None:
+            raise SeatsResultsNotFoundError(
+                f"Latest result with {district_id=} and {scrutiny_id=} not found!"
+            )
+        return seats_result
 
-        ret = self.repository.create_dhondt_result(
-            scrutiny_id,
-            result,
-        )
-        logger.debug("create_dhondt_result received %s", ret)
-        ret.update(
-            {
-                "districtId": district_id,
-                "seatsResults": result,
-                "scrutinyName": scrutiny[0]["name"],
-            }
-        )
-        logger.debug("Returning.. %s", ret)
-        return ret
+    def calculate_seats(self, district_id, scrutiny_id):
+        calculation_input = vote_buffer.read(
+            lambda: self.repository.get_calculation_input(
+                district_id=district_id, scrutiny_id=scrutiny_id
+            ),
+            key="politicalPartyLists",
+        )
+        scrutiny, political_party_lists = _allocation_input(
+            calculation_input, district_id, scrutiny_id
+        )
+        seats = scrutiny["seats"]
+        cache_key = result_cache.fingerprint(scrutiny_id, seats, political_party_lists)
+        cached = result_cache.get(cache_key)
+        if cached is not None and _is_latest(
+            cached, self.repository.get_latest_result_id(scrutiny_id)
+        ):
+            return cached
+
+        result = allocate_seats(scrutiny_id, district_id, political_party_lists, seats)
+        ret = self.repository.create_calculated_result(scrutiny, result)
+        return _calculated_result(cache_key, scrutiny, result, ret)
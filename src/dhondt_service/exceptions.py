@@ -1,4 +1,4 @@
-from dhondt.db.exceptions import PoliticalPartyListsAlreadyExist
+from dhondt.db.exceptions import PoliticalPartyListsAlreadyExist, VotesOutOfRange
 
 
 class DistrictsNotFoundError(Exception):
@@ -15,3 +15,7 @@ class ScrutinyNotFoundError(Exception):
 
 class SeatsResultsNotFoundError(Exception):
     pass
+
+
+class VoteImportError(Exception):
+    pass
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+# Seconds between keep-alive comments of an idle stream
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+
+SSE_EVENT = "seats"
+
+
+def _default(o):
+    if isinstance(o, date):
+        return o.isoformat()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def encode_event(event):
+    """Returns the Server-Sent Event message of a seats projection"""
+    data = json.dumps(event, default=_default, separators=(",", ":"))
+    return f"event: {SSE_EVENT}\ndata: {data}\n\n"
+
+
+class Subscription:
+    """Subscription read from a thread, e.g. a WSGI streaming response
+
+    Only the newest message is kept, a slow reader skips the projections
+    already outdated instead of queuing them.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._message = None
+        self._seq = 0
+        self._seen = 0
+
+    def push(self, message):
+        with self._condition:
+            self._message = message
+            self._seq += 1
+            self._condition.notify_all()
+
+    def get(self, timeout=None):
+        """Returns the next message, None if none arrives in ``timeout``"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._seq != self._seen, timeout):
+                return None
+            self._seen = self._seq
+            return self._message
+
+
+class AsyncSubscription:
+    """Subscription read from an event loop, e.g. an ASGI streaming response
+
+    Same as ``Subscription``, messages may be pushed from any thread.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        self._message = None
+        self._seq = 0
+        self._seen = 0
+
+    def _set(self, message):
+        self._message = message
+        self._seq += 1
+        self._event.set()
+
+    def push(self, message):
+        self._loop.call_soon_threadsafe(self._set, message)
+
+    async def get(self, timeout=None):
+        """Returns the next message, None if none arrives in ``timeout``"""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._event.clear()
+        if self._seq == self._seen:
+            return None
+        self._seen = self._seq
+        return self._message
+
+
+class ProjectionHub:
+    """In process fan-out of the seats projections of each scrutiny
+
+    A projection is published once per change of its seats, encoded once
+    and pushed to every subscriber of the scrutiny. New subscribers get
+    the latest projection first.
+
+    The hub is per process: a subscriber only gets the projections of the
+    writes and calculations served by its own worker process.
+    """
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._latest = {}
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, district_id, scrutiny_id, subscription):
+        key = (district_id, scrutiny_id)
+        with self._lock:
+            self._subscriptions.setdefault(key, set()).add(subscription)
+            latest = self._latest.get(key)
+            if latest is not None:
+                subscription.push(latest[1])
+        return subscription
+
+    def unsubscribe(self, district_id, scrutiny_id, subscription):
+        key = (district_id, scrutiny_id)
+        with self._lock:
+            subscriptions = self._subscriptions.get(key, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(key, None)
+
+    def publish(self, district_id, scrutiny_id, event, initial=False):
+        """Publishes a projection when its seats changed
+
+        :param event: projection, a dictionary with at least the
+          ``seatsResults`` of the scrutiny.
+        :param initial: only published when there is no projection of the
+          scrutiny yet, e.g. the result stored when it is subscribed.
+        @return: True if it was published.
+        """
+        key = (district_id, scrutiny_id)
+        seats = tuple((x["pplistId"], x["seats"]) for x in event["seatsResults"])
+        with self._lock:
+            latest = self._latest.get(key)
+            if latest is not None and (initial or latest[0] == seats):
+                return False
+            message = encode_event(event)
+            self._latest[key] = (seats, message)
+            self.published += 1
+            # Pushed under the lock, so the projections arrive in order
+            subscriptions = self._subscriptions.get(key, ())
+            logger.debug("Publishing %s to %d subscribers", key, len(subscriptions))
+            for subscription in subscriptions:
+                subscription.push(message)
+        return True
+
+    def published_projection(self, district_id, scrutiny_id):
+        """Tells whether a projection of the scrutiny was published"""
+        with self._lock:
+            return (district_id, scrutiny_id) in self._latest
+
+    def subscribed_scrutinies(self, district_id):
+        """Returns the ids of the scrutinies of the district with
+        subscribers"""
+        with self._lock:
+            return [
+                scrutiny_id
+                for (
+                    district,
+                    scrutiny_id,
+                ), subscriptions in self._subscriptions.items()
+                if district == district_id and subscriptions
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._subscriptions.clear()
+            self._latest.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": sum(len(x) for x in self._subscriptions.values()),
+                "published": self.published,
+            }
+
+
+projection_hub = ProjectionHub()
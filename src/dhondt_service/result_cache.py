@@ -0,0 +1,83 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+
+
+class ResultCache:
+    """Bounded LRU cache of the seats results calculated
+
+    Results are keyed by the scrutiny, its seats and the ppls vector used
+    in the calculation, so a hit has the same votes, not only the same
+    hash. Only the latest result of each scrutiny is kept. The cache is per
+    process, so a hit is only returned while it is the latest result stored
+    of its scrutiny (``DhondtRepository.get_latest_result_id``).
+
+    :param maxsize: maximum quantity of results kept.
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+        self._scrutiny_keys = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def fingerprint(scrutiny_id, seats, political_parties):
+        """Returns the cache key of a calculation
+
+        :param scrutiny_id: id of the scrutiny.
+        :param seats: Total seats available to be assigned
+        :param political_parties: list of ppl dictionary (same like API schema).
+        """
+        votes = sorted((x["id"], x["votes"], x["name"]) for x in political_parties)
+        return scrutiny_id, seats, tuple(votes)
+
+    def get(self, key):
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.hits += 1
+            return deepcopy(result)
+
+    def put(self, key, result):
+        with self._lock:
+            # Only the latest result of the scrutiny can be returned
+            previous = self._scrutiny_keys.pop(key[0], None)
+            if previous is not None:
+                self._results.pop(previous, None)
+            self._results[key] = deepcopy(result)
+            self._scrutiny_keys[key[0]] = key
+            while len(self._results) > self.maxsize:
+                evicted, _ = self._results.popitem(last=False)
+                self._scrutiny_keys.pop(evicted[0], None)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._scrutiny_keys.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._results),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+result_cache = ResultCache()
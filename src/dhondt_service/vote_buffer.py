@@ -0,0 +1,296 @@
+import atexit
+import logging
+import os
+import threading
+
+from dhondt.db.controller import get_db_session
+from dhondt.db.dhondt_repository import DhondtRepository
+from dhondt.db.exceptions import VotesOutOfRange
+
+logger = logging.getLogger(__name__)
+
+# Write-behind of the vote updates, off by default. The buffer is per worker
+# process: a worker reads its own buffered votes and only the flushed votes
+# of the others, so reads (and the district_version part of the ETags) may
+# lag by up to VOTE_BUFFER_FLUSH_MS across workers
+VOTE_BUFFER = os.getenv("VOTE_BUFFER", "off").lower() in ("on", "1", "true")
+VOTE_BUFFER_FLUSH_MS = int(os.getenv("VOTE_BUFFER_FLUSH_MS", "200"))
+VOTE_BUFFER_MAX_UPDATES = int(os.getenv("VOTE_BUFFER_MAX_UPDATES", "1000"))
+
+
+def _merge(old, new):
+    """Merges two buffered updates of a ppl, ``(votes set, votes added)``
+
+    A set replaces the previous updates (last write wins), additions are
+    summed to the previous ones.
+    """
+    if old is None or new[0] is not None:
+        return new
+    return old[0], old[1] + new[1]
+
+
+def _apply(update, votes):
+    """Votes of a ppl with ``votes`` persisted after the buffered update"""
+    votes_set, votes_added = update
+    return (votes if votes_set is None else votes_set) + votes_added
+
+
+def write_votes(sets, increments):
+    """Writes the flushed votes in one transaction of the repository"""
+    with get_db_session() as session:
+        return DhondtRepository(session).write_votes(sets, increments)
+
+
+class VoteBuffer:
+    """Write-behind buffer of the vote updates
+
+    Updates are kept by ppl and merged, so many updates of the same ppl
+    are a single write. A background thread flushes them in one batched
+    transaction every ``flush_ms`` or when ``max_updates`` ppls are
+    pending, and on shutdown. Reads apply the updates buffered to the
+    votes loaded from the database, see ``read``.
+
+    The buffer is per process: with several workers, each one reads the
+    votes buffered by itself and only the votes flushed by the others, and
+    ``district_version`` counts its own updates only.
+
+    :param enabled: when False updates are written by the caller.
+    :param flush_ms: milliseconds between flushes.
+    :param max_updates: ppls pending that trigger a flush.
+    :param writer: function writing the lists of votes set and added,
+      ``write_votes`` by default.
+    """
+
+    def __init__(
+        self,
+        enabled=VOTE_BUFFER,
+        flush_ms=VOTE_BUFFER_FLUSH_MS,
+        max_updates=VOTE_BUFFER_MAX_UPDATES,
+        writer=write_votes,
+    ):
+        self.enabled = enabled
+        self.flush_ms = flush_ms
+        self.max_updates = max_updates
+        self.writer = writer
+        # {(district id, pplist id): (votes set, votes added)}
+        self._pending = {}
+        self._flushing = {}
+        # Buffered updates by district, part of the district version
+        self._district_updates = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        # Incremented when a flush takes the pending updates
+        self._flush_sequence = 0
+        self.updates = 0
+        self.flushes = 0
+
+    def _buffer_locked(self, district_id, pplist_id, update):
+        # Called with the lock held, returns True when a flush is due
+        key = (district_id, pplist_id)
+        self._pending[key] = _merge(self._pending.get(key), update)
+        self._district_updates[district_id] = (
+            self._district_updates.get(district_id, 0) + 1
+        )
+        self.updates += 1
+        return len(self._pending) >= self.max_updates
+
+    def _buffer(self, district_id, pplist_id, update):
+        with self._lock:
+            full = self._buffer_locked(district_id, pplist_id, update)
+        if full:
+            self._wakeup.set()
+
+    def set(self, district_id, pplist_id, votes):
+        """Buffers the votes of a ppl, replacing the previous updates"""
+        self._buffer(district_id, pplist_id, (votes, 0))
+
+    def add(self, district_id, pplist_id, delta, load=None, limit=None):
+        """Buffers an increment of the votes of a ppl
+
+        With ``load`` the votes of the ppl are read like ``read`` does and
+        checked against ``limit`` under the same lock that buffers the
+        increment, so concurrent increments cannot buffer votes over it
+        (the flush would fail on every retry).
+
+        :param load: function reading from the repository the ppl, a list
+          of ppl dictionary (same like API schema).
+        :param limit: largest votes of the ppl, None for no limit.
+        @return: the ppls loaded with the increment applied, None if
+          ``load`` is not given or returns None (nothing is buffered).
+        @raise VotesOutOfRange: the votes would be over ``limit``.
+        """
+        update = (None, delta)
+        if load is None:
+            self._buffer(district_id, pplist_id, update)
+            return None
+
+        def apply(political_party_lists):
+            if limit is not None and any(
+                x["id"] == pplist_id and x["votes"] > limit - delta
+                for x in self._overlay(political_party_lists)
+            ):
+                raise VotesOutOfRange(
+                    f"Votes of {pplist_id=} over {limit} adding {delta=}"
+                )
+            full = self._buffer_locked(district_id, pplist_id, update)
+            return self._overlay(political_party_lists), full
+
+        applied = self._consistent(load, apply)
+        if applied is None:
+            return None
+        political_party_lists, full = applied
+        if full:
+            self._wakeup.set()
+        return political_party_lists
+
+    def _overlay(self, political_party_lists):
+        # Called with the lock held and no flush in progress
+        if not self._pending:
+            return political_party_lists
+        results = []
+        for pplist in political_party_lists:
+            update = self._pending.get((pplist["districtId"], pplist["id"]))
+            if update is not None:
+                pplist = dict(pplist, votes=_apply(update, pplist["votes"]))
+            results.append(pplist)
+        return results
+
+    def _wait_flush(self):
+        with self._flush_lock:
+            pass
+
+    def read(self, load, key=None):
+        """Returns the ppls loaded with the votes buffered applied
+
+        Whether a load sees the votes of a flush is only known once the
+        flush ends, so a load overlapping a flush waits for it and is
+        retried. The votes flushed are counted once, either loaded or
+        buffered.
+
+        :param load: function reading from the repository a list of ppl
+          dictionary (same like API schema), or a dictionary with them.
+        :param key: key of the ppls in the dictionary loaded, None when the
+          list is loaded.
+        @return: the value loaded, None if ``load`` returns None.
+        """
+        if not self.enabled:
+            return load()
+
+        def apply(value):
+            if key is None:
+                return self._overlay(value)
+            return dict(value, **{key: self._overlay(value[key])})
+
+        return self._consistent(load, apply)
+
+    def _consistent(self, load, apply):
+        """Calls ``apply`` with the lock held on a value loaded outside of
+        any flush, see ``read``
+
+        @return: result of ``apply``, None if ``load`` returns None.
+        """
+        while True:
+            with self._lock:
+                flushing = bool(self._flushing)
+                sequence = self._flush_sequence
+            if flushing:
+                self._wait_flush()
+                continue
+            value = load()
+            with self._lock:
+                if self._flush_sequence == sequence:
+                    return None if value is None else apply(value)
+            self._wait_flush()
+
+    def district_version(self, district_id):
+        """Quantity of updates buffered of the district"""
+        with self._lock:
+            return self._district_updates.get(district_id, 0)
+
+    def flush(self):
+        """Writes the pending updates in one transaction
+
+        On failure the updates are buffered again, under the newer ones,
+        and the error is raised, so a write that must follow them aborts.
+
+        @return: quantity of ppls written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+                self._flush_sequence += 1
+            sets = []
+            increments = []
+            for (district_id, pplist_id), update in self._flushing.items():
+                vote = {"districtId": district_id, "pplistId": pplist_id}
+                if update[0] is None:
+                    increments.append(dict(vote, votes=update[1]))
+                else:
+                    sets.append(dict(vote, votes=_apply(update, 0)))
+            try:
+                self.writer(sets, increments)
+            except Exception:
+                logger.exception(
+                    "Flush of %d buffered votes failed", len(self._flushing)
+                )
+                with self._lock:
+                    for key, update in self._flushing.items():
+                        pending = self._pending.get(key)
+                        self._pending[key] = (
+                            update if pending is None else _merge(update, pending)
+                        )
+                    self._flushing = {}
+                raise
+            with self._lock:
+                written = len(self._flushing)
+                self._flushing = {}
+                self.flushes += 1
+            logger.debug("Flushed %d buffered votes", written)
+            return written
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_ms / 1000)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Logged by flush, retried on the next wakeup
+                pass
+
+    def start(self):
+        """Starts the background flusher, the buffer is flushed at exit"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="vote-buffer-flusher", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stops the background flusher and flushes the pending updates,
+        raising if they could not be written"""
+        if self._thread is not None:
+            self._stopping = True
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "updates": self.updates,
+                "flushes": self.flushes,
+            }
+
+
+vote_buffer = VoteBuffer()
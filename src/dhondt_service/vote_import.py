@@ -0,0 +1,75 @@
+import csv
+import json
+import logging
+
+from dhondt.db.dhondt_repository import MAX_ID, MAX_VOTES
+from dhondt.dhondt_service.exceptions import VoteImportError
+
+logger = logging.getLogger(__name__)
+
+VOTE_FIELDS = ("districtId", "pplistId", "votes")
+
+
+def _vote(record, line):
+    try:
+        vote = {key: int(record[key]) for key in VOTE_FIELDS}
+    except (KeyError, TypeError, ValueError) as e:
+        raise VoteImportError(f"Invalid vote in line {line}: {e!r}")
+    # Out of range values would fail the whole COPY/executemany of the import
+    if (
+        not 1 <= vote["districtId"] <= MAX_ID
+        or not 1 <= vote["pplistId"] <= MAX_ID
+        or not 0 <= vote["votes"] <= MAX_VOTES
+    ):
+        raise VoteImportError(f"Invalid vote in line {line}: {vote}")
+    return vote
+
+
+def read_csv_votes(stream):
+    """Yields the votes of a CSV text stream
+
+    The first row is the header, with ``districtId``, ``pplistId`` and
+    ``votes`` columns.
+
+    :param stream: text file like object.
+    """
+    # line 1 is the header
+    for line, record in enumerate(csv.DictReader(stream), start=2):
+        yield _vote(record, line)
+
+
+def read_ndjson_votes(stream):
+    """Yields the votes of a NDJSON text stream
+
+    Each line is an object with ``districtId``, ``pplistId`` and ``votes``
+    keys, blank lines are skipped.
+
+    :param stream: text file like object.
+    """
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise VoteImportError(f"Invalid vote in line {line}: {e}")
+        yield _vote(record, line)
+
+
+VOTE_READERS = {
+    "csv": read_csv_votes,
+    "ndjson": read_ndjson_votes,
+}
+
+
+def read_votes(stream, fmt):
+    """Yields the votes of a text stream in the given format
+
+    :param stream: text file like object.
+    :param fmt: format name, one of ``VOTE_READERS`` keys.
+    """
+    try:
+        reader = VOTE_READERS[fmt]
+    except KeyError:
+        raise VoteImportError(f"Unknown votes format {fmt=}")
+    return reader(stream)
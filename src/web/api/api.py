@@ -1,7 +1,8 @@
+import io
 import logging
-from copy import deepcopy
 
-from flask import abort, jsonify
+from flask import Response, abort, current_app, jsonify, request
+from werkzeug.http import http_date
 from flask.views import MethodView
 from flask_smorest import Blueprint
 from marshmallow import ValidationError
@@ -9,12 +10,19 @@ from marshmallow import ValidationError
 from dhondt.db.controller import get_db_session
 from dhondt.db.dhondt_repository import DhondtRepository
 from dhondt.dhondt_service.dhondt_service import DhondtService
+from dhondt.dhondt_service.projections import (
+    SSE_KEEPALIVE,
+    Subscription,
+    projection_hub,
+)
 from dhondt.dhondt_service.exceptions import (
     DistrictsNotFoundError,
     PoliticalPartyListsNotFoundError,
     ScrutinyNotFoundError,
     SeatsResultsNotFoundError,
     PoliticalPartyListsAlreadyExist,
+    VoteImportError,
+    VotesOutOfRange,
 )
 
 
@@ -32,13 +40,23 @@ from dhondt.web.api.schemas import (
     GetDistrictsParameters,
     GetScrutiniesParameters,
     UpgradeVoteParameters,
+    IncrementVoteParameters,
+    UpgradeVotesParameters,
+    ImportVotesResult,
     GetResultsParameters,
+    PageParameters,
     ResourceId,
 )
 
 
 logger = logging.getLogger(__name__)
 
+# Content types accepted by the votes import and its format
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+}
+
 blueprint = Blueprint("dhondt", __name__, description="D'hondt method API")
 
 
@@ -53,6 +71,14 @@ def bad_request_handler(e):
     return jsonify(code=400, status="Bad Request.", detail=str(e.description)), 400
 
 
+@blueprint.errorhandler(415)
+def unsupported_media_type_handler(e):
+    return (
+        jsonify(code=415, status="Unsupported Media Type.", detail=str(e.description)),
+        415,
+    )
+
+
 @blueprint.errorhandler(422)
 def unprocessable_handler(e):
     return (
@@ -78,56 +104,45 @@ def _validate_resources(**kwargs):
 
 
 def _validate_result(schema, result):
-    logger.debug(" Validating %s %s", schema, result)
-    errors = schema().validate(result)
+    validation = current_app.extensions["response_validation"]
+    errors = validation.validate(schema, result)
     if errors:
         abort(500, description=f"Validation error. Msg {errors}")
 
 
-def _validate_scrutiny_result(result):
-    res = deepcopy(result)
-    res["votingDate"] = res["votingDate"].isoformat()
-    res["scrutinyDate"] = res["scrutinyDate"].isoformat()
-    logger.debug(" Validating scrutiny %s", res)
-    errors = Scrutiny().validate(res)
-    if errors:
-        abort(500, description=f"Validation error. Msg {errors}")
+def version_etag_data(path, args, version):
+    """Data hashed in the ETag of a GET response of a versioned resource,
+    shared with the ASGI application
 
+    :param args: query arguments, ``{name: [values]}``.
+    :param version: version returned by the service.
+    """
+    return {"path": path, "args": args, "version": version["version"]}
 
-def _validate_scrutinies_result(results):
-    list_res = []
-    for org_res in results["scrutinies"]:
-        res = deepcopy(org_res)
-        res["votingDate"] = res["votingDate"].isoformat()
-        res["scrutinyDate"] = res["scrutinyDate"].isoformat()
-        list_res.append(res)
-    to_val = {"scrutinies": list_res}
-    logger.debug(" Validating scrutinies %s", to_val)
-    errors = GetScrutinies().validate(to_val)
-    if errors:
-        abort(500, description=f"Validation error. Msg {errors}")
 
+def last_modified(updated_at):
+    """Last-Modified header of a resource, none if it is not dated"""
+    if updated_at is None:
+        return {}
+    return {"Last-Modified": http_date(updated_at)}
 
-def _validate_seats_result(result):
-    res = deepcopy(result)
-    res["calculationDate"] = res["calculationDate"].isoformat()
-    logger.debug(" Validating seats_result %s", res)
-    errors = SeatsResults().validate(res)
-    if errors:
-        abort(500, description=f"Validation error. Msg {errors}")
 
+def _set_version_etag(version):
+    """Sets the ETag of a GET response from the version of the resource
 
-def _validate_total_seats_result(results):
-    list_res = []
-    for org_res in results["scrutinyResults"]:
-        res = deepcopy(org_res)
-        res["calculationDate"] = res["calculationDate"].isoformat()
-        list_res.append(res)
-    to_val = {"scrutinyResults": list_res}
-    logger.debug(" Validating total reasult %s", to_val)
-    errors = TotalSeatsResults().validate(to_val)
-    if errors:
-        abort(500, description=f"Validation error. Msg {errors}")
+    Raises 304 (Not Modified) when the ETag matches If-None-Match, before
+    the resource is queried.
+
+    :param version: version returned by the service, None if the resource
+      is not found.
+    @return: headers of the response (Last-Modified).
+    """
+    if version is None:
+        return {}
+    blueprint.set_etag(
+        version_etag_data(request.path, request.args.to_dict(flat=False), version)
+    )
+    return last_modified(version["updatedAt"])
 
 
 ########################
@@ -143,7 +158,11 @@ class DistrictsRoute(MethodView):
             with get_db_session() as session:
                 repo = DhondtRepository(session)
                 dhondt_service = DhondtService(repo)
-                results = dhondt_service.get_districts(scrutiny_date=scrutiny_date)
+                results = dhondt_service.get_districts(
+                    scrutiny_date=scrutiny_date,
+                    after=parameters.get("after"),
+                    limit=parameters.get("limit"),
+                )
             _validate_result(GetDistricts, results)
             return results
 
@@ -176,18 +195,25 @@ class DistrictRoute(MethodView):
 
 @blueprint.route("/dhondt/v1/districts/<int:districtId>/political-party-lists")
 class PoliticalPartyListsRoute(MethodView):
+    @blueprint.etag
+    @blueprint.arguments(PageParameters, location="query")
     @blueprint.response(status_code=200, schema=GetPoliticalPartyLists)
-    def get(self, districtId):
+    def get(self, parameters, districtId):
         _validate_resources(districtId=districtId)
         try:
             with get_db_session() as session:
                 repo = DhondtRepository(session)
                 dhondt_service = DhondtService(repo)
+                headers = _set_version_etag(
+                    dhondt_service.get_district_version(districtId)
+                )
                 results = dhondt_service.get_political_party_lists(
-                    district_id=districtId
+                    district_id=districtId,
+                    after=parameters.get("after"),
+                    limit=parameters.get("limit"),
                 )
             _validate_result(GetPoliticalPartyLists, results)
-            return results
+            return results, headers
 
         except PoliticalPartyListsNotFoundError:
             abort(
@@ -287,6 +313,7 @@ class PoliticalPartyListRoute(MethodView):
 
 @blueprint.route("/dhondt/v1/districts/<int:districtId>/scrutinies")
 class ScrutiniesRoute(MethodView):
+    @blueprint.etag
     @blueprint.arguments(GetScrutiniesParameters, location="query")
     @blueprint.response(status_code=200, schema=GetScrutinies)
     def get(self, parameters, districtId):
@@ -296,11 +323,17 @@ class ScrutiniesRoute(MethodView):
             with get_db_session() as session:
                 repo = DhondtRepository(session)
                 dhondt_service = DhondtService(repo)
+                headers = _set_version_etag(
+                    dhondt_service.get_district_version(districtId)
+                )
                 results = dhondt_service.get_scrutinies(
-                    district_id=districtId, scrutiny_date=scrutiny_date
+                    district_id=districtId,
+                    scrutiny_date=scrutiny_date,
+                    after=parameters.get("after"),
+                    limit=parameters.get("limit"),
                 )
-            _validate_scrutinies_result(results)
-            return results
+            _validate_result(GetScrutinies, results)
+            return results, headers
 
         except ScrutinyNotFoundError:
             detail = f"Scrutiny with {districtId=} " + (
@@ -319,7 +352,7 @@ class ScrutiniesRoute(MethodView):
                 results = dhondt_service.create_scrutiny(
                     district_id=districtId, **payload
                 )
-            _validate_scrutiny_result(results)
+            _validate_result(Scrutiny, results)
             return results
 
         except DistrictsNotFoundError:
@@ -343,7 +376,7 @@ class ScrutinyRoute(MethodView):
                 results = dhondt_service.get_scrutinies(
                     district_id=districtId, scrutiny_id=scrutinyId
                 )
-            _validate_scrutiny_result(results)
+            _validate_result(Scrutiny, results)
             return results
 
         except ScrutinyNotFoundError:
@@ -380,6 +413,82 @@ def upgrade_vote(parameters, districtId, pplistId):
         )
 
 
+@blueprint.route(
+    "/dhondt/v1/districts/<int:districtId>/political-party-lists/<int:pplistId>"
+    "/vote/delta",
+    methods=["POST"],
+)
+@blueprint.response(status_code=200, schema=PoliticalPartyList)
+@blueprint.arguments(IncrementVoteParameters)
+def increment_vote(parameters, districtId, pplistId):
+    _validate_resources(districtId=districtId, pplistId=pplistId)
+    try:
+        with get_db_session() as session:
+            repo = DhondtRepository(session)
+            dhondt_service = DhondtService(repo)
+            results = dhondt_service.increment_vote(
+                district_id=districtId,
+                pplist_id=pplistId,
+                delta=parameters.get("delta"),
+            )
+        _validate_result(PoliticalPartyList, results)
+        return results
+
+    except PoliticalPartyListsNotFoundError:
+        abort(
+            404,
+            description=f"Political Party Lists with pplist id {pplistId} not found!",
+        )
+    except VotesOutOfRange as e:
+        abort(422, description=str(e))
+
+
+@blueprint.route("/dhondt/v1/political-party-lists/votes", methods=["PUT"])
+@blueprint.response(status_code=200, schema=GetPoliticalPartyLists)
+@blueprint.arguments(UpgradeVotesParameters)
+def upgrade_votes(parameters):
+    votes = parameters.get("politicalPartyListVotes")
+    try:
+        with get_db_session() as session:
+            repo = DhondtRepository(session)
+            dhondt_service = DhondtService(repo)
+            results = dhondt_service.update_votes(votes)
+        _validate_result(GetPoliticalPartyLists, results)
+        return results
+
+    except PoliticalPartyListsNotFoundError:
+        abort(
+            404,
+            description="Political Party Lists with given district id not found!",
+        )
+
+
+@blueprint.route("/dhondt/v1/political-party-lists/votes/import", methods=["POST"])
+@blueprint.response(status_code=200, schema=ImportVotesResult)
+def import_votes():
+    fmt = IMPORT_CONTENT_TYPES.get(request.mimetype)
+    if fmt is None:
+        abort(
+            415,
+            description=f"Content type {request.mimetype} not supported, use one of "
+            f"{', '.join(IMPORT_CONTENT_TYPES)}",
+        )
+    # The body is streamed, it is never loaded entirely in memory
+    stream = io.TextIOWrapper(
+        io.BufferedReader(request.stream), encoding="utf-8", newline=""
+    )
+    try:
+        with get_db_session() as session:
+            repo = DhondtRepository(session)
+            dhondt_service = DhondtService(repo)
+            results = dhondt_service.import_votes(stream, fmt)
+        _validate_result(ImportVotesResult, results)
+        return results
+
+    except VoteImportError as e:
+        abort(422, description=str(e))
+
+
 ########################
 # Seats Result
 ########################
@@ -387,6 +496,7 @@ def upgrade_vote(parameters, districtId, pplistId):
     "/dhondt/v1/districts/<int:districtId>/scrutinies/<int:scrutinyId>/seats-status"
 )
 class CalculateSeatsRoute(MethodView):
+    @blueprint.etag
     @blueprint.response(status_code=200, schema=TotalSeatsResults)
     @blueprint.arguments(GetResultsParameters, location="query")
     def get(self, parameters, districtId, scrutinyId):
@@ -395,13 +505,17 @@ class CalculateSeatsRoute(MethodView):
             with get_db_session() as session:
                 repo = DhondtRepository(session)
                 dhondt_service = DhondtService(repo)
+                headers = _set_version_etag(
+                    dhondt_service.get_scrutiny_version(districtId, scrutinyId)
+                )
                 results = dhondt_service.get_seats_results(
                     district_id=districtId,
                     scrutiny_id=scrutinyId,
+                    after=parameters.get("after"),
                     limit=parameters.get("limit"),
                 )
-            _validate_total_seats_result(results)
-            return results
+            _validate_result(TotalSeatsResults, results)
+            return results, headers
 
         except SeatsResultsNotFoundError:
             abort(
@@ -421,7 +535,7 @@ class CalculateSeatsRoute(MethodView):
                 results = dhondt_service.calculate_seats(
                     district_id=districtId, scrutiny_id=scrutinyId
                 )
-            _validate_seats_result(results)
+            _validate_result(SeatsResults, results)
             return results
 
         except ScrutinyNotFoundError:
@@ -431,3 +545,70 @@ class CalculateSeatsRoute(MethodView):
                     f"Scrutiny with scrutiny {districtId=} and {scrutinyId} not found!"
                 ),
             )
+
+
+@blueprint.route(
+    "/dhondt/v1/districts/<int:districtId>/scrutinies/<int:scrutinyId>"
+    "/seats-status/latest"
+)
+class LatestSeatsRoute(MethodView):
+    @blueprint.etag
+    @blueprint.response(status_code=200, schema=SeatsResults)
+    def get(self, districtId, scrutinyId):
+        _validate_resources(districtId=districtId, scrutinyId=scrutinyId)
+        try:
+            with get_db_session() as session:
+                repo = DhondtRepository(session)
+                dhondt_service = DhondtService(repo)
+                results = dhondt_service.get_latest_seats_result(
+                    district_id=districtId, scrutiny_id=scrutinyId
+                )
+            # The latest result is read anyway, the ETag saves its transfer
+            blueprint.set_etag({"resultId": results["resultId"]})
+            _validate_result(SeatsResults, results)
+            return results, last_modified(results["calculationDate"])
+
+        except SeatsResultsNotFoundError:
+            abort(
+                404,
+                description=(
+                    f"Latest result not found for {districtId=} and {scrutinyId=}!"
+                ),
+            )
+
+
+@blueprint.route(
+    "/dhondt/v1/districts/<int:districtId>/scrutinies/<int:scrutinyId>"
+    "/seats-status/stream"
+)
+def stream_seats(districtId, scrutinyId):
+    """Server-Sent Events of the seats of the scrutiny, pushed when a vote
+    update or a calculation changes them, starting with its latest result"""
+    _validate_resources(districtId=districtId, scrutinyId=scrutinyId)
+    with get_db_session() as session:
+        dhondt_service = DhondtService(DhondtRepository(session))
+        version = dhondt_service.get_scrutiny_version(districtId, scrutinyId)
+        if version is not None:
+            dhondt_service.seed_projection(districtId, scrutinyId)
+    if version is None:
+        abort(
+            404,
+            description=f"Scrutiny with {districtId=} and {scrutinyId=} not found!",
+        )
+
+    subscription = projection_hub.subscribe(districtId, scrutinyId, Subscription())
+
+    def events():
+        try:
+            yield ": subscribed\n\n"
+            while True:
+                message = subscription.get(SSE_KEEPALIVE)
+                yield ": keep-alive\n\n" if message is None else message
+        finally:
+            projection_hub.unsubscribe(districtId, scrutinyId, subscription)
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
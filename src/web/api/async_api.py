@@ -0,0 +1,570 @@
+import hashlib
+import io
+import json
+import logging
+import tempfile
+from http import HTTPStatus
+
+from marshmallow import ValidationError
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from dhondt.db.async_repository import AsyncDhondtRepository
+from dhondt.db.controller import get_async_db_session
+from dhondt.dhondt_service.async_dhondt_service import AsyncDhondtService
+from dhondt.dhondt_service.projections import (
+    SSE_KEEPALIVE,
+    AsyncSubscription,
+    projection_hub,
+)
+from dhondt.dhondt_service.exceptions import (
+    DistrictsNotFoundError,
+    PoliticalPartyListsNotFoundError,
+    ScrutinyNotFoundError,
+    SeatsResultsNotFoundError,
+    PoliticalPartyListsAlreadyExist,
+    VoteImportError,
+    VotesOutOfRange,
+)
+from dhondt.web.api.api import (
+    IMPORT_CONTENT_TYPES,
+    last_modified,
+    version_etag_data,
+)
+from dhondt.web.api.config import BaseConfig
+from dhondt.web.api.validation import ResponseValidation
+from dhondt.web.json_provider import JSON_PROVIDER_ORJSON, dumps_bytes, orjson
+from dhondt.web.api.schemas import (
+    CreatePoliticalPartyList,
+    PoliticalPartyList,
+    GetPoliticalPartyLists,
+    District,
+    GetDistricts,
+    CreateScrutiny,
+    Scrutiny,
+    GetScrutinies,
+    SeatsResults,
+    TotalSeatsResults,
+    GetDistrictsParameters,
+    GetScrutiniesParameters,
+    UpgradeVoteParameters,
+    IncrementVoteParameters,
+    UpgradeVotesParameters,
+    ImportVotesResult,
+    GetResultsParameters,
+    PageParameters,
+    ResourceId,
+)
+
+logger = logging.getLogger(__name__)
+
+# Votes import bodies larger than this (bytes) are spooled to disk
+IMPORT_SPOOL_SIZE = 1024 * 1024
+
+
+class OrjsonResponse(JSONResponse):
+    """JSON response encoded with orjson, like the Flask ``OrjsonProvider``"""
+
+    def render(self, content):
+        return dumps_bytes(content)
+
+
+if BaseConfig.JSON_PROVIDER == JSON_PROVIDER_ORJSON and orjson is not None:
+    APIResponse = OrjsonResponse
+else:
+    APIResponse = JSONResponse
+
+response_validation = ResponseValidation(
+    mode=BaseConfig.RESPONSE_VALIDATION,
+    sample_rate=BaseConfig.RESPONSE_VALIDATION_SAMPLE_RATE,
+)
+
+# Same status of the error bodies than the Flask blueprint handlers
+ERROR_STATUS = {
+    400: "Bad Request.",
+    404: "Not Found",
+    415: "Unsupported Media Type.",
+    422: "Unprocessable Entity.",
+    500: "Internal Error.",
+}
+
+
+async def http_error_handler(request, exc):
+    status = ERROR_STATUS.get(exc.status_code) or HTTPStatus(exc.status_code).phrase
+    return APIResponse(
+        {"code": exc.status_code, "status": status, "detail": str(exc.detail)},
+        status_code=exc.status_code,
+    )
+
+
+def abort(code, description):
+    raise HTTPException(code, detail=description)
+
+
+def _service(session):
+    return AsyncDhondtService(AsyncDhondtRepository(session))
+
+
+def _validate_resources(**kwargs):
+    logger.debug(" Validating %s", kwargs)
+    for _, val in kwargs.items():
+        errors = ResourceId().validate({"id": val})
+        if errors:
+            abort(422, description=f"Validation error. Error: id {errors['id']}")
+
+
+def _query(schema, request):
+    try:
+        return schema().load(request.query_params)
+    except ValidationError as e:
+        abort(422, description=f"Validation error. Error: {e.messages}")
+
+
+async def _payload(schema, request):
+    try:
+        data = await request.json()
+    except ValueError as e:
+        abort(400, description=f"Invalid JSON body. Error: {e}")
+    try:
+        return schema().load(data)
+    except ValidationError as e:
+        abort(422, description=f"Validation error. Error: {e.messages}")
+
+
+def _response(schema, result, status_code=200, headers=None):
+    """Serializes the result validated by its response schema"""
+    errors = response_validation.validate(schema, result)
+    if errors:
+        abort(500, description=f"Validation error. Msg {errors}")
+    return APIResponse(schema().dump(result), status_code=status_code, headers=headers)
+
+
+def _etag_headers(request, etag_data, updated_at):
+    """ETag and Last-Modified headers of a GET response, like flask-smorest
+    ``set_etag`` does
+
+    @return: the headers and whether the ETag matches If-None-Match.
+    """
+    data = json.dumps(etag_data, sort_keys=True, default=str)
+    etag = '"{}"'.format(hashlib.sha1(data.encode("utf-8")).hexdigest())
+    matches = {
+        x.strip().removeprefix("W/")
+        for x in request.headers.get("if-none-match", "").split(",")
+    }
+    headers = {"ETag": etag, **last_modified(updated_at)}
+    return headers, etag in matches or "*" in matches
+
+
+def _version_etag(request, version):
+    """Same as ``_set_version_etag`` of the Flask API
+
+    :param version: version returned by the service, None if the resource
+      is not found.
+    @return: the headers and whether the response is not modified (304).
+    """
+    if version is None:
+        return {}, False
+    args = {key: request.query_params.getlist(key) for key in request.query_params}
+    return _etag_headers(
+        request,
+        version_etag_data(request.url.path, args, version),
+        version["updatedAt"],
+    )
+
+
+########################
+# Configurations
+########################
+async def get_districts(request):
+    parameters = _query(GetDistrictsParameters, request)
+    scrutiny_date = parameters.get("scrutinyDate")
+    try:
+        async with get_async_db_session() as session:
+            results = await _service(session).get_districts(
+                scrutiny_date=scrutiny_date,
+                after=parameters.get("after"),
+                limit=parameters.get("limit"),
+            )
+    except DistrictsNotFoundError:
+        detail = (
+            f"District with scrutiny date {scrutiny_date}"
+            if scrutiny_date
+            else "Districts "
+        )
+        abort(404, description="{}not found!".format(detail))
+    return _response(GetDistricts, results)
+
+
+async def get_district(request):
+    districtId = request.path_params["districtId"]
+    _validate_resources(districtId=districtId)
+    try:
+        async with get_async_db_session() as session:
+            results = await _service(session).get_districts(district_id=districtId)
+    except DistrictsNotFoundError:
+        abort(404, description=f"District with district id {districtId} not found!")
+    return _response(District, results)
+
+
+async def get_political_party_lists(request):
+    districtId = request.path_params["districtId"]
+    _validate_resources(districtId=districtId)
+    parameters = _query(PageParameters, request)
+    try:
+        async with get_async_db_session() as session:
+            service = _service(session)
+            headers, not_modified = _version_etag(
+                request, await service.get_district_version(districtId)
+            )
+            if not_modified:
+                return Response(status_code=304, headers=headers)
+            results = await service.get_political_party_lists(
+                district_id=districtId,
+                after=parameters.get("after"),
+                limit=parameters.get("limit"),
+            )
+    except PoliticalPartyListsNotFoundError:
+        abort(404, description=f"Political Party Lists with {districtId=} not found!")
+    return _response(GetPoliticalPartyLists, results, headers=headers)
+
+
+async def create_political_party_list(request):
+    districtId = request.path_params["districtId"]
+    _validate_resources(districtId=districtId)
+    payload = await _payload(CreatePoliticalPartyList, request)
+    try:
+        async with get_async_db_session() as session:
+            results = await _service(session).create_political_party_list(
+                districtId=districtId, **payload
+            )
+    except DistrictsNotFoundError:
+        abort(404, description=f"District Id {districtId} not found!")
+    except PoliticalPartyListsAlreadyExist:
+        abort(
+            409,
+            description=f"Political Party Lists with {districtId=} and {payload['name']=} already exists",
+        )
+    return _response(PoliticalPartyList, results, status_code=201)
+
+
+async def get_political_party_list(request):
+    districtId = request.path_params["districtId"]
+    pplistId = request.path_params["pplistId"]
+    _validate_resources(districtId=districtId, pplistId=pplistId)
+    try:
+        async with get_async_db_session() as session:
+            results = await _service(session).get_political_party_lists(
+                district_id=districtId, pplist_id=pplistId
+            )
+    except PoliticalPartyListsNotFoundError:
+        abort(
+            404,
+            description=f"Political Party Lists with district id {districtId} not found!",
+        )
+    return _response(PoliticalPartyList, results)
+
+
+async def update_political_party_list(request):
+    districtId = request.path_params["districtId"]
+    pplistId = request.path_params["pplistId"]
+    _validate_resources(districtId=districtId, pplistId=pplistId)
+    parameters = await _payload(CreatePoliticalPartyList, request)
+    try:
+        async with get_async_db_session() as session:
+            results = await _service(session).update_political_party_list(
+                district_id=districtId,
+                pplist_id=pplistId,
+                name=parameters.get("name"),
+                electors=parameters.get("electors"),
+            )
+    except (PoliticalPartyListsNotFoundError, DistrictsNotFoundError):
+        abort(
+            404,
+            description=f"Political Party Lists with district id {districtId} not found!",
+        )
+    except PoliticalPartyListsAlreadyExist:
+        abort(
+            409,
+            description=f"Political Party Lists with {districtId=} and {parameters['name']=} already exists",
+        )
+    return _response(PoliticalPartyList, results)
+
+
+async def get_scrutinies(request):
+    districtId = request.path_params["districtId"]
+    _validate_resources(districtId=districtId)
+    parameters = _query(GetScrutiniesParameters, request)
+    scrutiny_date = parameters.get("scrutinyDate")
+    try:
+        async with get_async_db_session() as session:
+            service = _service(session)
+            headers, not_modified = _version_etag(
+                request, await service.get_district_version(districtId)
+            )
+            if not_modified:
+                return Response(status_code=304, headers=headers)
+            results = await service.get_scrutinies(
+                district_id=districtId,
+                scrutiny_date=scrutiny_date,
+                after=parameters.get("after"),
+                limit=parameters.get("limit"),
+            )
+    except ScrutinyNotFoundError:
+        detail = f"Scrutiny with {districtId=} " + (
+            f"and {scrutiny_date=} " if scrutiny_date else ""
+        )
+        abort(404, description="{}not found!".format(detail))
+    return _response(GetScrutinies, results, headers=headers)
+
+
+async def create_scrutiny(request):
+    districtId = request.path_params["districtId"]
+    _validate_resources(districtId=districtId)
+    payload = await _payload(CreateScrutiny, request)
+    try:
+        async with get_async_db_session() as session:
+            results = await _service(session).create_scrutiny(
+                district_id=districtId, **payload
+            )
+    except DistrictsNotFoundError:
+        abort(404, description=f"District Id {districtId} not found!")
+    return _response(Scrutiny, results, status_code=201)
+
+
+async def get_scrutiny(request):
+    districtId = request.path_params["districtId"]
+    scrutinyId = request.path_params["scrutinyId"]
+    _validate_resources(districtId=districtId, scrutinyId=scrutinyId)
+    try:
+        async with get_async_db_session() as session:
+            results = await _service(session).get_scrutinies(
+                district_id=districtId, scrutiny_id=scrutinyId
+            )
+    except ScrutinyNotFoundError:
+        abort(404, description=f"Scrutiny with scrutiny id {scrutinyId} not found!")
+    return _response(Scrutiny, results)
+
+
+########################
+# Upgrading votes
+########################
+async def upgrade_vote(request):
+    districtId = request.path_params["districtId"]
+    pplistId = request.path_params["pplistId"]
+    _validate_resources(districtId=districtId, pplistId=pplistId)
+    parameters = await _payload(UpgradeVoteParameters, request)
+    try:
+        async with get_async_db_session() as session:
+            results = await _service(session).update_vote(
+                district_id=districtId,
+                pplist_id=pplistId,
+                votes=parameters.get("votes"),
+            )
+    except PoliticalPartyListsNotFoundError:
+        abort(
+            404,
+            description=f"Political Party Lists with pplist id {pplistId} not found!",
+        )
+    return _response(PoliticalPartyList, results)
+
+
+async def increment_vote(request):
+    districtId = request.path_params["districtId"]
+    pplistId = request.path_params["pplistId"]
+    _validate_resources(districtId=districtId, pplistId=pplistId)
+    parameters = await _payload(IncrementVoteParameters, request)
+    try:
+        async with get_async_db_session() as session:
+            results = await _service(session).increment_vote(
+                district_id=districtId,
+                pplist_id=pplistId,
+                delta=parameters.get("delta"),
+            )
+    except PoliticalPartyListsNotFoundError:
+        abort(
+            404,
+            description=f"Political Party Lists with pplist id {pplistId} not found!",
+        )
+    except VotesOutOfRange as e:
+        abort(422, description=str(e))
+    return _response(PoliticalPartyList, results)
+
+
+async def upgrade_votes(request):
+    parameters = await _payload(UpgradeVotesParameters, request)
+    try:
+        async with get_async_db_session() as session:
+            results = await _service(session).update_votes(
+                parameters.get("politicalPartyListVotes")
+            )
+    except PoliticalPartyListsNotFoundError:
+        abort(
+            404,
+            description="Political Party Lists with given district id not found!",
+        )
+    return _response(GetPoliticalPartyLists, results)
+
+
+async def import_votes(request):
+    mimetype = request.headers.get("content-type", "").split(";")[0].strip()
+    fmt = IMPORT_CONTENT_TYPES.get(mimetype)
+    if fmt is None:
+        abort(
+            415,
+            description=f"Content type {mimetype} not supported, use one of "
+            f"{', '.join(IMPORT_CONTENT_TYPES)}",
+        )
+    # The body is spooled, large imports are kept on disk and not in memory
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE) as body:
+        async for chunk in request.stream():
+            body.write(chunk)
+        body.seek(0)
+        stream = io.TextIOWrapper(body, encoding="utf-8", newline="")
+        try:
+            async with get_async_db_session() as session:
+                results = await _service(session).import_votes(stream, fmt)
+        except VoteImportError as e:
+            abort(422, description=str(e))
+    return _response(ImportVotesResult, results)
+
+
+########################
+# Seats Result
+########################
+async def get_seats_results(request):
+    districtId = request.path_params["districtId"]
+    scrutinyId = request.path_params["scrutinyId"]
+    _validate_resources(districtId=districtId, scrutinyId=scrutinyId)
+    parameters = _query(GetResultsParameters, request)
+    try:
+        async with get_async_db_session() as session:
+            service = _service(session)
+            headers, not_modified = _version_etag(
+                request, await service.get_scrutiny_version(districtId, scrutinyId)
+            )
+            if not_modified:
+                return Response(status_code=304, headers=headers)
+            results = await service.get_seats_results(
+                district_id=districtId,
+                scrutiny_id=scrutinyId,
+                after=parameters.get("after"),
+                limit=parameters.get("limit"),
+            )
+    except SeatsResultsNotFoundError:
+        abort(
+            404,
+            description=f"Seats results not found for {districtId=} and {scrutinyId=}!",
+        )
+    return _response(TotalSeatsResults, results, headers=headers)
+
+
+async def get_latest_seats_result(request):
+    districtId = request.path_params["districtId"]
+    scrutinyId = request.path_params["scrutinyId"]
+    _validate_resources(districtId=districtId, scrutinyId=scrutinyId)
+    try:
+        async with get_async_db_session() as session:
+            results = await _service(session).get_latest_seats_result(
+                district_id=districtId, scrutiny_id=scrutinyId
+            )
+    except SeatsResultsNotFoundError:
+        abort(
+            404,
+            description=f"Latest result not found for {districtId=} and {scrutinyId=}!",
+        )
+    # The latest result is read anyway, the ETag saves its transfer
+    headers, not_modified = _etag_headers(
+        request, {"resultId": results["resultId"]}, results["calculationDate"]
+    )
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    return _response(SeatsResults, results, headers=headers)
+
+
+async def calculate_seats(request):
+    districtId = request.path_params["districtId"]
+    scrutinyId = request.path_params["scrutinyId"]
+    _validate_resources(districtId=districtId, scrutinyId=scrutinyId)
+    try:
+        async with get_async_db_session() as session:
+            results = await _service(session).calculate_seats(
+                district_id=districtId, scrutiny_id=scrutinyId
+            )
+    except ScrutinyNotFoundError:
+        abort(
+            404,
+            description=f"Scrutiny with scrutiny {districtId=} and {scrutinyId} not found!",
+        )
+    return _response(SeatsResults, results)
+
+
+async def stream_seats(request):
+    districtId = request.path_params["districtId"]
+    scrutinyId = request.path_params["scrutinyId"]
+    _validate_resources(districtId=districtId, scrutinyId=scrutinyId)
+    async with get_async_db_session() as session:
+        dhondt_service = _service(session)
+        version = await dhondt_service.get_scrutiny_version(districtId, scrutinyId)
+        if version is not None:
+            await dhondt_service.seed_projection(districtId, scrutinyId)
+    if version is None:
+        abort(
+            404,
+            description=f"Scrutiny with {districtId=} and {scrutinyId=} not found!",
+        )
+
+    subscription = projection_hub.subscribe(districtId, scrutinyId, AsyncSubscription())
+
+    async def events():
+        try:
+            yield ": subscribed\n\n"
+            while True:
+                message = await subscription.get(SSE_KEEPALIVE)
+                yield ": keep-alive\n\n" if message is None else message
+        finally:
+            projection_hub.unsubscribe(districtId, scrutinyId, subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+API_PREFIX = "/dhondt/v1"
+DISTRICT = API_PREFIX + "/districts/{districtId:int}"
+PPLIST = DISTRICT + "/political-party-lists/{pplistId:int}"
+SCRUTINY = DISTRICT + "/scrutinies/{scrutinyId:int}"
+
+routes = [
+    Route(API_PREFIX + "/districts", get_districts, methods=["GET"]),
+    Route(DISTRICT, get_district, methods=["GET"]),
+    Route(
+        DISTRICT + "/political-party-lists",
+        get_political_party_lists,
+        methods=["GET"],
+    ),
+    Route(
+        DISTRICT + "/political-party-lists",
+        create_political_party_list,
+        methods=["POST"],
+    ),
+    Route(PPLIST, get_political_party_list, methods=["GET"]),
+    Route(PPLIST, update_political_party_list, methods=["PUT"]),
+    Route(PPLIST + "/vote", upgrade_vote, methods=["PUT"]),
+    Route(PPLIST + "/vote/delta", increment_vote, methods=["POST"]),
+    Route(DISTRICT + "/scrutinies", get_scrutinies, methods=["GET"]),
+    Route(DISTRICT + "/scrutinies", create_scrutiny, methods=["POST"]),
+    Route(SCRUTINY, get_scrutiny, methods=["GET"]),
+    Route(SCRUTINY + "/seats-status", get_seats_results, methods=["GET"]),
+    Route(SCRUTINY + "/seats-status", calculate_seats, methods=["POST"]),
+    Route(SCRUTINY + "/seats-status/latest", get_latest_seats_result, methods=["GET"]),
+    Route(SCRUTINY + "/seats-status/stream", stream_seats, methods=["GET"]),
+    Route(API_PREFIX + "/political-party-lists/votes", upgrade_votes, methods=["PUT"]),
+    Route(
+        API_PREFIX + "/political-party-lists/votes/import",
+        import_votes,
+        methods=["POST"],
+    ),
+]
@@ -1,3 +1,7 @@
+import os
+import tempfile
+
+
 class BaseConfig:
     API_TITLE = "D'Hondt Method System API"
     API_VERSION = 'v1'
@@ -8,6 +12,25 @@ class BaseConfig:
     OPENAPI_REDOC_URL = 'https://cdn.jsdelivr.net/npm/redoc@next/bundles/redoc.standalone.js'  # noqa: E501
     OPENAPI_SWAGGER_UI_PATH = '/docs/dhondt'
     OPENAPI_SWAGGER_UI_URL = 'https://cdn.jsdelivr.net/npm/swagger-ui-dist/'
+    # Response validation: strict, sampled (1 of each SAMPLE_RATE) or off
+    RESPONSE_VALIDATION = os.getenv('RESPONSE_VALIDATION', 'strict')
+    RESPONSE_VALIDATION_SAMPLE_RATE = int(os.getenv('RESPONSE_VALIDATION_SAMPLE_RATE', '100'))
+    # JSON encoder of the responses: orjson or default (stock Flask encoder)
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson')
+    # Prometheus metrics of the requests, queries and calculations in /metrics
+    METRICS = os.getenv('METRICS', 'on').lower() in ('on', '1', 'true')
+    # Per request profiling (cProfile), of the requests with the PROFILING_TOKEN
+    # value in PROFILING_HEADER (empty token: none) and 1 of each
+    # PROFILING_SAMPLE_RATE requests (0 none), the newest PROFILING_MAX_PROFILES
+    # (0 all) saved in PROFILING_DIR
+    PROFILING = os.getenv('PROFILING', 'off').lower() in ('on', '1', 'true')
+    PROFILING_HEADER = os.getenv('PROFILING_HEADER', 'X-Profile')
+    PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+    PROFILING_MAX_PROFILES = int(os.getenv('PROFILING_MAX_PROFILES', '100'))
+    PROFILING_SAMPLE_RATE = int(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+    PROFILING_DIR = os.getenv(
+        'PROFILING_DIR', os.path.join(tempfile.gettempdir(), 'dhondt-profiles')
+    )
 
 
 class Production(BaseConfig):
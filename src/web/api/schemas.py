@@ -1,3 +1,4 @@
+import datetime as dt
 import string
 from marshmallow import Schema, fields, validate, EXCLUDE
 
@@ -20,6 +21,46 @@ INTEGER_INT32_POS_REQ_0 = fields.Integer(
 
 INTEGER_ID = INTEGER_INT32_POS_REQ_1
 
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
+PAGE_AFTER = fields.Integer(validate=validate.Range(min=0, max=2**31))
+
+PAGE_LIMIT = fields.Integer(
+    validate=validate.Range(min=1, max=MAX_PAGE_LIMIT),
+    load_default=DEFAULT_PAGE_LIMIT,
+)
+
+NEXT_CURSOR = fields.Integer(allow_none=True)
+
+
+class ResultDate(fields.Date):
+    """Date of a response, validated as the date object of the result or
+    as its ISO string"""
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        if isinstance(value, dt.date):
+            return value
+        return super()._deserialize(value, attr, data, **kwargs)
+
+
+class ResultDateTime(fields.DateTime):
+    """Date-time of a response, validated as the datetime object of the
+    result or as its ISO string"""
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        if isinstance(value, dt.datetime):
+            return value
+        return super()._deserialize(value, attr, data, **kwargs)
+
+
+class PageParameters(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    after = PAGE_AFTER
+    limit = PAGE_LIMIT
+
 
 class CreatePoliticalPartyList(Schema):
     class Meta:
@@ -40,6 +81,7 @@ class GetPoliticalPartyLists(Schema):
         unknown = EXCLUDE
 
     politicalPartyLists = fields.List(fields.Nested(PoliticalPartyList), required=True)
+    nextCursor = NEXT_CURSOR
 
 
 class District(Schema):
@@ -52,6 +94,7 @@ class GetDistricts(Schema):
         unknown = EXCLUDE
 
     districts = fields.List(fields.Nested(District), required=True)
+    nextCursor = NEXT_CURSOR
 
 
 class CreateScrutiny(Schema):
@@ -67,6 +110,8 @@ class CreateScrutiny(Schema):
 class Scrutiny(CreateScrutiny):
     id = INTEGER_ID
     districtId = INTEGER_ID
+    votingDate = ResultDate(required=True)
+    scrutinyDate = ResultDate(required=True)
 
 
 class GetScrutinies(Schema):
@@ -74,6 +119,7 @@ class GetScrutinies(Schema):
         unknown = EXCLUDE
 
     scrutinies = fields.List(fields.Nested(Scrutiny), required=True)
+    nextCursor = NEXT_CURSOR
 
 
 class SeatsResult(Schema):
@@ -92,7 +138,7 @@ class SeatsResults(Schema):
     resultId = INTEGER_ID
     scrutinyId = INTEGER_ID
     scrutinyName = NAME_FIELD_REQ
-    calculationDate = fields.Date(required=True)
+    calculationDate = ResultDateTime(required=True)
     seatsResults = fields.List(fields.Nested(SeatsResult), required=True)
 
 
@@ -101,34 +147,54 @@ class TotalSeatsResults(Schema):
         unknown = EXCLUDE
 
     scrutinyResults = fields.List(fields.Nested(SeatsResults), required=True)
+    nextCursor = NEXT_CURSOR
 
 
-class GetDistrictsParameters(Schema):
-    class Meta:
-        unknown = EXCLUDE
+class GetDistrictsParameters(PageParameters):
+    scrutinyDate = fields.Date()
 
+
+class GetScrutiniesParameters(PageParameters):
     scrutinyDate = fields.Date()
 
 
-class GetScrutiniesParameters(Schema):
+class UpgradeVoteParameters(Schema):
     class Meta:
         unknown = EXCLUDE
 
-    scrutinyDate = fields.Date()
+    votes = INTEGER_INT32_POS_REQ_0
 
 
-class UpgradeVoteParameters(Schema):
+class IncrementVoteParameters(Schema):
     class Meta:
         unknown = EXCLUDE
 
-    votes = INTEGER_INT32_POS_REQ_0
+    delta = INTEGER_INT32_POS_REQ_0
 
 
-class GetResultsParameters(Schema):
+class PoliticalPartyListVote(UpgradeVoteParameters):
+    districtId = INTEGER_ID
+    pplistId = INTEGER_ID
+
+
+class UpgradeVotesParameters(Schema):
     class Meta:
         unknown = EXCLUDE
 
-    limit = INTEGER_INT32_POS_REQ_0
+    politicalPartyListVotes = fields.List(
+        fields.Nested(PoliticalPartyListVote),
+        validate=validate.Length(min=1),
+        required=True,
+    )
+
+
+class ImportVotesResult(Schema):
+    rows = INTEGER_INT32_POS_REQ_0
+    updated = INTEGER_INT32_POS_REQ_0
+
+
+class GetResultsParameters(PageParameters):
+    pass
 
 
 class ResourceId(Schema):
@@ -0,0 +1,62 @@
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_VALIDATION_STRICT = "strict"
+RESPONSE_VALIDATION_SAMPLED = "sampled"
+RESPONSE_VALIDATION_OFF = "off"
+
+RESPONSE_VALIDATION_MODES = (
+    RESPONSE_VALIDATION_STRICT,
+    RESPONSE_VALIDATION_SAMPLED,
+    RESPONSE_VALIDATION_OFF,
+)
+
+
+class ResponseValidation:
+    """Validation of the results against its response schema
+
+    :param mode: ``strict`` validates every response, ``sampled`` one of
+      each ``sample_rate`` responses and ``off`` none.
+    :param sample_rate: N of the 1-in-N sampled validation.
+    """
+
+    def __init__(self, mode=RESPONSE_VALIDATION_STRICT, sample_rate=100):
+        if mode not in RESPONSE_VALIDATION_MODES:
+            raise ValueError(f"Unknown response validation {mode=}")
+        if sample_rate < 1:
+            raise ValueError(f"Invalid response validation {sample_rate=}")
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self._responses = itertools.count()
+
+    @classmethod
+    def from_config(cls, config):
+        """Creates the validation of the ``RESPONSE_VALIDATION`` and
+        ``RESPONSE_VALIDATION_SAMPLE_RATE`` config keys"""
+        return cls(
+            mode=config.get("RESPONSE_VALIDATION", RESPONSE_VALIDATION_STRICT),
+            sample_rate=int(config.get("RESPONSE_VALIDATION_SAMPLE_RATE", 100)),
+        )
+
+    def enabled(self):
+        """Tells whether the current response must be validated"""
+        if self.mode == RESPONSE_VALIDATION_STRICT:
+            return True
+        if self.mode == RESPONSE_VALIDATION_OFF:
+            return False
+        return next(self._responses) % self.sample_rate == 0
+
+    def validate(self, schema, result):
+        """Validates the result, as returned by the service, with the schema
+
+        Dates are validated as objects by the response schemas, so the
+        result is neither copied nor modified.
+
+        @return: dictionary of errors, empty if valid or not validated.
+        """
+        if not self.enabled():
+            return {}
+        logger.debug(" Validating %s %s", schema, result)
+        return schema().validate(result)
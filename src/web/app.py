@@ -9,8 +9,14 @@ from apispec import APISpec
 from flask_smorest import Api
 
 from dhondt.db.dhondt_repository import init_repository
+from dhondt.dhondt_service.vote_buffer import vote_buffer
 from dhondt.web.api.config import BaseConfig
+from dhondt.web.api.validation import ResponseValidation
+from dhondt.web.json_provider import json_provider_class
 import dhondt.web.api.api as api
+import dhondt.web.cli as cli
+import dhondt.web.metrics as metrics
+import dhondt.web.profiling as profiling
 import dhondt.web.views as views
 
 
@@ -39,13 +45,15 @@ def create_app(test_config=None):
     """
     app = Flask(__name__)
 
-    if test_config is None:
-        # load the instance config, if it exists, when not testing
-        app.config.from_object(BaseConfig)
-    else:
+    app.config.from_object(BaseConfig)
+    if test_config is not None:
         # load the test config if passed in
         app.config.from_mapping(test_config)
 
+    app.json = json_provider_class(app.config["JSON_PROVIDER"])(app)
+    app.extensions["response_validation"] = ResponseValidation.from_config(app.config)
+    vote_buffer.start()
+
     dhondt_api = Api(app)
 
     # register views
@@ -55,6 +63,17 @@ def create_app(test_config=None):
     # register api
     dhondt_api.register_blueprint(api.blueprint)
 
+    # register metrics
+    if app.config["METRICS"]:
+        metrics.init_app(app)
+
+    # register profiling
+    if app.config["PROFILING"]:
+        profiling.init_app(app)
+
+    # register commands
+    app.cli.add_command(cli.import_votes_command)
+
     # load openapi specification
     api_spec = yaml.safe_load((Path(__file__).parent / SPEC_NAMEFILE).read_text())
     spec = APISpec(
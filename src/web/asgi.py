@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+"""ASGI entry point of the API
+
+Serves the same endpoints, schemas, ETags and metrics than the Flask
+application on the asyncio repository, so a request waiting for the
+database does not hold an OS thread. Run it with an ASGI server, e.g.::
+
+    uvicorn dhondt.web.asgi:app
+
+The request profiling (``PROFILING``) and the vote buffer (``VOTE_BUFFER``)
+are only available in the Flask application.
+"""
+
+import logging
+import os
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import yaml
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from dhondt.db.async_repository import init_async_repository
+from dhondt.db.controller import DB
+from dhondt.dhondt_service.vote_buffer import vote_buffer
+from dhondt.web.api.config import BaseConfig
+from dhondt.web.metrics import METRICS_PATH, ASGIRequestTimer, asgi_metrics
+import dhondt.web.api.async_api as async_api
+
+SPEC_NAMEFILE = "dhondt.yaml"
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await init_async_repository(os.getenv("__USE_MEMORY_DB"))
+    yield
+    await DB.async_cleanup()
+
+
+def create_asgi_app(debug=False):
+    """
+    Create the ASGI application of the API
+    """
+    api_spec = yaml.safe_load((Path(__file__).parent / SPEC_NAMEFILE).read_text())
+
+    async def openapi_spec(request):
+        return JSONResponse(api_spec)
+
+    routes = async_api.routes + [
+        Route(
+            BaseConfig.OPENAPI_URL_PREFIX + BaseConfig.OPENAPI_JSON_PATH,
+            openapi_spec,
+            methods=["GET"],
+        )
+    ]
+    middleware = []
+    if BaseConfig.METRICS:
+        routes.append(Route(METRICS_PATH, asgi_metrics, methods=["GET"]))
+        middleware.append(Middleware(ASGIRequestTimer))
+    if BaseConfig.PROFILING or vote_buffer.enabled:
+        logger.warning("PROFILING and VOTE_BUFFER are ignored by the ASGI app")
+
+    return Starlette(
+        debug=debug,
+        routes=routes,
+        middleware=middleware,
+        exception_handlers={HTTPException: async_api.http_error_handler},
+        lifespan=lifespan,
+    )
+
+
+app = create_asgi_app()
@@ -0,0 +1,41 @@
+import logging
+from pathlib import Path
+
+import click
+
+from dhondt.db.controller import get_db_session
+from dhondt.db.dhondt_repository import DhondtRepository
+from dhondt.dhondt_service.dhondt_service import DhondtService
+from dhondt.dhondt_service.exceptions import VoteImportError
+from dhondt.dhondt_service.vote_import import VOTE_READERS
+
+logger = logging.getLogger(__name__)
+
+
+@click.command("import-votes")
+@click.argument("votes_file", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(sorted(VOTE_READERS)),
+    help="Votes file format, by default the file extension.",
+)
+def import_votes_command(votes_file, fmt):
+    """Imports the votes of a CSV or NDJSON file
+
+    Each vote has the districtId, pplistId and votes of a political party
+    list. The file is streamed and imported in a single transaction.
+    """
+    fmt = fmt or Path(votes_file).suffix.lstrip(".").lower()
+    try:
+        with open(votes_file, encoding="utf-8", newline="") as stream:
+            with get_db_session() as session:
+                repo = DhondtRepository(session)
+                dhondt_service = DhondtService(repo)
+                result = dhondt_service.import_votes(stream, fmt)
+    except VoteImportError as e:
+        raise click.ClickException(str(e))
+    click.echo(
+        f"{result['rows']} votes read, "
+        f"{result['updated']} political party lists updated"
+    )
@@ -0,0 +1,72 @@
+import decimal
+import logging
+
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+JSON_PROVIDER_ORJSON = "orjson"
+JSON_PROVIDER_DEFAULT = "default"
+
+ORJSON_OPTIONS = (
+    (orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS) if orjson is not None else 0
+)
+
+
+def _default(o):
+    # Types orjson does not handle natively, dates, datetimes, dataclasses
+    # and UUIDs are serialized by orjson itself (ISO 8601 dates)
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj):
+    """Serializes the object to UTF-8 JSON with orjson"""
+    return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider on orjson
+
+    Same output than the default provider (compact, sorted keys) except
+    for the dates, serialized as ISO 8601 instead of HTTP dates. The
+    response body is written as the bytes given by orjson.
+    """
+
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            dumps_bytes(obj) + b"\n", mimetype=self.mimetype
+        )
+
+
+def json_provider_class(name):
+    """Returns the JSON provider class of the ``JSON_PROVIDER`` config
+
+    :param name: ``orjson`` or ``default`` (stock Flask encoder). orjson
+      falls back to the stock encoder when it is not installed.
+    """
+    if name == JSON_PROVIDER_DEFAULT:
+        return DefaultJSONProvider
+    if name != JSON_PROVIDER_ORJSON:
+        raise ValueError(f"Unknown JSON provider {name=}")
+    if orjson is None:
+        logger.warning("orjson not installed, using the default JSON provider")
+        return DefaultJSONProvider
+    return OrjsonProvider
@@ -0,0 +1,150 @@
+import logging
+import time
+
+from flask import Blueprint, Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.responses import Response as ASGIResponse
+
+from dhondt.db.controller import DB
+from dhondt.db.entity_cache import entity_cache
+from dhondt.dhondt_service.projections import projection_hub
+from dhondt.dhondt_service.result_cache import result_cache
+from dhondt.dhondt_service.vote_buffer import vote_buffer
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = "/metrics"
+
+REQUEST_DURATION = Histogram(
+    "dhondt_http_request_duration_seconds",
+    "Duration of the HTTP requests by route",
+    ["method", "route", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+# Stats exported by ``StatsCollector``, {stats key: (metric type, help)}
+POOL_STATS = {
+    "checked_out": ("gauge", "Connections checked out of the pool"),
+    "checked_in": ("gauge", "Connections idle in the pool"),
+    "size": ("gauge", "Size of the pool"),
+    "overflow": ("gauge", "Connections open over the pool size"),
+    "checkouts": ("counter", "Connections checked out of the pool"),
+    "timeouts": ("counter", "Checkouts timed out waiting for a connection"),
+    "wait_time": ("counter", "Seconds waited for a connection"),
+    "max_wait_time": ("gauge", "Longest wait for a connection in seconds"),
+}
+CACHE_STATS = {
+    "size": ("gauge", "Entries cached"),
+    "maxsize": ("gauge", "Maximum entries cached"),
+    "hits": ("counter", "Lookups found in the cache"),
+    "misses": ("counter", "Lookups not found in the cache"),
+    "evictions": ("counter", "Entries evicted by size"),
+}
+VOTE_BUFFER_STATS = {
+    "pending": ("gauge", "Political party lists with votes pending to be written"),
+    "updates": ("counter", "Vote updates buffered"),
+    "flushes": ("counter", "Flushes of the buffered votes"),
+}
+PROJECTION_STATS = {
+    "subscribers": ("gauge", "Subscribers of the seats streams"),
+    "published": ("counter", "Seats projections published"),
+}
+
+
+def _families(prefix, stats, definitions):
+    for key, (kind, documentation) in definitions.items():
+        if key not in stats:
+            continue
+        if kind == "counter":
+            yield CounterMetricFamily(f"{prefix}_{key}", documentation, stats[key])
+        else:
+            yield GaugeMetricFamily(f"{prefix}_{key}", documentation, stats[key])
+
+
+class StatsCollector:
+    """Exports the stats of the pool, caches, vote buffer and projection
+    hub, read when the metrics are collected"""
+
+    def collect(self):
+        yield from _families("dhondt_db_pool", DB.pool_stats(), POOL_STATS)
+        yield from _families("dhondt_entity_cache", entity_cache.stats(), CACHE_STATS)
+        yield from _families("dhondt_result_cache", result_cache.stats(), CACHE_STATS)
+        yield from _families(
+            "dhondt_vote_buffer", vote_buffer.stats(), VOTE_BUFFER_STATS
+        )
+        yield from _families(
+            "dhondt_projections", projection_hub.stats(), PROJECTION_STATS
+        )
+
+
+REGISTRY.register(StatsCollector())
+
+metrics_blueprint = Blueprint("metrics", __name__)
+
+
+@metrics_blueprint.route(METRICS_PATH)
+def metrics():
+    return Response(generate_latest(REGISTRY), mimetype=CONTENT_TYPE_LATEST)
+
+
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+
+def _observe_request(response):
+    start = g.pop("request_start", None)
+    if start is not None:
+        # Labelled by the rule, not the path, so the ids are not labels
+        rule = request.url_rule.rule if request.url_rule else "<unmatched>"
+        REQUEST_DURATION.labels(request.method, rule, response.status_code).observe(
+            time.perf_counter() - start
+        )
+    return response
+
+
+def init_app(app):
+    """Records the duration of the requests of the application and serves
+    the metrics in ``METRICS_PATH``"""
+    app.before_request(_start_timer)
+    app.after_request(_observe_request)
+    app.register_blueprint(metrics_blueprint)
+
+
+async def asgi_metrics(request):
+    """``METRICS_PATH`` endpoint of the ASGI application"""
+    return ASGIResponse(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+class ASGIRequestTimer:
+    """ASGI middleware recording the duration of the requests, labelled by
+    the route like ``_observe_request`` does
+
+    :param app: ASGI application.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            # Set by the router once matched, so the ids are not labels
+            route = scope.get("route")
+            rule = getattr(route, "path", "<unmatched>")
+            REQUEST_DURATION.labels(scope["method"], rule, status).observe(
+                time.perf_counter() - start
+            )
@@ -0,0 +1,248 @@
+import cProfile
+import hmac
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+import tracemalloc
+
+from flask import current_app, g, request
+from marshmallow import Schema
+
+from dhondt.db.controller import QueryTimer, current_query_timer
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DOWNLOAD = "download"
+
+
+def _function_key(func):
+    """Key of a function in the stats of ``cProfile.Profile``"""
+    code = func.__code__
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def cumulative_time(stats, *functions):
+    """Seconds spent in the functions, including their callees
+
+    :param stats: ``stats`` of a ``cProfile.Profile`` after ``create_stats``.
+    """
+    keys = {_function_key(x) for x in functions}
+    return sum(stat[3] for key, stat in stats.items() if key in keys)
+
+
+class RequestProfiler:
+    """Profiling of single requests under cProfile
+
+    A request is profiled when its ``header`` value is the ``token`` or
+    it is sampled. Its profile is saved in ``directory`` with a JSON
+    report of the wall, DB (``current_query_timer``) and serialization
+    (schema dump and JSON encoding) times and the tracemalloc peak, which
+    are returned in the ``Server-Timing`` and ``X-Profile-*`` headers.
+    With the header value ``<token> download`` the profile is returned
+    instead of the response. Only the newest ``max_profiles`` profiles are
+    kept in ``directory``.
+
+    Only one request is profiled at a time, tracemalloc traces every
+    thread.
+
+    :param header: name of the header requesting the profiling.
+    :param token: secret value of the header, empty disables the header.
+    :param sample_rate: N of the 1-in-N sampled profiling, 0 disables it.
+    :param directory: folder of the profiles saved.
+    :param max_profiles: profiles kept in ``directory``, 0 keeps all.
+    """
+
+    def __init__(
+        self,
+        header="X-Profile",
+        token="",
+        sample_rate=0,
+        directory="",
+        max_profiles=100,
+    ):
+        if sample_rate < 0:
+            raise ValueError(f"Invalid profiling {sample_rate=}")
+        if max_profiles < 0:
+            raise ValueError(f"Invalid profiling {max_profiles=}")
+        self.header = header
+        self.token = token
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._requests = itertools.count()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Creates the profiler of the ``PROFILING*`` config keys"""
+        return cls(
+            header=config.get("PROFILING_HEADER", "X-Profile"),
+            token=config.get("PROFILING_TOKEN", ""),
+            sample_rate=int(config.get("PROFILING_SAMPLE_RATE", 0)),
+            directory=config.get("PROFILING_DIR", ""),
+            max_profiles=int(config.get("PROFILING_MAX_PROFILES", 100)),
+        )
+
+    def _header_request(self):
+        """Parses the profiling header of the current request
+
+        @return: whether the header has the token and whether the profile
+            is downloaded.
+        """
+        value = request.headers.get(self.header)
+        if not self.token or value is None:
+            return False, False
+        token, _, option = value.strip().partition(" ")
+        if not hmac.compare_digest(token.encode(), self.token.encode()):
+            return False, False
+        return True, option.strip().lower() == PROFILE_DOWNLOAD
+
+    def requested(self):
+        """Tells whether the current request must be profiled"""
+        if self._header_request()[0]:
+            return True
+        return bool(self.sample_rate) and next(self._requests) % self.sample_rate == 0
+
+    def start(self):
+        if not self._lock.acquire(blocking=False):
+            logger.info("%s not profiled, another request is", request.path)
+            return
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Another profiler is active
+            logger.warning("%s not profiled: %s", request.path, e)
+            if not tracing:
+                tracemalloc.stop()
+            self._lock.release()
+            return
+        timer = QueryTimer()
+        g.request_profile = {
+            "profile": profile,
+            "tracing": tracing,
+            "timer": timer,
+            "token": current_query_timer.set(timer),
+            "start": time.perf_counter(),
+        }
+
+    def _stop(self, state):
+        state["profile"].disable()
+        wall = time.perf_counter() - state["start"]
+        _, peak = tracemalloc.get_traced_memory()
+        if not state["tracing"]:
+            tracemalloc.stop()
+        current_query_timer.reset(state["token"])
+        self._lock.release()
+        return wall, peak
+
+    def finish(self, response):
+        """Saves the profile of the request and reports it in the response"""
+        state = g.pop("request_profile", None)
+        if state is None:
+            return response
+        wall, peak = self._stop(state)
+        profile = state["profile"]
+        profile.create_stats()
+        report = {
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "status": response.status_code,
+            "wall": wall,
+            "db": state["timer"].duration,
+            "queries": state["timer"].count,
+            "serialization": cumulative_time(
+                profile.stats, Schema.dump, type(current_app.json).response
+            ),
+            "memoryPeak": peak,
+        }
+        name = self.save(profile, report)
+
+        headers = {
+            "Server-Timing": ", ".join(
+                f"{key};dur={report[key] * 1000:.3f}"
+                for key in ("wall", "db", "serialization")
+            ),
+            "X-Profile-Id": name,
+            "X-Profile-Queries": str(report["queries"]),
+            "X-Profile-Memory-Peak": str(peak),
+        }
+        if self._header_request()[1]:
+            with open(os.path.join(self.directory, f"{name}.prof"), "rb") as f:
+                response = current_app.response_class(
+                    f.read(), mimetype="application/octet-stream"
+                )
+            headers["Content-Disposition"] = f'attachment; filename="{name}.prof"'
+            headers["X-Profile-Status"] = str(report["status"])
+        response.headers.update(headers)
+        return response
+
+    def abort(self, exc=None):
+        """Stops the profiling of a request that did not finish"""
+        state = g.pop("request_profile", None)
+        if state is not None:
+            self._stop(state)
+
+    def save(self, profile, report):
+        """Saves the profile, ``<name>.prof``, and its report,
+        ``<name>.json``
+
+        @return: name of the files.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = re.sub(r"[^A-Za-z0-9]+", "_", request.path).strip("_")[:80]
+        name = f"{time.time_ns()}-{request.method}-{path}"
+        profile.dump_stats(os.path.join(self.directory, f"{name}.prof"))
+        with open(os.path.join(self.directory, f"{name}.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info("Request profile %s saved in %s", name, self.directory)
+        self._prune()
+        return name
+
+    def _prune(self):
+        """Removes the oldest profiles over ``max_profiles``"""
+        if not self.max_profiles:
+            return
+        # The names start with the nanoseconds of the request
+        names = sorted(
+            x[: -len(".prof")]
+            for x in os.listdir(self.directory)
+            if x.endswith(".prof")
+        )
+        for name in names[: -self.max_profiles]:
+            for extension in (".prof", ".json"):
+                try:
+                    os.remove(os.path.join(self.directory, name + extension))
+                except FileNotFoundError:
+                    pass
+
+
+def _start_profile():
+    profiler = current_app.extensions["request_profiler"]
+    if profiler.requested():
+        profiler.start()
+
+
+def _finish_profile(response):
+    return current_app.extensions["request_profiler"].finish(response)
+
+
+def _abort_profile(exc=None):
+    current_app.extensions["request_profiler"].abort(exc)
+
+
+def init_app(app):
+    """Profiles the requests of the application selected by the
+    ``PROFILING_HEADER`` and ``PROFILING_SAMPLE_RATE`` config"""
+    app.extensions["request_profiler"] = RequestProfiler.from_config(app.config)
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_abort_profile)
@@ -0,0 +1,74 @@
+import logging
+from itertools import count
+
+from dhondt.web.app import create_app
+
+from bench_repository import data
+from harness import benchmark
+
+logger = logging.getLogger(__name__)
+
+API = "/dhondt/v1"
+
+
+def setup():
+    ctx = data()
+    district = f"{API}/districts/{ctx['districtId']}"
+    return {
+        "client": create_app().test_client(),
+        "district": district,
+        "pplist": f"{district}/political-party-lists/{ctx['pplistIds'][0]}",
+        "scrutiny": f"{district}/scrutinies/{ctx['scrutinyId']}",
+        # Never repeated, a repeated vote set is answered by the result cache
+        "votes": count(1000),
+    }
+
+
+def _check(response, status_code=200):
+    assert response.status_code == status_code, response.get_data(as_text=True)
+
+
+@benchmark("api.get_districts", setup)
+def get_districts(ctx):
+    _check(ctx["client"].get(f"{API}/districts"))
+
+
+@benchmark("api.get_political_party_lists", setup)
+def get_political_party_lists(ctx):
+    _check(ctx["client"].get(f"{ctx['district']}/political-party-lists"))
+
+
+@benchmark("api.get_scrutinies", setup)
+def get_scrutinies(ctx):
+    _check(ctx["client"].get(f"{ctx['district']}/scrutinies"))
+
+
+@benchmark("api.put_vote", setup)
+def put_vote(ctx):
+    _check(
+        ctx["client"].put(f"{ctx['pplist']}/vote", json={"votes": next(ctx["votes"])})
+    )
+
+
+@benchmark("api.post_vote_delta", setup)
+def post_vote_delta(ctx):
+    _check(ctx["client"].post(f"{ctx['pplist']}/vote/delta", json={"delta": 1}))
+
+
+@benchmark("api.post_seats_status", setup)
+def post_seats_status(ctx):
+    # The votes change every call, so the seats are always calculated
+    put_vote(ctx)
+    _check(ctx["client"].post(f"{ctx['scrutiny']}/seats-status"))
+
+
+@benchmark("api.get_seats_status.page", setup)
+def get_seats_status(ctx):
+    _check(
+        ctx["client"].get(f"{ctx['scrutiny']}/seats-status", query_string={"limit": 20})
+    )
+
+
+@benchmark("api.get_seats_status.latest", setup)
+def get_latest_seats_status(ctx):
+    _check(ctx["client"].get(f"{ctx['scrutiny']}/seats-status/latest"))
@@ -0,0 +1,40 @@
+import logging
+from itertools import product
+
+from dhondt.dhondt_service.dhondt_service import (
+    ALLOCATION_ENGINES,
+    ENGINE_LOOP,
+    auto_dhondt_calculation,
+    dhondt_calculation,
+)
+
+from dataset import pplist_votes
+from harness import benchmark
+
+logger = logging.getLogger(__name__)
+
+PARTIES = [5, 20, 100, 500]
+SEATS = [10, 100, 1000, 10000]
+# The reference engine is O(seats x ppls), larger sizes take seconds
+LOOP_MAX_SIZE = 100_000
+
+
+def political_parties(parties):
+    return [
+        {"id": i + 1, "name": f"list {i}", "votes": pplist_votes(i)}
+        for i in range(parties)
+    ]
+
+
+def _register(engine, parties, seats):
+    setup = lambda: political_parties(parties)  # noqa: E731
+    name = f"engine.{engine}.parties_{parties}.seats_{seats}"
+    if engine == "auto":
+        benchmark(name, setup)(lambda ppls: auto_dhondt_calculation(ppls, seats))
+    else:
+        benchmark(name, setup)(lambda ppls: dhondt_calculation(ppls, seats, engine))
+
+
+for _engine, _parties, _seats in product([*ALLOCATION_ENGINES, "auto"], PARTIES, SEATS):
+    if _engine != ENGINE_LOOP or _parties * _seats <= LOOP_MAX_SIZE:
+        _register(_engine, _parties, _seats)
@@ -0,0 +1,122 @@
+import logging
+from itertools import cycle
+
+from dhondt.db.controller import DB, get_db_session
+from dhondt.db.dhondt_repository import DhondtRepository
+from dhondt.db.entity_cache import EntityCache, MemoryCacheBackend
+from dhondt.dhondt_service.dhondt_service import auto_dhondt_calculation
+
+from dataset import SCRUTINY_DATE, SEATS, populate
+from harness import benchmark
+
+logger = logging.getLogger(__name__)
+
+_data = None
+
+
+def data():
+    """Benchmark data set, populated once for every group"""
+    global _data
+    if _data is None:
+        with get_db_session() as session:
+            _data = populate(session)
+    return _data
+
+
+def setup():
+    """Repositories without and with the entity cache, the reads of the
+    former always reach the database"""
+    session = DB.get_session()
+    return {
+        "repo": DhondtRepository(
+            session, cache=EntityCache(MemoryCacheBackend(), enabled=False)
+        ),
+        "cached": DhondtRepository(
+            session, cache=EntityCache(MemoryCacheBackend(), enabled=True)
+        ),
+        "votes": cycle(range(1000, 2000)),
+        **data(),
+    }
+
+
+@benchmark("repository.get_districts", setup)
+def get_districts(ctx):
+    ctx["repo"].get_districts(None, None)
+
+
+@benchmark("repository.get_districts.scrutiny_date", setup)
+def get_districts_by_date(ctx):
+    ctx["repo"].get_districts(SCRUTINY_DATE, None)
+
+
+@benchmark("repository.get_political_party_lists", setup)
+def get_political_party_lists(ctx):
+    ctx["repo"].get_political_party_lists(ctx["districtId"])
+
+
+@benchmark("repository.get_scrutinies.cached", setup)
+def get_scrutinies_cached(ctx):
+    ctx["cached"].get_scrutinies(ctx["districtId"])
+
+
+@benchmark("repository.get_scrutinies", setup)
+def get_scrutinies(ctx):
+    ctx["repo"].get_scrutinies(ctx["districtId"])
+
+
+@benchmark("repository.update_votes", setup)
+def update_votes(ctx):
+    votes = next(ctx["votes"])
+    ctx["repo"].update_votes(
+        [
+            {"districtId": ctx["districtId"], "pplistId": pplist_id, "votes": votes}
+            for pplist_id in ctx["pplistIds"][:5]
+        ]
+    )
+
+
+@benchmark("repository.increment_votes", setup)
+def increment_votes(ctx):
+    ctx["repo"].increment_votes(ctx["districtId"], ctx["pplistIds"][0], 1)
+
+
+@benchmark("repository.get_calculation_input", setup)
+def get_calculation_input(ctx):
+    ctx["repo"].get_calculation_input(ctx["districtId"], ctx["scrutinyId"])
+
+
+@benchmark("repository.create_dhondt_result", setup)
+def create_dhondt_result(ctx):
+    calculation = ctx["repo"].get_calculation_input(
+        ctx["districtId"], ctx["scrutinyId"]
+    )
+    ctx["repo"].create_dhondt_result(
+        ctx["scrutinyId"],
+        auto_dhondt_calculation(calculation["politicalPartyLists"], SEATS),
+    )
+
+
+@benchmark("repository.create_calculated_result", setup)
+def create_calculated_result(ctx):
+    calculation = ctx["repo"].get_calculation_input(
+        ctx["districtId"], ctx["scrutinyId"]
+    )
+    ctx["repo"].create_calculated_result(
+        calculation["scrutiny"],
+        auto_dhondt_calculation(calculation["politicalPartyLists"], SEATS),
+    )
+
+
+@benchmark("repository.get_seats_results.page", setup)
+def get_seats_results(ctx):
+    ctx["repo"].get_seats_results(ctx["districtId"], ctx["scrutinyId"], limit=20)
+
+
+@benchmark("repository.get_latest_seats_result", setup)
+def get_latest_seats_result(ctx):
+    ctx["repo"].get_latest_seats_result(ctx["districtId"], ctx["scrutinyId"])
+
+
+@benchmark("repository.get_scrutiny_version", setup)
+def get_scrutiny_version(ctx):
+    ctx["repo"].get_scrutiny_version(ctx["districtId"], ctx["scrutinyId"])
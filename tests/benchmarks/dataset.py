@@ -0,0 +1,90 @@
+import logging
+from datetime import datetime
+
+from dhondt.db.dhondt_repository import DhondtRepository
+from dhondt.db.entity_cache import EntityCache, MemoryCacheBackend
+from dhondt.db.tabledefs import (
+    DistrictTable,
+    PoliticalPartyListTable,
+    ScrutinyTable,
+)
+from dhondt.dhondt_service.dhondt_service import auto_dhondt_calculation
+
+logger = logging.getLogger(__name__)
+
+# Realistic sizes, e.g. a general election of 52 constituencies
+DISTRICTS = 52
+PPLISTS = 20
+SCRUTINIES = 3
+SEATS = 350
+RESULTS = 100
+
+VOTING_DATE = datetime(2024, 12, 1)
+SCRUTINY_DATE = datetime(2024, 12, 2)
+
+
+def pplist_votes(index):
+    """Decreasing votes, like the usual long tail of small ppls"""
+    return 1_000_000 // (index + 1) + 7 * index
+
+
+def populate(session, prefix="benchmark"):
+    """Fills the database with the benchmark data set
+
+    The political party lists and scrutinies of every district are
+    inserted with the ORM, the results of the first scrutiny with the
+    repository so the latest result is written too.
+
+    :param prefix: prefix of the names, unique by data set.
+    @return: dictionary with the ``districtId``, ``scrutinyId`` and
+      ``pplistIds`` of the first district, the one benchmarked, and the
+      same of every district in ``districts``.
+    """
+    districts = []
+    for i in range(DISTRICTS):
+        district = DistrictTable(name=f"{prefix} district {i}")
+        district.politicalpartylist = [
+            PoliticalPartyListTable(
+                name=f"{prefix} district {i} list {j}",
+                votes=pplist_votes(j),
+                electors=SEATS,
+            )
+            for j in range(PPLISTS)
+        ]
+        district.scrutiny = [
+            ScrutinyTable(
+                name=f"{prefix} district {i} scrutiny {j}",
+                voting_date=VOTING_DATE,
+                scrutiny_date=SCRUTINY_DATE,
+                seats=SEATS,
+            )
+            for j in range(SCRUTINIES)
+        ]
+        districts.append(district)
+    session.add_all(districts)
+    session.commit()
+
+    district = districts[0]
+    scrutiny = district.scrutiny[0]
+    repo = DhondtRepository(session, cache=EntityCache(MemoryCacheBackend(), False))
+    seats_result = auto_dhondt_calculation(
+        [x.dict() for x in district.politicalpartylist], SEATS
+    )
+    for _ in range(RESULTS):
+        repo.create_dhondt_result(scrutiny.id, seats_result)
+    logger.info(
+        "Benchmark data set: %d districts, %d ppls, %d scrutinies, %d results",
+        DISTRICTS,
+        DISTRICTS * PPLISTS,
+        DISTRICTS * SCRUTINIES,
+        RESULTS,
+    )
+    ids = [
+        {
+            "districtId": x.id,
+            "scrutinyId": x.scrutiny[0].id,
+            "pplistIds": [y.id for y in x.politicalpartylist],
+        }
+        for x in districts
+    ]
+    return dict(ids[0], districts=ids)
@@ -0,0 +1,135 @@
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+BENCHMARKS = {}
+
+
+def benchmark(name, setup=None):
+    """Registers a benchmark
+
+    :param name: unique name, groups are separated by dots.
+    :param setup: function called once before timing, its result is passed
+      to the benchmark.
+    """
+
+    def register(func):
+        if name in BENCHMARKS:
+            raise ValueError(f"Duplicated benchmark {name=}")
+        BENCHMARKS[name] = (func, setup)
+        return func
+
+    return register
+
+
+def _time(func, arg, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        func(arg)
+    return time.perf_counter() - start
+
+
+def measure(func, arg=None, rounds=5, min_time=0.1):
+    """Times a function, calling it as many times as needed for each round
+    to last at least ``min_time`` seconds
+
+    @return: dictionary with the ``median``, ``min`` and ``max`` seconds by
+      call, and the ``rounds`` and ``number`` of calls by round.
+    """
+    number = 1
+    while True:
+        elapsed = _time(func, arg, number)
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        # Aims a bit over min_time, at least doubling the calls
+        number = min(
+            max(number * 2, int(number * 1.2 * min_time / max(elapsed, 1e-9))),
+            1 << 20,
+        )
+    times = [elapsed / number] + [
+        _time(func, arg, number) / number for _ in range(rounds - 1)
+    ]
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+        "rounds": rounds,
+        "number": number,
+    }
+
+
+def run(names, rounds=5, min_time=0.1):
+    """Runs the benchmarks given, in registration order
+
+    @return: dictionary of the results by benchmark name.
+    """
+    results = {}
+    setups = {}
+    for name in names:
+        func, setup = BENCHMARKS[name]
+        if setup is not None and setup not in setups:
+            setups[setup] = setup()
+        results[name] = measure(func, setups.get(setup), rounds, min_time)
+        logger.info("%-60s %12.3f us", name, results[name]["median"] * 1e6)
+    return results
+
+
+def _commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(path, results):
+    """Saves the results as a JSON baseline"""
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "meta": {
+                    "date": datetime.now(timezone.utc).isoformat(),
+                    "commit": _commit(),
+                    "python": platform.python_version(),
+                    "machine": platform.platform(),
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+            sort_keys=True,
+        )
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare(baseline, results, threshold=0.2):
+    """Compares the medians of the results with the baseline ones
+
+    :param threshold: relative slowdown flagged as regression, e.g. 0.2 is
+      20 % slower.
+    @return: list of ``(name, baseline, current, change, regression)``,
+      benchmarks missing in the baseline are not compared.
+    """
+    rows = []
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]["median"]
+        change = current["median"] / base - 1 if base else 0.0
+        rows.append((name, base, current["median"], change, change > threshold))
+    return rows
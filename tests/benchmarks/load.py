@@ -0,0 +1,240 @@
+"""Load test of the API with the traffic of a scenario
+
+Boots the application on the memory database (default) or the PostgreSQL
+of the ``DB_*`` environment, fills it with the benchmark data set and
+drives it with concurrent clients, e.g.::
+
+    python tests/benchmarks/load.py --scenario election-night -c 16 -d 60
+    python tests/benchmarks/load.py --db postgres --json report.json
+
+Reports the throughput and the p50/p95/p99 latency of each route. The
+memory database is only seen by the thread that created it, so on it the
+requests are served one by one.
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+from scenarios import SCENARIOS, OPERATIONS
+
+logger = logging.getLogger(__name__)
+
+DB_MEMORY = "memory"
+DB_POSTGRES = "postgres"
+
+
+def percentile(values, q):
+    """Nearest-rank percentile ``q`` (0 to 100) of sorted values"""
+    if not values:
+        return None
+    return values[max(0, min(len(values) - 1, round(q / 100 * len(values)) - 1))]
+
+
+class Worker(threading.Thread):
+    """Client sending the requests of the scenario until the deadline
+
+    Latencies are recorded by operation, a request fails when it raises
+    or is answered with a status over 399.
+    """
+
+    def __init__(self, host, port, scenario, targets, start, duration, seed):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.scenario = scenario
+        self.targets = targets
+        self.start_time = start
+        self.duration = duration
+        self.rng = random.Random(seed)
+        self.latencies = {}
+        self.errors = {}
+
+    def request(self, method, path, body):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            headers = {"Content-Type": "application/json"} if body else {}
+            connection.request(
+                method, path, json.dumps(body) if body else None, headers
+            )
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    def run(self):
+        while True:
+            progress = (time.perf_counter() - self.start_time) / self.duration
+            if progress >= 1:
+                return
+            name = self.scenario.choose(progress, self.rng)
+            method, path, body = OPERATIONS[name](
+                self.rng.choice(self.targets), self.rng
+            )
+            start = time.perf_counter()
+            try:
+                status = self.request(method, path, body)
+            except OSError as e:
+                logger.debug("%s %s failed: %s", method, path, e)
+                status = None
+            self.latencies.setdefault(name, []).append(time.perf_counter() - start)
+            if status is None or status >= 400:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def report(workers, elapsed):
+    """Throughput and latency percentiles (ms) by operation and in total"""
+    latencies = {}
+    errors = {}
+    for worker in workers:
+        for name, values in worker.latencies.items():
+            latencies.setdefault(name, []).extend(values)
+        for name, count in worker.errors.items():
+            errors[name] = errors.get(name, 0) + count
+    latencies["total"] = [x for values in latencies.values() for x in values]
+    errors["total"] = sum(errors.values())
+
+    results = {}
+    for name, values in latencies.items():
+        values.sort()
+        results[name] = {
+            "requests": len(values),
+            "errors": errors.get(name, 0),
+            "rps": len(values) / elapsed,
+            **{f"p{q}": (percentile(values, q) or 0) * 1000 for q in (50, 95, 99)},
+        }
+    return results
+
+
+def setup_app(db):
+    """Creates the application and the data set of the load test
+
+    The first scrutiny of every district is calculated, so its results
+    are found from the start.
+
+    @return: the application and the targets, see ``dataset.populate``.
+    """
+    if db == DB_MEMORY:
+        os.environ["__USE_MEMORY_DB"] = "1"
+    from dhondt.db.controller import get_db_session
+    from dhondt.db.dhondt_repository import DhondtRepository
+    from dhondt.dhondt_service.dhondt_service import DhondtService
+    from dhondt.web.app import create_app
+
+    from dataset import populate
+
+    with get_db_session() as session:
+        data = populate(session, prefix=f"load {time.time_ns()}")
+        service = DhondtService(DhondtRepository(session))
+        for target in data["districts"]:
+            service.calculate_seats(target["districtId"], target["scrutinyId"])
+    return create_app(), data["districts"]
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "-s", "--scenario", choices=SCENARIOS, default="steady", help="traffic shape"
+    )
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=8, help="concurrent clients"
+    )
+    parser.add_argument(
+        "-d", "--duration", type=float, default=30, help="seconds of the test"
+    )
+    parser.add_argument(
+        "--db", choices=[DB_MEMORY, DB_POSTGRES], default=DB_MEMORY, help="database"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed of the traffic")
+    parser.add_argument("--json", metavar="PATH", help="save the report as JSON")
+    parser.add_argument("--list", action="store_true", help="list the scenarios")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    if args.list:
+        for scenario in SCENARIOS.values():
+            print(f"{scenario.name:20} {scenario.description}")
+        return 0
+
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    app, targets = setup_app(args.db)
+    # The memory database is served in this thread, the one that created it
+    server = make_server(
+        "127.0.0.1",
+        0,
+        app,
+        threaded=args.db != DB_MEMORY,
+        request_handler=QuietRequestHandler,
+    )
+    host, port = server.server_address[:2]
+    scenario = SCENARIOS[args.scenario]
+    logger.info(
+        "Scenario %s with %d clients for %ss on %s:%s",
+        scenario.name,
+        args.concurrency,
+        args.duration,
+        host,
+        port,
+    )
+
+    start = time.perf_counter()
+    workers = [
+        Worker(host, port, scenario, targets, start, args.duration, args.seed + i)
+        for i in range(args.concurrency)
+    ]
+    for worker in workers:
+        worker.start()
+
+    def stop():
+        for worker in workers:
+            worker.join()
+        server.shutdown()
+
+    threading.Thread(target=stop, daemon=True).start()
+    server.serve_forever()
+    elapsed = time.perf_counter() - start
+
+    results = report(workers, elapsed)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "scenario": scenario.name,
+                    "concurrency": args.concurrency,
+                    "duration": elapsed,
+                    "db": args.db,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+    print(
+        f"{'route':28} {'requests':>9} {'errors':>7} {'req/s':>9} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    )
+    for name, result in sorted(results.items(), key=lambda x: x[0] == "total"):
+        print(
+            f"{name:28} {result['requests']:9d} {result['errors']:7d} "
+            f"{result['rps']:9.1f} {result['p50']:9.2f} {result['p95']:9.2f} "
+            f"{result['p99']:9.2f}"
+        )
+    return 1 if results["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
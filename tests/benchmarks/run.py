@@ -0,0 +1,80 @@
+"""Benchmarks of the allocation engine, the repository and the API
+
+Runs on the memory database, e.g.::
+
+    python tests/benchmarks/run.py --save baseline.json
+    python tests/benchmarks/run.py --compare baseline.json --threshold 0.2
+
+With ``--compare`` the exit status is 1 when any benchmark is slower than
+the baseline by more than the threshold.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+os.environ["__USE_MEMORY_DB"] = "1"
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+import bench_engine  # noqa: E402,F401
+import bench_repository  # noqa: E402,F401
+import bench_api  # noqa: E402,F401
+import harness  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "-k",
+        "--filter",
+        default="",
+        help="only the benchmarks whose name contains this text",
+    )
+    parser.add_argument("--list", action="store_true", help="list the benchmarks")
+    parser.add_argument("--rounds", type=int, default=5, help="rounds by benchmark")
+    parser.add_argument(
+        "--min-time", type=float, default=0.1, help="minimum seconds by round"
+    )
+    parser.add_argument("--save", metavar="PATH", help="save the results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON to compare")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="relative slowdown flagged as regression (default 0.2)",
+    )
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    names = [x for x in harness.BENCHMARKS if args.filter in x]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    logger.info("Running %d benchmarks", len(names))
+    results = harness.run(names, args.rounds, args.min_time)
+    if args.save:
+        harness.save(args.save, results)
+    if not args.compare:
+        for name, result in results.items():
+            print(f"{name:60} {result['median'] * 1e6:12.3f} us")
+        return 0
+
+    rows = harness.compare(harness.load(args.compare), results, args.threshold)
+    for name, base, current, change, regression in rows:
+        print(
+            f"{name:60} {base * 1e6:12.3f} us {current * 1e6:12.3f} us "
+            f"{change:+8.1%}{'  REGRESSION' if regression else ''}"
+        )
+    regressions = sum(x[-1] for x in rows)
+    print(f"{len(rows)} compared, {regressions} regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+API = "/dhondt/v1"
+
+
+def _district(target):
+    return f"{API}/districts/{target['districtId']}"
+
+
+def _pplist(target, rng):
+    return (
+        f"{_district(target)}/political-party-lists/{rng.choice(target['pplistIds'])}"
+    )
+
+
+def _scrutiny(target):
+    return f"{_district(target)}/scrutinies/{target['scrutinyId']}"
+
+
+# Requests of the traffic, ``(method, path, json body)`` of a district
+OPERATIONS = {
+    "GET districts": lambda target, rng: ("GET", f"{API}/districts", None),
+    "GET political-party-lists": lambda target, rng: (
+        "GET",
+        f"{_district(target)}/political-party-lists",
+        None,
+    ),
+    "GET scrutinies": lambda target, rng: (
+        "GET",
+        f"{_district(target)}/scrutinies",
+        None,
+    ),
+    "PUT vote": lambda target, rng: (
+        "PUT",
+        f"{_pplist(target, rng)}/vote",
+        {"votes": rng.randint(0, 1_000_000)},
+    ),
+    "POST vote/delta": lambda target, rng: (
+        "POST",
+        f"{_pplist(target, rng)}/vote/delta",
+        {"delta": rng.randint(1, 100)},
+    ),
+    "POST seats-status": lambda target, rng: (
+        "POST",
+        f"{_scrutiny(target)}/seats-status",
+        None,
+    ),
+    "GET seats-status": lambda target, rng: (
+        "GET",
+        f"{_scrutiny(target)}/seats-status?limit=20",
+        None,
+    ),
+    "GET seats-status/latest": lambda target, rng: (
+        "GET",
+        f"{_scrutiny(target)}/seats-status/latest",
+        None,
+    ),
+}
+
+
+class Scenario:
+    """Shape of the traffic during a load test
+
+    :param name: name of the scenario.
+    :param description: what the scenario replays.
+    :param phases: list of ``(fraction of the duration, {operation: weight})``,
+      the operations are ``OPERATIONS`` keys.
+    """
+
+    def __init__(self, name, description, phases):
+        for _, weights in phases:
+            unknown = set(weights) - set(OPERATIONS)
+            if unknown:
+                raise ValueError(f"Unknown operations {unknown} in {name=}")
+        self.name = name
+        self.description = description
+        self.phases = phases
+
+    def weights(self, progress):
+        """Weights of the phase running at ``progress`` (0 to 1) of the test"""
+        total = sum(x[0] for x in self.phases)
+        elapsed = 0
+        for fraction, weights in self.phases:
+            elapsed += fraction / total
+            if progress < elapsed:
+                return weights
+        return self.phases[-1][1]
+
+    def choose(self, progress, rng):
+        """Returns the name of the next operation"""
+        weights = self.weights(progress)
+        return rng.choices(list(weights), list(weights.values()))[0]
+
+
+SCENARIOS = {
+    x.name: x
+    for x in [
+        Scenario(
+            "steady",
+            "Mixed traffic of a day of scrutiny",
+            [
+                (
+                    1,
+                    {
+                        "GET districts": 5,
+                        "GET political-party-lists": 30,
+                        "GET scrutinies": 10,
+                        "PUT vote": 30,
+                        "POST seats-status": 10,
+                        "GET seats-status": 5,
+                        "GET seats-status/latest": 10,
+                    },
+                )
+            ],
+        ),
+        Scenario(
+            "election-night",
+            "Polls close with a burst of vote updates, then the counting "
+            "recalculates the seats and the audience polls the results",
+            [
+                (
+                    0.3,
+                    {
+                        "PUT vote": 60,
+                        "POST vote/delta": 20,
+                        "GET political-party-lists": 20,
+                    },
+                ),
+                (
+                    0.5,
+                    {
+                        "PUT vote": 30,
+                        "POST vote/delta": 10,
+                        "POST seats-status": 20,
+                        "GET seats-status/latest": 30,
+                        "GET political-party-lists": 10,
+                    },
+                ),
+                (
+                    0.2,
+                    {
+                        "GET districts": 10,
+                        "GET seats-status/latest": 60,
+                        "GET seats-status": 20,
+                        "POST seats-status": 10,
+                    },
+                ),
+            ],
+        ),
+        Scenario(
+            "read-heavy",
+            "Results published, almost only reads",
+            [
+                (
+                    1,
+                    {
+                        "GET districts": 10,
+                        "GET political-party-lists": 30,
+                        "GET scrutinies": 10,
+                        "GET seats-status": 10,
+                        "GET seats-status/latest": 40,
+                    },
+                )
+            ],
+        ),
+    ]
+}
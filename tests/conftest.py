@@ -1,10 +1,26 @@
 import os
+from itertools import count
+
 import pytest
+from sqlalchemy import event
 
 os.environ["__USE_MEMORY_DB"] = "1"
 
 from dhondt.web.app import create_app
-from dhondt.db.controller import get_db_session
+from dhondt.db.controller import DB, get_db_session
+from dhondt.db.entity_cache import entity_cache
+from dhondt.db.tabledefs import DistrictTable
+
+API = "/dhondt/v1"
+
+_district_count = count(1)
+
+
+@pytest.fixture(autouse=True)
+def clear_entity_cache():
+    """Districts are created in the database directly, out of the cache"""
+    entity_cache.clear()
+    yield
 
 
 @pytest.fixture
@@ -31,3 +47,43 @@ def client(app):
 @pytest.fixture
 def runner(app):
     return app.test_cli_runner()
+
+
+@pytest.fixture
+def district_factory(db_session, client):
+    """Creates a district with the political party lists of the given table
+
+    Returns the district id and the political party lists created.
+    """
+
+    def factory(pplists):
+        district = DistrictTable(name=f"test district {next(_district_count)}")
+        db_session.add(district)
+        db_session.commit()
+        created = []
+        for pplist in pplists:
+            response = client.post(
+                f"{API}/districts/{district.id}/political-party-lists",
+                json={
+                    "name": f"{district.name} {pplist['name']}",
+                    "electors": pplist["electors"],
+                },
+            )
+            assert response.status_code == 201
+            created.append(response.json)
+        return district.id, created
+
+    return factory
+
+
+@pytest.fixture
+def queries():
+    """Collects the SQL statements executed in the database"""
+    statements = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(DB.engine, "before_cursor_execute", collect)
+    yield statements
+    event.remove(DB.engine, "before_cursor_execute", collect)
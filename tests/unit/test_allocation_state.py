@@ -0,0 +1,137 @@
+import logging
+
+from hypothesis import strategies as st
+from hypothesis import given, settings
+
+from dhondt.dhondt_service.allocation_state import (
+    AllocationState,
+    AllocationStateRegistry,
+)
+from dhondt.dhondt_service.dhondt_service import (
+    allocation_max_moves,
+    auto_dhondt_calculation,
+    dhondt_calculation,
+)
+
+from test_dhondt_service import (
+    PPLIST_TABLE_2,
+    TABLE_2_RESULT_OK,
+    pplists_strategy,
+)
+
+logger = logging.getLogger(__name__)
+
+votes_strategy = st.sampled_from([0, 1, 2, 3, 6, 12, 1000, 340000, pow(2, 31)])
+
+
+class TestAllocationState:
+
+    def test_update_votes_moves(self):
+        state = AllocationState(1, PPLIST_TABLE_2, 21, TABLE_2_RESULT_OK)
+        # Same votes, nothing to do
+        assert state.update_votes(10, 73000) == {}
+        # Unknown pplist
+        assert state.update_votes(99, 73000) == {}
+        # partido B reaches one seat, taken from the lowest awarded quotient
+        assert state.update_votes(20, 80000) == {52: -1, 20: 1}
+        assert state.result() == dhondt_calculation(
+            [x if x["id"] != 20 else dict(x, votes=80000) for x in PPLIST_TABLE_2], 21
+        )
+
+    @settings(max_examples=100)
+    @given(
+        pplists=pplists_strategy,
+        seats=st.integers(min_value=0, max_value=300),
+        updates=st.lists(st.tuples(st.integers(0, 29), votes_strategy), max_size=20),
+    )
+    def test_update_votes_match_calculation(self, pplists, seats, updates):
+        state = AllocationState(1, pplists, seats, dhondt_calculation(pplists, seats))
+        for index, votes in updates:
+            pplist = pplists[index % len(pplists)]
+            pplist["votes"] = votes
+            state.update_votes(pplist["id"], votes)
+            assert state.result() == dhondt_calculation(pplists, seats)
+
+    def test_update_votes_recalculates(self):
+        calls = []
+
+        def calculate(political_parties, seats):
+            calls.append(seats)
+            return dhondt_calculation(political_parties, seats)
+
+        pplists = [dict(x) for x in PPLIST_TABLE_2]
+        state = AllocationState(
+            1, pplists, 21, TABLE_2_RESULT_OK, calculate, max_moves=2
+        )
+        # One move, done incrementally
+        assert state.update_votes(20, 80000) == {52: -1, 20: 1}
+        assert calls == []
+        # Every seat moves to partido A, over the moves limit
+        pplists[0]["votes"] = 10**9
+        changes = state.update_votes(10, 10**9)
+        assert calls == [21]
+        assert changes[10] == 21 - TABLE_2_RESULT_OK[0]["seats"]
+        assert sum(changes.values()) == 0
+        pplists[1]["votes"] = 80000
+        assert state.result() == dhondt_calculation(pplists, 21)
+
+    @settings(max_examples=50)
+    @given(
+        pplists=pplists_strategy,
+        seats=st.integers(min_value=0, max_value=3000),
+        updates=st.lists(st.tuples(st.integers(0, 29), votes_strategy), max_size=10),
+    )
+    def test_update_votes_bounded_match_calculation(self, pplists, seats, updates):
+        state = AllocationState(
+            1,
+            pplists,
+            seats,
+            auto_dhondt_calculation(pplists, seats),
+            auto_dhondt_calculation,
+            allocation_max_moves(seats, len(pplists)),
+        )
+        for index, votes in updates:
+            pplist = pplists[index % len(pplists)]
+            pplist["votes"] = votes
+            state.update_votes(pplist["id"], votes)
+            assert state.result() == dhondt_calculation(pplists, seats)
+
+    def test_registry_size(self):
+        registry = AllocationStateRegistry(size=2)
+        pplists = [dict(x) for x in PPLIST_TABLE_2]
+        for scrutiny_id in (1, 2):
+            registry.allocate(scrutiny_id, 1, pplists, 21, dhondt_calculation)
+        # 1 is the most recently used, 2 is dropped
+        registry.allocate(1, 1, pplists, 21, dhondt_calculation)
+        registry.allocate(3, 1, pplists, 21, dhondt_calculation)
+        pplists[1]["votes"] = 80000
+        assert set(registry.update_votes(1, 20, 80000)) == {1, 3}
+
+    def test_registry_allocate(self):
+        calls = []
+
+        def calculate(political_parties, seats):
+            calls.append(seats)
+            return dhondt_calculation(political_parties, seats)
+
+        registry = AllocationStateRegistry()
+        pplists = [dict(x) for x in PPLIST_TABLE_2]
+        assert registry.allocate(1, 1, pplists, 21, calculate) == TABLE_2_RESULT_OK
+        assert registry.allocate(1, 1, pplists, 21, calculate) == TABLE_2_RESULT_OK
+        assert calls == [21]
+
+        # Votes pushed to the state of the district
+        pplists[1]["votes"] = 80000
+        registry.update_votes(1, 20, 80000)
+        expected = dhondt_calculation(pplists, 21)
+        assert registry.allocate(1, 1, pplists, 21, calculate) == expected
+        # Votes changed elsewhere are synced from the given ppls
+        pplists[0]["votes"] = 0
+        expected = dhondt_calculation(pplists, 21)
+        assert registry.allocate(1, 1, pplists, 21, calculate) == expected
+        assert calls == [21]
+
+        # A new ppl rebuilds the state
+        pplists.append({"id": 60, "name": "partido H", "votes": 10})
+        registry.allocate(1, 1, pplists, 21, calculate)
+        assert calls == [21, 21]
@@ -0,0 +1,212 @@
+import json
+import logging
+
+import pytest
+from starlette.testclient import TestClient
+
+from dhondt.db.controller import get_async_db_session
+from dhondt.db.tabledefs import DistrictTable
+from dhondt.web.asgi import create_asgi_app
+
+from test_dhondt_service import PPLIST_TABLE_1, TABLE_1_RESULT_OK
+
+logger = logging.getLogger(__name__)
+
+API = "/dhondt/v1"
+
+
+class TestAsgiApi:
+
+    @pytest.fixture
+    def asgi_client(self):
+        with TestClient(create_asgi_app()) as client:
+            yield client
+
+    @pytest.fixture
+    def district(self, asgi_client):
+        async def create(name):
+            async with get_async_db_session() as session:
+                district = DistrictTable(name=name)
+                session.add(district)
+                await session.commit()
+                return district.id
+
+        district_id = asgi_client.portal.call(create, "asgi district")
+        pplists = []
+        for pplist in PPLIST_TABLE_1:
+            response = asgi_client.post(
+                f"{API}/districts/{district_id}/political-party-lists",
+                json={"name": f"asgi {pplist['name']}", "electors": 1000},
+            )
+            assert response.status_code == 201
+            pplists.append(response.json())
+        return district_id, pplists
+
+    def test_districts(self, asgi_client, district):
+        district_id, _ = district
+        response = asgi_client.get(f"{API}/districts")
+        assert response.json() == {
+            "districts": [{"id": district_id, "name": "asgi district"}],
+            "nextCursor": None,
+        }
+        response = asgi_client.get(f"{API}/districts/{district_id}")
+        assert response.json() == {"id": district_id, "name": "asgi district"}
+
+        response = asgi_client.get(f"{API}/districts/{district_id + 1}")
+        assert response.status_code == 404
+        assert response.json()["status"] == "Not Found"
+
+    def test_political_party_lists(self, asgi_client, district):
+        district_id, pplists = district
+        url = f"{API}/districts/{district_id}/political-party-lists"
+        response = asgi_client.get(url, params={"limit": 3})
+        assert response.json()["politicalPartyLists"] == pplists[:3]
+        assert response.json()["nextCursor"] == pplists[2]["id"]
+
+        response = asgi_client.put(
+            f"{url}/{pplists[0]['id']}", json={"name": "asgi renamed", "electors": 5}
+        )
+        assert response.status_code == 200
+        response = asgi_client.get(f"{url}/{pplists[0]['id']}")
+        assert response.json()["name"] == "asgi renamed"
+
+        # SQLite reports no SQLSTATE, so like the sync API it is not a 409
+        response = asgi_client.post(url, json={"name": "asgi renamed", "electors": 5})
+        assert response.status_code == 404
+        response = asgi_client.post(url, json={"electors": 5})
+        assert response.status_code == 422
+        assert response.json()["code"] == 422
+
+    def test_votes_and_seats(self, asgi_client, district):
+        district_id, pplists = district
+        for pplist, table in zip(pplists[:2], PPLIST_TABLE_1):
+            response = asgi_client.put(
+                f"{API}/districts/{district_id}/political-party-lists/"
+                f"{pplist['id']}/vote",
+                json={"votes": table["votes"]},
+            )
+            assert response.json()["votes"] == table["votes"]
+        response = asgi_client.post(
+            f"{API}/districts/{district_id}/political-party-lists/"
+            f"{pplists[0]['id']}/vote/delta",
+            json={"delta": 0},
+        )
+        assert response.json()["votes"] == PPLIST_TABLE_1[0]["votes"]
+        response = asgi_client.post(
+            f"{API}/districts/{district_id}/political-party-lists/"
+            f"{pplists[0]['id']}/vote/delta",
+            json={"delta": 2**31 - 1},
+        )
+        assert response.status_code == 422
+        response = asgi_client.put(
+            f"{API}/political-party-lists/votes",
+            json={
+                "politicalPartyListVotes": [
+                    {"districtId": district_id, "pplistId": x["id"], "votes": 1}
+                    for x in pplists[2:]
+                ]
+            },
+        )
+        assert response.status_code == 200
+        response = asgi_client.post(
+            f"{API}/political-party-lists/votes/import",
+            content="\n".join(
+                json.dumps(
+                    {
+                        "districtId": district_id,
+                        "pplistId": x["id"],
+                        "votes": y["votes"],
+                    }
+                )
+                for x, y in zip(pplists[2:], PPLIST_TABLE_1[2:])
+            ),
+            headers={"content-type": "application/x-ndjson"},
+        )
+        assert response.json() == {"rows": 3, "updated": 3}
+
+        response = asgi_client.post(
+            f"{API}/districts/{district_id}/scrutinies",
+            json={
+                "name": "asgi scrutiny",
+                "seats": 7,
+                "votingDate": "2024-12-01",
+                "scrutinyDate": "2024-12-02",
+            },
+        )
+        assert response.status_code == 201
+        url = f"{API}/districts/{district_id}/scrutinies/{response.json()['id']}"
+        assert asgi_client.get(url).json()["name"] == "asgi scrutiny"
+
+        response = asgi_client.post(f"{url}/seats-status")
+        assert response.status_code == 200
+        assert [x["seats"] for x in response.json()["seatsResults"]] == [
+            x["seats"] for x in TABLE_1_RESULT_OK
+        ]
+        result_id = response.json()["resultId"]
+        response = asgi_client.get(f"{url}/seats-status")
+        assert [x["resultId"] for x in response.json()["scrutinyResults"]] == [
+            result_id
+        ]
+        response = asgi_client.get(f"{url}/seats-status/latest")
+        assert response.json()["resultId"] == result_id
+        # TestClient buffers the whole body, the endless stream is tested
+        # on the WSGI application
+        response = asgi_client.get(
+            f"{API}/districts/{district_id + 1}/scrutinies/1/seats-status/stream"
+        )
+        assert response.status_code == 404
+
+    def test_import_votes_unsupported(self, asgi_client):
+        response = asgi_client.post(
+            f"{API}/political-party-lists/votes/import",
+            content="districtId,pplistId,votes\n",
+            headers={"content-type": "text/plain"},
+        )
+        assert response.status_code == 415
+
+    def test_etag(self, asgi_client, district):
+        district_id, pplists = district
+        url = f"{API}/districts/{district_id}/political-party-lists"
+        response = asgi_client.get(url)
+        etag = response.headers["ETag"]
+        assert "Last-Modified" in response.headers
+        response = asgi_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        # Other page, other ETag
+        response = asgi_client.get(
+            url, params={"limit": 1}, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+
+        response = asgi_client.put(f"{url}/{pplists[0]['id']}/vote", json={"votes": 10})
+        response = asgi_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+        response = asgi_client.post(
+            f"{API}/districts/{district_id}/scrutinies",
+            json={
+                "name": "asgi etag scrutiny",
+                "seats": 3,
+                "votingDate": "2024-12-01",
+                "scrutinyDate": "2024-12-02",
+            },
+        )
+        url = f"{API}/districts/{district_id}/scrutinies/{response.json()['id']}"
+        result_id = asgi_client.post(f"{url}/seats-status").json()["resultId"]
+        # Cached, the latest result
+        response = asgi_client.post(f"{url}/seats-status")
+        assert response.json()["resultId"] == result_id
+        for path in ("seats-status", "seats-status/latest"):
+            etag = asgi_client.get(f"{url}/{path}").headers["ETag"]
+            response = asgi_client.get(f"{url}/{path}", headers={"If-None-Match": etag})
+            assert response.status_code == 304
+
+    def test_metrics(self, asgi_client):
+        asgi_client.get(f"{API}/districts")
+        response = asgi_client.get("/metrics")
+        assert response.status_code == 200
+        # Labelled by the route template
+        assert 'method="GET",route="/dhondt/v1/districts"' in response.text
+        assert "dhondt_db_pool_checkouts" in response.text
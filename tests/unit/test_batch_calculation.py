@@ -0,0 +1,92 @@
+import logging
+
+import numpy as np
+import pytest
+from hypothesis import strategies as st
+from hypothesis import given, settings
+
+from dhondt.dhondt_service.batch_calculation import (
+    PADDING_ID,
+    dhondt_batch_calculation,
+)
+from dhondt.dhondt_service.dhondt_service import dhondt_calculation
+
+from test_dhondt_service import (
+    PPLIST_TABLE_1,
+    PPLIST_TABLE_2,
+    TABLE_1_RESULT_OK,
+    TABLE_2_RESULT_OK,
+)
+
+logger = logging.getLogger(__name__)
+
+
+batch_strategy = st.integers(min_value=1, max_value=12).flatmap(
+    lambda ppls: st.tuples(
+        st.lists(
+            st.lists(
+                st.sampled_from([0, 1, 2, 3, 6, 12, 1000, 340000, pow(2, 31)]),
+                min_size=ppls,
+                max_size=ppls,
+            ),
+            min_size=1,
+            max_size=20,
+        ),
+        st.lists(
+            st.integers(min_value=1, max_value=pow(2, 31)),
+            min_size=ppls,
+            max_size=ppls,
+            unique=True,
+        ),
+    )
+)
+
+
+def _pplists(votes, ids):
+    return [
+        {"id": ippl, "name": "partido", "votes": vote}
+        for ippl, vote in zip(ids, votes)
+        if ippl != PADDING_ID
+    ]
+
+
+class TestBatchCalculation:
+
+    def test_dhondt_batch_calculation_ok(self):
+        # Table 1 padded to the size of table 2
+        padding = len(PPLIST_TABLE_2) - len(PPLIST_TABLE_1)
+        votes = [
+            [x["votes"] for x in PPLIST_TABLE_1] + [0] * padding,
+            [x["votes"] for x in PPLIST_TABLE_2],
+        ]
+        ids = [
+            [x["id"] for x in PPLIST_TABLE_1] + [PADDING_ID] * padding,
+            [x["id"] for x in PPLIST_TABLE_2],
+        ]
+        result = dhondt_batch_calculation(votes=votes, seats=[7, 21], ids=ids)
+        assert result.tolist() == [
+            [x["seats"] for x in TABLE_1_RESULT_OK] + [0] * padding,
+            [x["seats"] for x in TABLE_2_RESULT_OK],
+        ]
+
+    def test_dhondt_batch_calculation_errors(self):
+        with pytest.raises(ValueError) as excinfo:
+            dhondt_batch_calculation(votes=[1, 2], seats=[1], ids=[1, 2])
+        assert "matrix" in str(excinfo.value)
+        with pytest.raises(ValueError) as excinfo:
+            dhondt_batch_calculation(votes=[[1, 2]], seats=[1, 2], ids=[1, 2])
+        assert "seats shape" in str(excinfo.value)
+
+    @settings(max_examples=100)
+    @given(
+        batch=batch_strategy,
+        seats=st.lists(st.integers(min_value=-1, max_value=300), min_size=20),
+    )
+    def test_dhondt_batch_calculation_match_single(self, batch, seats):
+        votes, ids = batch
+        seats = seats[: len(votes)]
+        result = dhondt_batch_calculation(votes=votes, seats=seats, ids=ids)
+        assert result.shape == np.shape(votes)
+        for row_votes, row_seats, row_result in zip(votes, seats, result):
+            single = dhondt_calculation(_pplists(row_votes, ids), row_seats)
+            assert [x["seats"] for x in single] == row_result.tolist()
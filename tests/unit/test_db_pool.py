@@ -0,0 +1,85 @@
+import logging
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from dhondt.db.controller import DB, TimedQueuePool, pool_telemetry
+
+logger = logging.getLogger(__name__)
+
+
+class TestDBPool:
+
+    @pytest.fixture
+    def engine(self):
+        saved = DB.engine
+        DB.engine = create_engine(
+            "sqlite://",
+            poolclass=TimedQueuePool,
+            pool_size=1,
+            max_overflow=1,
+            pool_timeout=0.05,
+        )
+        pool_telemetry.listen(DB.engine)
+        pool_telemetry.reset()
+        yield DB.engine
+        DB.engine.dispose()
+        DB.engine = saved
+        pool_telemetry.reset()
+
+    def test_pool_stats(self, engine):
+        first = engine.connect()
+        second = engine.connect()
+        first.execute(text("SELECT 1"))
+        stats = DB.pool_stats()
+        assert stats["size"] == 1
+        assert stats["checked_out"] == 2
+        assert stats["overflow"] == 1
+        assert stats["checkouts"] == 2
+        # connections opened without waiting
+        assert stats["wait_time"] == 0
+
+        # Pool exhausted, the checkout waits pool_timeout and fails
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        stats = DB.pool_stats()
+        assert stats["timeouts"] == 1
+        assert stats["max_wait_time"] >= 0.05
+        assert stats["wait_time"] >= stats["max_wait_time"]
+
+        first.close()
+        second.close()
+        stats = DB.pool_stats()
+        assert stats["checked_out"] == 0
+        assert stats["checked_in"] >= 1
+
+    def test_connect_args(self, monkeypatch):
+        monkeypatch.setattr("dhondt.db.controller.DB_STATEMENT_TIMEOUT", 0)
+        assert "options" not in DB.connect_args()
+        monkeypatch.setattr("dhondt.db.controller.DB_STATEMENT_TIMEOUT", 2000)
+        assert DB.connect_args()["options"] == "-c statement_timeout=2000"
+
+    def test_connect_is_not_wait(self):
+        def connect():
+            time.sleep(0.05)
+            return sqlite3.connect(":memory:")
+
+        engine = create_engine(
+            "sqlite://",
+            creator=connect,
+            poolclass=TimedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+        )
+        pool_telemetry.reset()
+        try:
+            with engine.connect():
+                assert engine.pool.exhausted()
+            assert not engine.pool.exhausted()
+            assert pool_telemetry.stats()["wait_time"] == 0
+        finally:
+            engine.dispose()
+            pool_telemetry.reset()
@@ -1,8 +1,17 @@
 import logging
 
 import pytest
-
-from dhondt.dhondt_service.dhondt_service import dhondt_calculation
+from hypothesis import strategies as st
+from hypothesis import given, settings
+
+from dhondt.dhondt_service.dhondt_service import (
+    ALLOCATION_ENGINES,
+    DEFAULT_ENGINE,
+    ENGINE_DIVISOR,
+    ENGINE_LOOP,
+    dhondt_calculation,
+    select_engine,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -95,30 +104,110 @@ doundt_calc_data_malformed = [
 ]
 
 
+pplists_strategy = st.lists(
+    st.fixed_dictionaries(
+        {
+            "id": st.integers(min_value=1, max_value=pow(2, 31)),
+            "name": st.just("partido"),
+            # few distinct values to force quotient ties
+            "votes": st.sampled_from([0, 1, 2, 3, 6, 12, 1000, 340000, pow(2, 31)]),
+        }
+    ),
+    min_size=1,
+    max_size=30,
+    unique_by=lambda x: x["id"],
+)
+
+
 class TestService:
 
+    @pytest.mark.parametrize("engine", ALLOCATION_ENGINES)
     @pytest.mark.parametrize("pplists, seats, result_ok", doundt_calc_data_ok)
-    def test_dhondt_calculation_ok(self, pplists, seats, result_ok):
-        result = dhondt_calculation(political_parties=pplists, seats=seats)
+    def test_dhondt_calculation_ok(self, pplists, seats, result_ok, engine):
+        result = dhondt_calculation(
+            political_parties=pplists, seats=seats, engine=engine
+        )
         assert result_ok == result
 
+    @pytest.mark.parametrize("engine", ALLOCATION_ENGINES)
     @pytest.mark.parametrize("pplists, seats, result_err", doundt_calc_data_err)
-    def test_dhondt_calculation_error(self, pplists, seats, result_err):
-        result = dhondt_calculation(political_parties=pplists, seats=seats)
+    def test_dhondt_calculation_error(self, pplists, seats, result_err, engine):
+        result = dhondt_calculation(
+            political_parties=pplists, seats=seats, engine=engine
+        )
         assert result_err == result
 
-    def test_dhondt_calculation_error_type(self):
+    @pytest.mark.parametrize("engine", ALLOCATION_ENGINES)
+    def test_dhondt_calculation_error_type(self, engine):
         with pytest.raises(TypeError) as excinfo:
-            dhondt_calculation(political_parties=TABLE_1_RESULT_MALFORMED_1, seats=10)
+            dhondt_calculation(
+                political_parties=TABLE_1_RESULT_MALFORMED_1, seats=10, engine=engine
+            )
         assert "unsupported operand" in str(excinfo.value) and "NoneType" in str(
             excinfo.value
         )
         with pytest.raises(TypeError) as excinfo:
-            dhondt_calculation(political_parties=PPLIST_TABLE_2, seats=1.5)
+            dhondt_calculation(
+                political_parties=PPLIST_TABLE_2, seats=1.5, engine=engine
+            )
         assert "float' object cannot be interpreted as an integer" in str(excinfo.value)
 
+    @pytest.mark.parametrize("engine", ALLOCATION_ENGINES)
     @pytest.mark.parametrize("pplists, key", doundt_calc_data_malformed)
-    def test_dhondt_calculation_malformed(self, pplists, key):
+    def test_dhondt_calculation_malformed(self, pplists, key, engine):
         with pytest.raises(KeyError) as excinfo:
-            dhondt_calculation(political_parties=pplists, seats=10)
+            dhondt_calculation(political_parties=pplists, seats=10, engine=engine)
         assert key in str(excinfo.value)
+
+    def test_dhondt_calculation_unknown_engine(self):
+        with pytest.raises(ValueError) as excinfo:
+            dhondt_calculation(political_parties=PPLIST_TABLE_1, seats=7, engine="x")
+        assert "engine='x'" in str(excinfo.value)
+
+    @settings(max_examples=200)
+    @given(pplists=pplists_strategy, seats=st.integers(min_value=0, max_value=300))
+    def test_dhondt_calculation_engines_match_reference(self, pplists, seats):
+        reference = dhondt_calculation(
+            political_parties=pplists, seats=seats, engine=ENGINE_LOOP
+        )
+        for engine in ALLOCATION_ENGINES:
+            result = dhondt_calculation(
+                political_parties=pplists, seats=seats, engine=engine
+            )
+            assert reference == result
+
+    def test_dhondt_calculation_divisor_large_chamber(self):
+        seats = 100000
+        result = dhondt_calculation(
+            political_parties=PPLIST_TABLE_2, seats=seats, engine=ENGINE_DIVISOR
+        )
+        assert (
+            dhondt_calculation(political_parties=PPLIST_TABLE_2, seats=seats) == result
+        )
+
+        seats = pow(2, 31)
+        total_votes = sum(x["votes"] for x in PPLIST_TABLE_2)
+        result = dhondt_calculation(
+            political_parties=PPLIST_TABLE_2, seats=seats, engine=ENGINE_DIVISOR
+        )
+        assert seats == sum(x["seats"] for x in result)
+        for pplist, res in zip(PPLIST_TABLE_2, result):
+            lower_quota = pplist["votes"] * seats // total_votes
+            assert lower_quota <= res["seats"] < lower_quota + len(PPLIST_TABLE_2)
+
+    def test_dhondt_calculation_divisor_no_votes(self):
+        pplists = [
+            {k: v if k != "votes" else 0 for k, v in s.items()} for s in PPLIST_TABLE_2
+        ]
+        for engine in ALLOCATION_ENGINES:
+            result = dhondt_calculation(
+                political_parties=pplists, seats=21, engine=engine
+            )
+            assert [x["seats"] for x in result] == [0, 0, 0, 0, 0, 0, 21]
+
+    @pytest.mark.parametrize(
+        "seats, ppls, engine",
+        [(7, 5, DEFAULT_ENGINE), (40, 5, DEFAULT_ENGINE), (41, 5, ENGINE_DIVISOR)],
+    )
+    def test_select_engine(self, seats, ppls, engine):
+        assert engine == select_engine(seats, ppls)
@@ -0,0 +1,114 @@
+import logging
+from datetime import datetime
+
+from dhondt.db.dhondt_repository import DhondtRepository
+from dhondt.db.entity_cache import EntityCache, MemoryCacheBackend
+from dhondt.db.tabledefs import DistrictTable
+
+from test_dhondt_service import PPLIST_TABLE_1
+
+logger = logging.getLogger(__name__)
+
+
+class TestEntityCache:
+
+    def test_ttl_and_lru(self):
+        now = [0.0]
+        backend = MemoryCacheBackend(maxsize=2, ttl=10, clock=lambda: now[0])
+        backend.set("a", 1)
+        backend.set("b", 2)
+        assert backend.get("a") == 1
+        backend.set("c", 3)
+        # b is the least recently used
+        assert backend.get("b") is None
+        now[0] = 10
+        assert backend.get("a") is None
+        assert backend.stats() == {"size": 1, "maxsize": 2, "evictions": 1}
+
+    def test_get_or_load(self):
+        cache = EntityCache(MemoryCacheBackend(), enabled=True)
+        loads = []
+
+        def load():
+            loads.append(1)
+            return [{"id": 1, "seats": len(loads)}]
+
+        assert cache.get_or_load("scrutinies", 1, (None,), load) == [
+            {"id": 1, "seats": 1}
+        ]
+        cache.get_or_load("scrutinies", 1, (None,), load)[0]["seats"] = 100
+        assert cache.get_or_load("scrutinies", 1, (None,), load) == [
+            {"id": 1, "seats": 1}
+        ]
+        # other scopes are not invalidated
+        cache.invalidate("scrutinies", 2)
+        assert len(loads) == 1
+        cache.invalidate("scrutinies", 1)
+        assert cache.get_or_load("scrutinies", 1, (None,), load) == [
+            {"id": 1, "seats": 2}
+        ]
+        # not found entities are not cached
+        assert cache.get_or_load("scrutinies", 1, (2,), lambda: None) is None
+        # entries of the previous generation expire by TTL or LRU
+        assert cache.stats() == {
+            "size": 2,
+            "maxsize": cache.backend.maxsize,
+            "evictions": 0,
+            "hits": 2,
+            "misses": 3,
+        }
+
+    def test_disabled(self):
+        cache = EntityCache(MemoryCacheBackend(), enabled=False)
+        assert cache.get_or_load("scrutinies", 1, (), lambda: [1]) == [1]
+        assert cache.stats()["size"] == 0
+
+    def test_repository_read_through(self, db_session, queries):
+        district = DistrictTable(name="entity cache district")
+        db_session.add(district)
+        db_session.commit()
+        repo = DhondtRepository(
+            db_session, cache=EntityCache(MemoryCacheBackend(), enabled=True)
+        )
+        pplist = repo.create_political_party_list(
+            name="entity cache list", electors=1000, district_id=district.id
+        )
+        queries.clear()
+        assert repo.get_scrutinies(district.id) is None
+        assert repo.get_scrutinies(district.id) is None
+        assert len(queries) == 2
+
+        # Lists are read with its votes, so they are never cached
+        queries.clear()
+        assert repo.get_political_party_lists(district.id) == [pplist]
+        assert repo.get_political_party_lists(district.id) == [pplist]
+        assert len(queries) == 2
+        updated = repo.update_votes(
+            [
+                {
+                    "districtId": district.id,
+                    "pplistId": pplist["id"],
+                    "votes": PPLIST_TABLE_1[0]["votes"],
+                }
+            ]
+        )
+        assert repo.get_political_party_lists(district.id) == updated
+
+        assert repo.get_districts(datetime(2024, 12, 2), district.id) is None
+        scrutiny = repo.create_scrutiny(
+            district.id,
+            "entity cache scrutiny",
+            datetime(2024, 12, 1),
+            datetime(2024, 12, 2),
+            7,
+        )
+        queries.clear()
+        assert repo.get_scrutinies(district.id) == [scrutiny]
+        assert repo.get_scrutinies(district.id) == [scrutiny]
+        assert len(queries) == 1
+        assert repo.get_districts(datetime(2024, 12, 2), district.id) == [
+            district.dict()
+        ]
+
+    def test_disabled_by_default(self):
+        assert not EntityCache().enabled
@@ -0,0 +1,80 @@
+import logging
+
+from prometheus_client import REGISTRY
+
+from dhondt.db.controller import statement_kind
+from dhondt.dhondt_service.dhondt_service import dhondt_calculation, size_label
+from dhondt.web.app import create_app
+
+from test_dhondt_service import PPLIST_TABLE_1, TABLE_1_RESULT_OK
+
+logger = logging.getLogger(__name__)
+
+API = "/dhondt/v1"
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetrics:
+
+    def test_labels(self):
+        assert statement_kind("  select 1") == "SELECT"
+        assert statement_kind("COPY votes FROM STDIN") == "COPY"
+        assert statement_kind("WITH x AS (SELECT 1) SELECT * FROM x") == "OTHER"
+        assert statement_kind("") == "OTHER"
+        assert [size_label(x) for x in (1, 10, 11, 350, 10001)] == [
+            "10",
+            "10",
+            "100",
+            "1000",
+            "+Inf",
+        ]
+
+    def test_calculation_duration(self):
+        labels = {"engine": "heap", "parties": "10", "seats": "10"}
+        count = _sample("dhondt_calculation_duration_seconds_count", **labels)
+        assert dhondt_calculation(PPLIST_TABLE_1, 7) == TABLE_1_RESULT_OK
+        assert (
+            _sample("dhondt_calculation_duration_seconds_count", **labels) == count + 1
+        )
+
+    def test_metrics_route(self, client, district_factory):
+        district, _ = district_factory(PPLIST_TABLE_1)
+        route = {
+            "method": "GET",
+            "route": "/dhondt/v1/districts/<int:districtId>/political-party-lists",
+            "status": "200",
+        }
+        requests = _sample("dhondt_http_request_duration_seconds_count", **route)
+        selects = _sample("dhondt_db_query_duration_seconds_count", statement="SELECT")
+        response = client.get(f"{API}/districts/{district}/political-party-lists")
+        assert response.status_code == 200
+        assert (
+            _sample("dhondt_http_request_duration_seconds_count", **route)
+            == requests + 1
+        )
+        assert (
+            _sample("dhondt_db_query_duration_seconds_count", statement="SELECT")
+            > selects
+        )
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.mimetype == "text/plain"
+        text = response.get_data(as_text=True)
+        for name in (
+            "dhondt_http_request_duration_seconds_bucket",
+            "dhondt_db_query_duration_seconds_sum",
+            "dhondt_calculation_duration_seconds",
+            "dhondt_db_pool_checkouts_total",
+            "dhondt_entity_cache_hits_total",
+            "dhondt_vote_buffer_pending",
+            "dhondt_projections_subscribers",
+        ):
+            assert name in text
+
+    def test_disabled(self):
+        client = create_app({"TESTING": True, "METRICS": False}).test_client()
+        assert client.get("/metrics").status_code == 404
@@ -0,0 +1,102 @@
+import json
+import logging
+import pstats
+
+from dhondt.web.app import create_app
+
+from test_dhondt_service import PPLIST_TABLE_1
+
+logger = logging.getLogger(__name__)
+
+API = "/dhondt/v1"
+TOKEN = "s3cret"
+
+
+def _profiled_client(directory, sample_rate=0, max_profiles=100):
+    return create_app(
+        {
+            "TESTING": True,
+            "PROFILING": True,
+            "PROFILING_DIR": str(directory),
+            "PROFILING_TOKEN": TOKEN,
+            "PROFILING_SAMPLE_RATE": sample_rate,
+            "PROFILING_MAX_PROFILES": max_profiles,
+        }
+    ).test_client()
+
+
+class TestProfiling:
+
+    def test_header(self, tmp_path, district_factory):
+        district, _ = district_factory(PPLIST_TABLE_1)
+        client = _profiled_client(tmp_path)
+        url = f"{API}/districts/{district}/political-party-lists"
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
+
+        response = client.get(url, headers={"X-Profile": "1"})
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
+
+        response = client.get(url, headers={"X-Profile": TOKEN})
+        assert response.status_code == 200
+        assert len(response.json["politicalPartyLists"]) == len(PPLIST_TABLE_1)
+        name = response.headers["X-Profile-Id"]
+        assert int(response.headers["X-Profile-Queries"]) > 0
+        assert int(response.headers["X-Profile-Memory-Peak"]) > 0
+        timings = dict(
+            x.strip().split(";dur=")
+            for x in response.headers["Server-Timing"].split(",")
+        )
+        assert list(timings) == ["wall", "db", "serialization"]
+        report = json.loads((tmp_path / f"{name}.json").read_text())
+        assert report["path"] == url
+        assert report["status"] == 200
+        assert 0 < report["db"] < report["wall"]
+        assert 0 < report["serialization"] < report["wall"]
+        assert pstats.Stats(str(tmp_path / f"{name}.prof")).total_calls > 0
+
+    def test_download(self, tmp_path):
+        client = _profiled_client(tmp_path)
+        response = client.get(
+            f"{API}/districts/999999/political-party-lists",
+            headers={"X-Profile": f"{TOKEN} download"},
+        )
+        assert response.status_code == 200
+        assert response.mimetype == "application/octet-stream"
+        assert response.headers["X-Profile-Status"] == "404"
+        name = response.headers["X-Profile-Id"]
+        assert f'filename="{name}.prof"' in response.headers["Content-Disposition"]
+        assert response.data == (tmp_path / f"{name}.prof").read_bytes()
+
+    def test_sampled(self, tmp_path):
+        client = _profiled_client(tmp_path, sample_rate=2)
+        profiled = [
+            "X-Profile-Id" in client.get(f"{API}/districts").headers for _ in range(4)
+        ]
+        assert profiled == [True, False, True, False]
+        assert len(list(tmp_path.glob("*.prof"))) == 2
+
+    def test_max_profiles(self, tmp_path):
+        client = _profiled_client(tmp_path, max_profiles=2)
+        names = [
+            client.get(f"{API}/districts", headers={"X-Profile": TOKEN}).headers[
+                "X-Profile-Id"
+            ]
+            for _ in range(3)
+        ]
+        assert sorted(x.stem for x in tmp_path.glob("*.prof")) == names[1:]
+        assert sorted(x.stem for x in tmp_path.glob("*.json")) == names[1:]
+
+    def test_without_token(self, tmp_path):
+        client = create_app(
+            {"TESTING": True, "PROFILING": True, "PROFILING_DIR": str(tmp_path)}
+        ).test_client()
+        response = client.get(f"{API}/districts", headers={"X-Profile": ""})
+        assert "X-Profile-Id" not in response.headers
+
+    def test_disabled(self, client):
+        response = client.get(f"{API}/districts", headers={"X-Profile": TOKEN})
+        assert "X-Profile-Id" not in response.headers
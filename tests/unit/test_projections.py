@@ -0,0 +1,159 @@
+import json
+import logging
+
+from dhondt.dhondt_service.allocation_state import allocation_states
+from dhondt.dhondt_service.dhondt_service import update_allocations
+from dhondt.dhondt_service.projections import (
+    ProjectionHub,
+    Subscription,
+    projection_hub,
+)
+
+from test_dhondt_service import PPLIST_TABLE_1, TABLE_1_RESULT_OK
+
+logger = logging.getLogger(__name__)
+
+API = "/dhondt/v1"
+
+
+def _event(message):
+    event, data = message.strip().split("\n")
+    assert event == "event: seats"
+    return json.loads(data.removeprefix("data: "))
+
+
+class TestProjections:
+
+    def test_publish_only_changes(self):
+        hub = ProjectionHub()
+        first = hub.subscribe(1, 1, Subscription())
+        second = hub.subscribe(1, 1, Subscription())
+        other = hub.subscribe(1, 2, Subscription())
+        event = {"seatsResults": [{"pplistId": 1, "seats": 2}]}
+        assert hub.publish(1, 1, event)
+        assert not hub.publish(1, 1, dict(event, resultId=2))
+        # subscribers share the message encoded once
+        assert first.get(0) is second.get(0)
+        assert first.get(0) is None
+        assert other.get(0) is None
+
+        # late subscribers get the latest projection, slow ones the newest
+        assert hub.publish(1, 1, {"seatsResults": [{"pplistId": 1, "seats": 3}]})
+        assert hub.publish(1, 1, {"seatsResults": [{"pplistId": 1, "seats": 4}]})
+        late = hub.subscribe(1, 1, Subscription())
+        assert _event(late.get(0))["seatsResults"][0]["seats"] == 4
+        assert _event(second.get(0))["seatsResults"][0]["seats"] == 4
+
+        hub.unsubscribe(1, 1, first)
+        assert hub.stats() == {"subscribers": 3, "published": 3}
+
+    def test_vote_updates_publish_projections(self):
+        pplists = [dict(x, districtId=1) for x in PPLIST_TABLE_1]
+        allocation_states.allocate(
+            1000, 1000, pplists, 7, lambda ppls, seats: TABLE_1_RESULT_OK
+        )
+        subscription = projection_hub.subscribe(1000, 1000, Subscription())
+        try:
+            update_allocations(1000, pplists[0]["id"], pplists[0]["votes"] + 1)
+            assert subscription.get(0) is None
+            update_allocations(1000, pplists[4]["id"], 500000)
+            event = _event(subscription.get(0))
+            assert event["resultId"] is None
+            assert [x["seats"] for x in event["seatsResults"]] == [2, 1, 1, 0, 3]
+        finally:
+            projection_hub.unsubscribe(1000, 1000, subscription)
+            allocation_states.clear()
+
+    def test_stream(self, client, district_factory):
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1)
+        for pplist, table in zip(pplists_1, PPLIST_TABLE_1):
+            client.put(
+                f"{API}/districts/{district_1}/political-party-lists/"
+                f"{pplist['id']}/vote",
+                json={"votes": table["votes"]},
+            )
+        response = client.post(
+            f"{API}/districts/{district_1}/scrutinies",
+            json={
+                "name": "stream scrutiny",
+                "seats": 7,
+                "votingDate": "2024-12-01",
+                "scrutinyDate": "2024-12-02",
+            },
+        )
+        url = f"{API}/districts/{district_1}/scrutinies/{response.json['id']}"
+        response = client.get(f"{url}/seats-status/stream", buffered=False)
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        events = iter(response.response)
+        assert next(events) == b": subscribed\n\n"
+
+        result = client.post(f"{url}/seats-status").json
+        event = _event(next(events).decode())
+        assert event["resultId"] == result["resultId"]
+        assert event["seatsResults"] == result["seatsResults"]
+
+        client.put(
+            f"{API}/districts/{district_1}/political-party-lists/"
+            f"{pplists_1[4]['id']}/vote",
+            json={"votes": 500000},
+        )
+        event = _event(next(events).decode())
+        assert event["resultId"] is None
+        assert [x["seats"] for x in event["seatsResults"]] == [2, 1, 1, 0, 3]
+        response.close()
+        assert projection_hub.stats()["subscribers"] == 0
+
+        response = client.get(
+            f"{API}/districts/{district_1 + 1}/scrutinies/"
+            f"{result['scrutinyId']}/seats-status/stream"
+        )
+        assert response.status_code == 404
+
+    def test_stream_without_allocation_state(self, client, district_factory):
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1)
+        import_url = f"{API}/political-party-lists/votes/import"
+        body = "districtId,pplistId,votes\n" + "".join(
+            f"{district_1},{pplist['id']},{table['votes']}\n"
+            for pplist, table in zip(pplists_1, PPLIST_TABLE_1)
+        )
+        client.post(import_url, data=body, content_type="text/csv")
+        response = client.post(
+            f"{API}/districts/{district_1}/scrutinies",
+            json={
+                "name": "stream scrutiny",
+                "seats": 7,
+                "votingDate": "2024-12-01",
+                "scrutinyDate": "2024-12-02",
+            },
+        )
+        url = f"{API}/districts/{district_1}/scrutinies/{response.json['id']}"
+        result = client.post(f"{url}/seats-status").json
+        # Calculated by another process, nothing of it in this one
+        allocation_states.clear()
+        projection_hub.clear()
+
+        response = client.get(f"{url}/seats-status/stream", buffered=False)
+        events = iter(response.response)
+        try:
+            assert next(events) == b": subscribed\n\n"
+            event = _event(next(events).decode())
+            assert event["resultId"] == result["resultId"]
+            assert event["seatsResults"] == result["seatsResults"]
+
+            client.put(
+                f"{API}/districts/{district_1}/political-party-lists/"
+                f"{pplists_1[4]['id']}/vote",
+                json={"votes": 500000},
+            )
+            event = _event(next(events).decode())
+            assert event["resultId"] is None
+            assert [x["seats"] for x in event["seatsResults"]] == [2, 1, 1, 0, 3]
+
+            # Imported votes republish the scrutinies of their districts
+            client.post(import_url, data=body, content_type="text/csv")
+            event = _event(next(events).decode())
+            assert event["seatsResults"] == result["seatsResults"]
+        finally:
+            response.close()
+            allocation_states.clear()
@@ -0,0 +1,112 @@
+import logging
+from datetime import datetime
+
+from dhondt.db.dhondt_repository import DhondtRepository
+from dhondt.db.tabledefs import DhondtResultTable, DistrictTable
+from dhondt.dhondt_service.dhondt_service import DhondtService
+from dhondt.dhondt_service.result_cache import ResultCache
+
+from test_dhondt_service import PPLIST_TABLE_1, TABLE_1_RESULT_OK
+
+logger = logging.getLogger(__name__)
+
+
+class TestResultCache:
+
+    def test_fingerprint(self):
+        key = ResultCache.fingerprint(1, 7, PPLIST_TABLE_1)
+        assert key == ResultCache.fingerprint(1, 7, list(reversed(PPLIST_TABLE_1)))
+        assert key != ResultCache.fingerprint(2, 7, PPLIST_TABLE_1)
+        assert key != ResultCache.fingerprint(1, 8, PPLIST_TABLE_1)
+        changed = [dict(x, votes=x["votes"] + 1) for x in PPLIST_TABLE_1]
+        assert key != ResultCache.fingerprint(1, 7, changed)
+
+    def test_hash_collision_is_not_a_hit(self):
+        # hash(-1) == hash(-2) in CPython
+        colliding = [dict(PPLIST_TABLE_1[0], votes=-1)]
+        other = [dict(PPLIST_TABLE_1[0], votes=-2)]
+        key = ResultCache.fingerprint(1, 7, colliding)
+        assert hash(key) == hash(ResultCache.fingerprint(1, 7, other))
+        cache = ResultCache()
+        cache.put(key, {"resultId": 1})
+        assert cache.get(ResultCache.fingerprint(1, 7, other)) is None
+        assert cache.get(key) == {"resultId": 1}
+
+    def test_lru(self):
+        cache = ResultCache(maxsize=2)
+        assert cache.get((1, 7, 0)) is None
+        cache.put((1, 7, 0), {"resultId": 1})
+        cache.put((2, 7, 0), {"resultId": 2})
+        assert cache.get((1, 7, 0)) == {"resultId": 1}
+        cache.put((3, 7, 0), {"resultId": 3})
+        # scrutiny 2 is the least recently used
+        assert cache.get((2, 7, 0)) is None
+        # a newer result of the scrutiny replaces the previous one
+        cache.put((1, 7, 1), {"resultId": 4})
+        assert cache.get((1, 7, 0)) is None
+        assert cache.get((1, 7, 1)) == {"resultId": 4}
+        assert cache.stats() == {
+            "size": 2,
+            "maxsize": 2,
+            "hits": 2,
+            "misses": 3,
+            "evictions": 1,
+        }
+
+    def test_get_returns_copy(self):
+        cache = ResultCache()
+        cache.put((1, 7, 0), {"seatsResults": [{"seats": 1}]})
+        cache.get((1, 7, 0))["seatsResults"][0]["seats"] = 2
+        assert cache.get((1, 7, 0)) == {"seatsResults": [{"seats": 1}]}
+
+    def test_calculate_seats_cached(self, db_session):
+        district = DistrictTable(name="cache district")
+        db_session.add(district)
+        db_session.commit()
+        repo = DhondtRepository(db_session)
+        service = DhondtService(repo)
+        for pplist in PPLIST_TABLE_1:
+            record = service.create_political_party_list(
+                name=f"cache {pplist['name']}",
+                electors=pplist["electors"],
+                districtId=district.id,
+            )
+            service.update_vote(district.id, record["id"], pplist["votes"])
+        scrutiny = service.create_scrutiny(
+            district_id=district.id,
+            votingDate=datetime(2024, 12, 1),
+            scrutinyDate=datetime(2024, 12, 2),
+            name="cache scrutiny",
+            seats=7,
+        )
+
+        def results_count():
+            return (
+                db_session.query(DhondtResultTable)
+                .filter(DhondtResultTable.scrutiny_id == scrutiny["id"])
+                .count()
+            )
+
+        first = service.calculate_seats(district.id, scrutiny["id"])
+        assert [x["seats"] for x in first["seatsResults"]] == [
+            x["seats"] for x in TABLE_1_RESULT_OK
+        ]
+        assert service.calculate_seats(district.id, scrutiny["id"]) == first
+        assert results_count() == 1
+
+        service.update_vote(district.id, first["seatsResults"][4]["pplistId"], 500000)
+        second = service.calculate_seats(district.id, scrutiny["id"])
+        assert second["resultId"] != first["resultId"]
+        assert [x["seats"] for x in second["seatsResults"]] == [2, 1, 1, 0, 3]
+        assert results_count() == 2
+
+        # Another process stores a newer result, the cached one is stale
+        calculation_input = repo.get_calculation_input(district.id, scrutiny["id"])
+        third = repo.create_calculated_result(
+            calculation_input["scrutiny"], second["seatsResults"]
+        )
+        assert repo.get_latest_result_id(scrutiny["id"]) == third["resultId"]
+        fourth = service.calculate_seats(district.id, scrutiny["id"])
+        assert fourth["resultId"] not in (second["resultId"], third["resultId"])
+        assert results_count() == 4
+        assert service.calculate_seats(district.id, scrutiny["id"]) == fourth
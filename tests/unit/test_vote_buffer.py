@@ -0,0 +1,224 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from dhondt.db.controller import get_db_session
+from dhondt.db.exceptions import VotesOutOfRange
+from dhondt.db.dhondt_repository import DhondtRepository
+from dhondt.db.tabledefs import PoliticalPartyListTable
+from dhondt.dhondt_service.dhondt_service import DhondtService
+from dhondt.dhondt_service.vote_buffer import VoteBuffer, vote_buffer
+
+from test_dhondt_service import PPLIST_TABLE_1
+
+logger = logging.getLogger(__name__)
+
+API = "/dhondt/v1"
+
+
+class TestVoteBuffer:
+
+    @pytest.fixture
+    def writes(self):
+        return []
+
+    @pytest.fixture
+    def buffer(self, writes):
+        return VoteBuffer(
+            enabled=True,
+            writer=lambda sets, increments: writes.append((sets, increments)),
+        )
+
+    def test_merge_and_overlay(self, buffer, writes):
+        pplists = [
+            {"id": 1, "districtId": 1, "votes": 10},
+            {"id": 2, "districtId": 1, "votes": 20},
+            {"id": 3, "districtId": 1, "votes": 30},
+        ]
+        assert buffer.read(lambda: pplists) is pplists
+        buffer.set(1, 1, 100)
+        buffer.set(1, 1, 150)
+        buffer.add(1, 1, 5)
+        buffer.add(1, 2, 1)
+        buffer.add(1, 2, 2)
+        assert [x["votes"] for x in buffer.read(lambda: pplists)] == [155, 23, 30]
+        assert buffer.district_version(1) == 5
+
+        assert buffer.flush() == 2
+        assert writes == [
+            (
+                [{"districtId": 1, "pplistId": 1, "votes": 155}],
+                [{"districtId": 1, "pplistId": 2, "votes": 3}],
+            )
+        ]
+        assert buffer.flush() == 0
+        assert buffer.stats() == {"pending": 0, "updates": 5, "flushes": 1}
+
+    def test_failed_flush_is_buffered_again(self, buffer):
+        def fail(sets, increments):
+            # newer updates received while flushing
+            buffer.add(1, 1, 1)
+            raise RuntimeError("database down")
+
+        buffer.writer = fail
+        buffer.add(1, 1, 10)
+        with pytest.raises(RuntimeError):
+            buffer.flush()
+        pplists = buffer.read(lambda: [{"id": 1, "districtId": 1, "votes": 0}])
+        assert pplists[0]["votes"] == 11
+
+    def test_read_while_flushing(self, buffer):
+        database = {"votes": 100}
+        committed = threading.Event()
+        release = threading.Event()
+
+        def write(sets, increments):
+            database["votes"] += increments[0]["votes"]
+            committed.set()
+            # committed, but the flush is not finished yet
+            release.wait(5)
+
+        def load():
+            return [{"id": 1, "districtId": 1, "votes": database["votes"]}]
+
+        buffer.writer = write
+        buffer.add(1, 1, 5)
+        flusher = threading.Thread(target=buffer.flush)
+        flusher.start()
+        assert committed.wait(5)
+        reads = []
+        reader = threading.Thread(target=lambda: reads.append(buffer.read(load)))
+        reader.start()
+        reader.join(0.1)
+        assert not reads
+        release.set()
+        flusher.join(5)
+        reader.join(5)
+        assert reads[0][0]["votes"] == 105
+
+    def test_read_overlapping_flush_is_retried(self, buffer):
+        database = {"votes": 100}
+
+        def write(sets, increments):
+            database["votes"] += increments[0]["votes"]
+
+        loads = []
+
+        def load():
+            pplists = [{"id": 1, "districtId": 1, "votes": database["votes"]}]
+            if not loads:
+                # flushed after the load read the votes
+                buffer.flush()
+            loads.append(pplists)
+            return pplists
+
+        buffer.writer = write
+        buffer.add(1, 1, 5)
+        assert buffer.read(load)[0]["votes"] == 105
+        assert len(loads) == 2
+
+    def test_add_limit(self, buffer, writes):
+        def load():
+            return [{"id": 1, "districtId": 1, "votes": 90}]
+
+        assert buffer.add(1, 1, 5, load=load, limit=100)[0]["votes"] == 95
+        with pytest.raises(VotesOutOfRange):
+            buffer.add(1, 1, 6, load=load, limit=100)
+        assert buffer.add(1, 2, 5, load=lambda: None, limit=100) is None
+
+        barrier = threading.Barrier(20)
+        errors = []
+
+        def increment():
+            barrier.wait(5)
+            try:
+                buffer.add(1, 1, 1, load=load, limit=100)
+            except VotesOutOfRange as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=increment) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        # Checked and buffered under the same lock, never over the limit
+        assert len(errors) == 15
+        assert buffer.read(load)[0]["votes"] == 100
+        buffer.flush()
+        assert writes[0][1] == [{"districtId": 1, "pplistId": 1, "votes": 10}]
+
+    def test_update_votes_aborts_on_failed_flush(
+        self, db_session, district_factory, monkeypatch
+    ):
+        def fail(sets, increments):
+            raise RuntimeError("database down")
+
+        monkeypatch.setattr(vote_buffer, "enabled", True)
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1)
+        pplist_id = pplists_1[0]["id"]
+        service = DhondtService(DhondtRepository(db_session))
+        service.update_vote(district_1, pplist_id, 10)
+
+        writer = vote_buffer.writer
+        monkeypatch.setattr(vote_buffer, "writer", fail)
+        with pytest.raises(RuntimeError):
+            service.update_votes(
+                [{"districtId": district_1, "pplistId": pplist_id, "votes": 999}]
+            )
+        # the newer bulk votes are not overwritten by the buffered ones
+        monkeypatch.setattr(vote_buffer, "writer", writer)
+        assert vote_buffer.flush() == 1
+        service.update_votes(
+            [{"districtId": district_1, "pplistId": pplist_id, "votes": 999}]
+        )
+        with get_db_session() as session:
+            record = session.get(PoliticalPartyListTable, pplist_id)
+            assert record.votes == 999
+
+    def test_flusher(self, writes):
+        buffer = VoteBuffer(
+            enabled=True,
+            flush_ms=60000,
+            max_updates=2,
+            writer=lambda sets, increments: writes.append(sets),
+        )
+        buffer.start()
+        buffer.set(1, 1, 10)
+        buffer.set(1, 2, 20)
+        for _ in range(100):
+            if writes:
+                break
+            time.sleep(0.01)
+        assert len(writes) == 1
+        buffer.set(1, 3, 30)
+        buffer.stop()
+        assert writes[-1] == [{"districtId": 1, "pplistId": 3, "votes": 30}]
+
+    def test_write_behind_votes(self, client, district_factory, queries, monkeypatch):
+        monkeypatch.setattr(vote_buffer, "enabled", True)
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1)
+        url = f"{API}/districts/{district_1}/political-party-lists"
+        etag = client.get(url).headers["ETag"]
+
+        queries.clear()
+        for votes in (10, 20, 30):
+            response = client.put(
+                f"{url}/{pplists_1[0]['id']}/vote", json={"votes": votes}
+            )
+            assert response.json["votes"] == votes
+        response = client.post(
+            f"{url}/{pplists_1[0]['id']}/vote/delta", json={"delta": 5}
+        )
+        assert response.json["votes"] == 35
+        assert not [x for x in queries if x.startswith("UPDATE")]
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json["politicalPartyLists"][0]["votes"] == 35
+
+        assert vote_buffer.flush() == 1
+        with get_db_session() as session:
+            record = session.get(PoliticalPartyListTable, pplists_1[0]["id"])
+            assert record.votes == 35
@@ -0,0 +1,438 @@
+import json
+import logging
+from datetime import datetime
+
+import pytest
+
+from dhondt.db.dhondt_repository import MAX_VOTES
+from dhondt.dhondt_service.dhondt_service import DhondtService
+from dhondt.dhondt_service.vote_buffer import vote_buffer
+from dhondt.web.api.schemas import GetScrutinies
+from dhondt.web.api.validation import ResponseValidation
+from dhondt.web.app import create_app
+from dhondt.web.json_provider import OrjsonProvider, json_provider_class
+from flask.json.provider import DefaultJSONProvider
+
+from test_dhondt_service import PPLIST_TABLE_1, PPLIST_TABLE_2
+
+logger = logging.getLogger(__name__)
+
+API = "/dhondt/v1"
+
+
+class TestWebApi:
+
+    def test_upgrade_votes(self, client, district_factory):
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1)
+        district_2, pplists_2 = district_factory(PPLIST_TABLE_2)
+        votes = [
+            {
+                "districtId": district_1,
+                "pplistId": pplist["id"],
+                "votes": table["votes"],
+            }
+            for pplist, table in zip(pplists_1, PPLIST_TABLE_1)
+        ] + [
+            {
+                "districtId": district_2,
+                "pplistId": pplist["id"],
+                "votes": table["votes"],
+            }
+            for pplist, table in zip(pplists_2, PPLIST_TABLE_2)
+        ]
+        response = client.put(
+            f"{API}/political-party-lists/votes",
+            json={"politicalPartyListVotes": votes},
+        )
+        assert response.status_code == 200
+        assert [
+            (x["districtId"], x["id"], x["votes"])
+            for x in response.json["politicalPartyLists"]
+        ] == [(x["districtId"], x["pplistId"], x["votes"]) for x in votes]
+
+        response = client.get(f"{API}/districts/{district_2}/political-party-lists")
+        assert [x["votes"] for x in response.json["politicalPartyLists"]] == [
+            x["votes"] for x in PPLIST_TABLE_2
+        ]
+
+    def test_upgrade_votes_not_found(self, client, district_factory):
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1[:2])
+        district_2, _ = district_factory(PPLIST_TABLE_1[:1])
+        votes = [
+            {"districtId": district_1, "pplistId": pplists_1[0]["id"], "votes": 10},
+            # Political party list of other district
+            {"districtId": district_2, "pplistId": pplists_1[1]["id"], "votes": 10},
+        ]
+        response = client.put(
+            f"{API}/political-party-lists/votes",
+            json={"politicalPartyListVotes": votes},
+        )
+        assert response.status_code == 404
+
+        # Nothing updated
+        response = client.get(f"{API}/districts/{district_1}/political-party-lists")
+        assert [x["votes"] for x in response.json["politicalPartyLists"]] == [0, 0]
+
+    @pytest.mark.parametrize(
+        "payload",
+        [
+            {"politicalPartyListVotes": []},
+            {"politicalPartyListVotes": [{"districtId": 1, "pplistId": 1}]},
+            {"politicalPartyListVotes": [{"districtId": 1, "pplistId": 0, "votes": 1}]},
+            {
+                "politicalPartyListVotes": [
+                    {"districtId": 1, "pplistId": 1, "votes": -1}
+                ]
+            },
+        ],
+    )
+    def test_upgrade_votes_invalid(self, client, payload):
+        response = client.put(f"{API}/political-party-lists/votes", json=payload)
+        assert response.status_code == 422
+
+    def test_import_votes(self, client, district_factory):
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1)
+        body = "districtId,pplistId,votes\n" + "".join(
+            f"{district_1},{pplist['id']},{table['votes']}\n"
+            for pplist, table in zip(pplists_1, PPLIST_TABLE_1)
+        )
+        # Repeated list, the last votes win. Unknown list is ignored
+        body += f"{district_1},{pplists_1[0]['id']},5\n{district_1},999999,5\n"
+        response = client.post(
+            f"{API}/political-party-lists/votes/import",
+            data=body,
+            content_type="text/csv",
+        )
+        assert response.status_code == 200
+        assert response.json["rows"] == len(PPLIST_TABLE_1) + 2
+
+        response = client.get(f"{API}/districts/{district_1}/political-party-lists")
+        assert [x["votes"] for x in response.json["politicalPartyLists"]] == [5] + [
+            x["votes"] for x in PPLIST_TABLE_1[1:]
+        ]
+
+        body = "\n".join(
+            json.dumps({"districtId": district_1, "pplistId": pplist["id"], "votes": 1})
+            for pplist in pplists_1
+        )
+        response = client.post(
+            f"{API}/political-party-lists/votes/import",
+            data=body,
+            content_type="application/x-ndjson",
+        )
+        assert response.json == {"rows": len(pplists_1), "updated": len(pplists_1)}
+
+    @pytest.mark.parametrize(
+        "body, content_type, status_code",
+        [
+            ("districtId,pplistId,votes\n1,1,1\n", "text/plain", 415),
+            ("districtId,pplistId\n1,1\n", "text/csv", 422),
+            ("districtId,pplistId,votes\n1,1,-1\n", "text/csv", 422),
+            ("districtId,pplistId,votes\n1,1,3000000000\n", "text/csv", 422),
+            (
+                f'{{"districtId": 1, "pplistId": {2**70}, "votes": 1}}',
+                "application/x-ndjson",
+                422,
+            ),
+            (
+                '{"districtId": 1, "pplistId": 1, "votes": 1',
+                "application/x-ndjson",
+                422,
+            ),
+        ],
+    )
+    def test_import_votes_invalid(self, client, body, content_type, status_code):
+        response = client.post(
+            f"{API}/political-party-lists/votes/import",
+            data=body,
+            content_type=content_type,
+        )
+        assert response.status_code == status_code
+
+    def test_import_votes_command(self, client, runner, district_factory, tmp_path):
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1[:2])
+        votes_file = tmp_path / "votes.csv"
+        votes_file.write_text(
+            "districtId,pplistId,votes\n"
+            + "".join(f"{district_1},{pplist['id']},7\n" for pplist in pplists_1)
+        )
+        result = runner.invoke(args=["import-votes", str(votes_file)])
+        assert result.exit_code == 0
+        assert "2 votes read, 2 political party lists updated" in result.output
+
+        response = client.get(f"{API}/districts/{district_1}/political-party-lists")
+        assert [x["votes"] for x in response.json["politicalPartyLists"]] == [7, 7]
+
+        votes_file.write_text("districtId,pplistId,votes\n1,a,7\n")
+        result = runner.invoke(args=["import-votes", str(votes_file)])
+        assert result.exit_code != 0
+        assert "line 2" in result.output
+
+    def test_political_party_lists_pages(self, client, district_factory):
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_2)
+        url = f"{API}/districts/{district_1}/political-party-lists"
+        pages = []
+        response = client.get(url, query_string={"limit": 3})
+        pages.append(response.json["politicalPartyLists"])
+        while response.json["nextCursor"] is not None:
+            response = client.get(
+                url, query_string={"limit": 3, "after": response.json["nextCursor"]}
+            )
+            pages.append(response.json["politicalPartyLists"])
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert [x for page in pages for x in page] == pplists_1
+
+        response = client.get(url, query_string={"limit": 0})
+        assert response.status_code == 422
+
+    def test_seats_results_pages(self, client, district_factory):
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1)
+        response = client.post(
+            f"{API}/districts/{district_1}/scrutinies",
+            json={
+                "name": "pages scrutiny",
+                "seats": 7,
+                "votingDate": "2024-12-01",
+                "scrutinyDate": "2024-12-02",
+            },
+        )
+        url = f"{API}/districts/{district_1}/scrutinies/{response.json['id']}"
+        response = client.get(f"{url}/seats-status")
+        assert response.status_code == 404
+
+        results = []
+        for votes in range(1, 4):
+            client.put(
+                f"{API}/districts/{district_1}/political-party-lists/"
+                f"{pplists_1[0]['id']}/vote",
+                json={"votes": votes},
+            )
+            results.append(client.post(f"{url}/seats-status").json["resultId"])
+
+        response = client.get(f"{url}/seats-status")
+        assert [x["resultId"] for x in response.json["scrutinyResults"]] == results
+        assert response.json["nextCursor"] is None
+
+        response = client.get(f"{url}/seats-status", query_string={"limit": 2})
+        assert [x["resultId"] for x in response.json["scrutinyResults"]] == results[:2]
+        assert response.json["nextCursor"] == results[1]
+        response = client.get(
+            f"{url}/seats-status", query_string={"after": results[1], "limit": 2}
+        )
+        assert [x["resultId"] for x in response.json["scrutinyResults"]] == results[2:]
+        assert response.json["nextCursor"] is None
+
+    def test_response_validation_modes(self):
+        scrutiny = {
+            "id": 1,
+            "districtId": 1,
+            "name": "validation scrutiny",
+            "seats": 7,
+            "votingDate": datetime(2024, 12, 1),
+            "scrutinyDate": datetime(2024, 12, 2),
+        }
+        results = {"scrutinies": [scrutiny], "nextCursor": None}
+        invalid = {"scrutinies": [dict(scrutiny, seats=0)], "nextCursor": None}
+
+        strict = ResponseValidation("strict")
+        # Dates are validated as objects, the result is not modified
+        assert strict.validate(GetScrutinies, results) == {}
+        assert results["scrutinies"][0]["votingDate"] == datetime(2024, 12, 1)
+        assert strict.validate(GetScrutinies, invalid)
+
+        assert ResponseValidation("off").validate(GetScrutinies, invalid) == {}
+
+        sampled = ResponseValidation("sampled", sample_rate=3)
+        assert [bool(sampled.validate(GetScrutinies, invalid)) for _ in range(6)] == [
+            True,
+            False,
+            False,
+            True,
+            False,
+            False,
+        ]
+
+        with pytest.raises(ValueError):
+            ResponseValidation("sometimes")
+
+    @pytest.mark.parametrize("mode, status_code", [("strict", 500), ("off", 200)])
+    def test_response_validation_config(self, monkeypatch, mode, status_code):
+        monkeypatch.setattr(
+            DhondtService,
+            "get_districts",
+            lambda self, **kwargs: {"districts": [{"id": 0, "name": "invalid"}]},
+        )
+        app = create_app({"TESTING": True, "RESPONSE_VALIDATION": mode})
+        response = app.test_client().get(f"{API}/districts")
+        assert response.status_code == status_code
+
+    def test_json_provider(self, app, client, district_factory):
+        assert isinstance(app.json, OrjsonProvider)
+        assert app.json.dumps({"b": datetime(2024, 12, 1, 10), "a": 1}) == (
+            '{"a":1,"b":"2024-12-01T10:00:00"}'
+        )
+        assert app.json.loads(b'{"a": [1, 2]}') == {"a": [1, 2]}
+
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1[:2])
+        response = client.get(f"{API}/districts/{district_1}/political-party-lists")
+        assert response.mimetype == "application/json"
+        assert json.loads(response.data)["politicalPartyLists"] == pplists_1
+
+        stock = create_app({"TESTING": True, "JSON_PROVIDER": "default"})
+        assert type(stock.json) is DefaultJSONProvider
+        response = stock.test_client().get(
+            f"{API}/districts/{district_1}/political-party-lists"
+        )
+        assert response.json["politicalPartyLists"] == pplists_1
+
+        with pytest.raises(ValueError):
+            json_provider_class("simplejson")
+
+    def test_conditional_get(self, client, district_factory, queries):
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1)
+        url = f"{API}/districts/{district_1}/political-party-lists"
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert response.headers["Last-Modified"]
+
+        # Not modified, answered from the version without the lists query
+        queries.clear()
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+        assert len(queries) == 1
+
+        # Other page, other tag
+        response = client.get(url, query_string={"limit": 2})
+        assert response.headers["ETag"] != etag
+
+        client.put(f"{url}/{pplists_1[0]['id']}/vote", json={"votes": 10})
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+        response = client.post(
+            f"{API}/districts/{district_1}/scrutinies",
+            json={
+                "name": "etag scrutiny",
+                "seats": 7,
+                "votingDate": "2024-12-01",
+                "scrutinyDate": "2024-12-02",
+            },
+        )
+        scrutiny_id = response.json["id"]
+        url = f"{API}/districts/{district_1}/scrutinies"
+        etag = client.get(url).headers["ETag"]
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        url = f"{url}/{scrutiny_id}/seats-status"
+        client.post(url)
+        etag = client.get(url).headers["ETag"]
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+        # A new result changes the tag of the results
+        client.put(
+            f"{API}/districts/{district_1}/political-party-lists/"
+            f"{pplists_1[1]['id']}/vote",
+            json={"votes": 1},
+        )
+        client.post(url)
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert len(response.json["scrutinyResults"]) == 2
+
+    def test_latest_seats_result(self, client, district_factory, queries):
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1)
+        for pplist, table in zip(pplists_1, PPLIST_TABLE_1):
+            client.put(
+                f"{API}/districts/{district_1}/political-party-lists/"
+                f"{pplist['id']}/vote",
+                json={"votes": table["votes"]},
+            )
+        response = client.post(
+            f"{API}/districts/{district_1}/scrutinies",
+            json={
+                "name": "latest scrutiny",
+                "seats": 7,
+                "votingDate": "2024-12-01",
+                "scrutinyDate": "2024-12-02",
+            },
+        )
+        url = f"{API}/districts/{district_1}/scrutinies/{response.json['id']}"
+        assert client.get(f"{url}/seats-status/latest").status_code == 404
+
+        first = client.post(f"{url}/seats-status").json
+        queries.clear()
+        response = client.get(f"{url}/seats-status/latest")
+        assert response.status_code == 200
+        assert response.json == first
+        assert len(queries) == 1
+        etag = response.headers["ETag"]
+        response = client.get(
+            f"{url}/seats-status/latest", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+
+        client.put(
+            f"{API}/districts/{district_1}/political-party-lists/"
+            f"{pplists_1[4]['id']}/vote",
+            json={"votes": 500000},
+        )
+        second = client.post(f"{url}/seats-status").json
+        response = client.get(
+            f"{url}/seats-status/latest", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.json == second
+        assert response.json["resultId"] != first["resultId"]
+
+        response = client.get(
+            f"{API}/districts/{district_1 + 1}/scrutinies/"
+            f"{first['scrutinyId']}/seats-status/latest"
+        )
+        assert response.status_code == 404
+
+    def test_increment_vote(self, client, district_factory, queries):
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1[:2])
+        url = (
+            f"{API}/districts/{district_1}/political-party-lists/"
+            f"{pplists_1[0]['id']}/vote"
+        )
+        client.put(url, json={"votes": 100})
+
+        queries.clear()
+        response = client.post(f"{url}/delta", json={"delta": 15})
+        assert response.status_code == 200
+        assert response.json == dict(pplists_1[0], votes=115)
+        # the increment returning the list and the district version
+        assert [x.split()[0] for x in queries] == ["UPDATE", "UPDATE"]
+
+        client.post(f"{url}/delta", json={"delta": 5})
+        response = client.get(url.rsplit("/", 1)[0])
+        assert response.json["votes"] == 120
+
+        response = client.post(
+            f"{API}/districts/{district_1 + 1}/political-party-lists/"
+            f"{pplists_1[0]['id']}/vote/delta",
+            json={"delta": 1},
+        )
+        assert response.status_code == 404
+        assert client.post(f"{url}/delta", json={"delta": -1}).status_code == 422
+
+    @pytest.mark.parametrize("buffered", [False, True])
+    def test_increment_vote_out_of_range(
+        self, client, district_factory, monkeypatch, buffered
+    ):
+        monkeypatch.setattr(vote_buffer, "enabled", buffered)
+        district_1, pplists_1 = district_factory(PPLIST_TABLE_1[:1])
+        url = (
+            f"{API}/districts/{district_1}/political-party-lists/"
+            f"{pplists_1[0]['id']}/vote"
+        )
+        client.put(url, json={"votes": MAX_VOTES - 1})
+
+        assert client.post(f"{url}/delta", json={"delta": 2}).status_code == 422
+        response = client.post(f"{url}/delta", json={"delta": 1})
+        assert response.status_code == 200
+        assert response.json["votes"] == MAX_VOTES
+        vote_buffer.flush()